@@ -0,0 +1,32 @@
+"""Add messages.intent
+
+Revision ID: 4b1e7c9a2f10
+Revises: b6e2d8f4c193
+Create Date: 2026-10-18 10:12:31.504218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1e7c9a2f10'
+down_revision: Union[str, Sequence[str], None] = 'b6e2d8f4c193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have it
+    columns = [c["name"] for c in sa.inspect(op.get_bind()).get_columns("messages")]
+    if "intent" not in columns:
+        op.add_column("messages", sa.Column("intent", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("messages") as batch_op:
+        batch_op.drop_column("intent")
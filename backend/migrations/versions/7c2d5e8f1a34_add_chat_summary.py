@@ -0,0 +1,38 @@
+"""Add rolling chat summary columns
+
+Revision ID: 7c2d5e8f1a34
+Revises: 4b1e7c9a2f10
+Create Date: 2026-10-18 14:02:47.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d5e8f1a34'
+down_revision: Union[str, Sequence[str], None] = '4b1e7c9a2f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have them
+    columns = [c["name"] for c in sa.inspect(op.get_bind()).get_columns("chats")]
+    if "summary" not in columns:
+        op.add_column("chats", sa.Column("summary", sa.Text(), nullable=True))
+    if "summary_until_message_id" not in columns:
+        op.add_column("chats", sa.Column("summary_until_message_id", sa.Integer(), nullable=True))
+    if "summary_source_tokens" not in columns:
+        op.add_column("chats", sa.Column("summary_source_tokens", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("chats") as batch_op:
+        batch_op.drop_column("summary_source_tokens")
+        batch_op.drop_column("summary_until_message_id")
+        batch_op.drop_column("summary")
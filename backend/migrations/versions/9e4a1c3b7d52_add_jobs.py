@@ -0,0 +1,62 @@
+"""Add jobs table for the background queue
+
+Revision ID: 9e4a1c3b7d52
+Revises: 7c2d5e8f1a34
+Create Date: 2026-10-18 16:41:09.273514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4a1c3b7d52'
+down_revision: Union[str, Sequence[str], None] = '7c2d5e8f1a34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have it
+    if sa.inspect(op.get_bind()).has_table("jobs"):
+        return
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=True),
+        sa.Column("key", sa.String(), nullable=True),
+        sa.Column("payload", sa.JSON(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum("QUEUED", "RUNNING", "DONE", "FAILED", "CANCELLED", name="jobstatus"),
+            nullable=True
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=True),
+        sa.Column("max_attempts", sa.Integer(), nullable=True),
+        sa.Column("run_after", sa.DateTime(), nullable=True),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_jobs_id"), "jobs", ["id"], unique=False)
+    op.create_index(op.f("ix_jobs_kind"), "jobs", ["kind"], unique=False)
+    op.create_index(op.f("ix_jobs_key"), "jobs", ["key"], unique=False)
+    op.create_index(op.f("ix_jobs_status"), "jobs", ["status"], unique=False)
+    op.create_index(op.f("ix_jobs_run_after"), "jobs", ["run_after"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_jobs_run_after"), table_name="jobs")
+    op.drop_index(op.f("ix_jobs_status"), table_name="jobs")
+    op.drop_index(op.f("ix_jobs_key"), table_name="jobs")
+    op.drop_index(op.f("ix_jobs_kind"), table_name="jobs")
+    op.drop_index(op.f("ix_jobs_id"), table_name="jobs")
+    op.drop_table("jobs")
+    sa.Enum(name="jobstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,31 @@
+"""Add (chat_id, id) index to messages
+
+Revision ID: a1d7e3b9c642
+Revises: f3a9d2c6e581
+Create Date: 2026-10-18 23:40:18.207745
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1d7e3b9c642'
+down_revision: Union[str, Sequence[str], None] = 'f3a9d2c6e581'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have it
+    indexes = [i["name"] for i in sa.inspect(op.get_bind()).get_indexes("messages")]
+    if "ix_messages_chat_id_id" not in indexes:
+        op.create_index("ix_messages_chat_id_id", "messages", ["chat_id", "id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_messages_chat_id_id", table_name="messages")
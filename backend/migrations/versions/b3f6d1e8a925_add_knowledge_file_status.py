@@ -0,0 +1,48 @@
+"""Add extraction status to knowledge files
+
+Revision ID: b3f6d1e8a925
+Revises: 9e4a1c3b7d52
+Create Date: 2026-10-18 18:12:30.514207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f6d1e8a925'
+down_revision: Union[str, Sequence[str], None] = '9e4a1c3b7d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have them
+    columns = [c["name"] for c in sa.inspect(op.get_bind()).get_columns("knowledge_files")]
+    if "status" not in columns:
+        status = sa.Enum("PROCESSING", "READY", "FAILED", name="knowledgefilestatus")
+        status.create(op.get_bind(), checkfirst=True)
+        # Files uploaded before were extracted inline, so they are ready
+        op.add_column("knowledge_files", sa.Column("status", status, nullable=True, server_default="READY"))
+    if "job_id" not in columns:
+        op.add_column("knowledge_files", sa.Column("job_id", sa.Integer(), nullable=True))
+    if "pages_total" not in columns:
+        op.add_column("knowledge_files", sa.Column("pages_total", sa.Integer(), nullable=True))
+    if "pages_done" not in columns:
+        op.add_column("knowledge_files", sa.Column("pages_done", sa.Integer(), nullable=True))
+    if "error" not in columns:
+        op.add_column("knowledge_files", sa.Column("error", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("knowledge_files") as batch_op:
+        batch_op.drop_column("error")
+        batch_op.drop_column("pages_done")
+        batch_op.drop_column("pages_total")
+        batch_op.drop_column("job_id")
+        batch_op.drop_column("status")
+    sa.Enum(name="knowledgefilestatus").drop(op.get_bind(), checkfirst=True)
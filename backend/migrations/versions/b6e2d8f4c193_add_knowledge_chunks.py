@@ -0,0 +1,59 @@
+"""Add knowledge chunks and the BM25 postings index
+
+Revision ID: b6e2d8f4c193
+Revises: d322ae002351
+Create Date: 2026-10-18 00:47:52.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e2d8f4c193'
+down_revision: Union[str, Sequence[str], None] = 'd322ae002351'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have them
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("knowledge_chunks"):
+        op.create_table(
+            "knowledge_chunks",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("file_id", sa.Integer(), nullable=True),
+            sa.Column("position", sa.Integer(), nullable=True),
+            sa.Column("content", sa.Text(), nullable=True),
+            sa.Column("length", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["file_id"], ["knowledge_files.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(op.f("ix_knowledge_chunks_id"), "knowledge_chunks", ["id"], unique=False)
+        op.create_index(op.f("ix_knowledge_chunks_file_id"), "knowledge_chunks", ["file_id"], unique=False)
+
+    if not inspector.has_table("knowledge_postings"):
+        op.create_table(
+            "knowledge_postings",
+            sa.Column("term", sa.String(), nullable=False),
+            sa.Column("chunk_id", sa.Integer(), nullable=False),
+            sa.Column("tf", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(["chunk_id"], ["knowledge_chunks.id"]),
+            sa.PrimaryKeyConstraint("term", "chunk_id"),
+        )
+        op.create_index(op.f("ix_knowledge_postings_chunk_id"), "knowledge_postings", ["chunk_id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_knowledge_postings_chunk_id"), table_name="knowledge_postings")
+    op.drop_table("knowledge_postings")
+    op.drop_index(op.f("ix_knowledge_chunks_file_id"), table_name="knowledge_chunks")
+    op.drop_index(op.f("ix_knowledge_chunks_id"), table_name="knowledge_chunks")
+    op.drop_table("knowledge_chunks")
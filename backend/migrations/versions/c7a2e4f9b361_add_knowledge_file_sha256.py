@@ -0,0 +1,34 @@
+"""Add content hash to knowledge files
+
+Revision ID: c7a2e4f9b361
+Revises: b3f6d1e8a925
+Create Date: 2026-10-18 19:05:47.662018
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a2e4f9b361'
+down_revision: Union[str, Sequence[str], None] = 'b3f6d1e8a925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have it
+    columns = [c["name"] for c in sa.inspect(op.get_bind()).get_columns("knowledge_files")]
+    if "sha256" not in columns:
+        op.add_column("knowledge_files", sa.Column("sha256", sa.String(length=64), nullable=True))
+        op.create_index(op.f("ix_knowledge_files_sha256"), "knowledge_files", ["sha256"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_knowledge_files_sha256"), table_name="knowledge_files")
+    with op.batch_alter_table("knowledge_files") as batch_op:
+        batch_op.drop_column("sha256")
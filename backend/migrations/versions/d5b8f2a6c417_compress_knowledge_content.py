@@ -0,0 +1,77 @@
+"""Store knowledge file content zlib-compressed
+
+Revision ID: d5b8f2a6c417
+Revises: c7a2e4f9b361
+Create Date: 2026-10-18 20:21:15.904833
+
+"""
+from typing import Sequence, Union
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b8f2a6c417'
+down_revision: Union[str, Sequence[str], None] = 'c7a2e4f9b361'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+knowledge_files = sa.table(
+    "knowledge_files",
+    sa.column("id", sa.Integer),
+    sa.column("content", sa.LargeBinary),
+)
+
+
+def _content_type():
+    columns = sa.inspect(op.get_bind()).get_columns("knowledge_files")
+    return next(c["type"] for c in columns if c["name"] == "content")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup already have the binary column
+    if isinstance(_content_type(), sa.LargeBinary):
+        return
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(sa.column("id"), sa.column("content"))
+        .select_from(sa.table("knowledge_files"))
+        .where(sa.column("content").is_not(None))
+    ).all()
+    with op.batch_alter_table("knowledge_files") as batch_op:
+        batch_op.alter_column(
+            "content",
+            existing_type=sa.Text(),
+            type_=sa.LargeBinary(),
+            postgresql_using="convert_to(content, 'UTF8')"
+        )
+    for file_id, text in rows:
+        bind.execute(
+            knowledge_files.update()
+            .where(knowledge_files.c.id == file_id)
+            .values(content=zlib.compress(text.encode("utf-8")))
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(knowledge_files.c.id, knowledge_files.c.content)
+        .where(knowledge_files.c.content.is_not(None))
+    ).all()
+    with op.batch_alter_table("knowledge_files") as batch_op:
+        batch_op.alter_column(
+            "content",
+            existing_type=sa.LargeBinary(),
+            type_=sa.Text(),
+            postgresql_using="NULL"
+        )
+    text_files = sa.table("knowledge_files", sa.column("id", sa.Integer), sa.column("content", sa.Text))
+    for file_id, data in rows:
+        text = data if isinstance(data, str) else zlib.decompress(data).decode("utf-8")
+        bind.execute(text_files.update().where(text_files.c.id == file_id).values(content=text))
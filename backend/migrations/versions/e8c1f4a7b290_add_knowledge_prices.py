@@ -0,0 +1,71 @@
+"""Add parsed price list rows with a trigram index
+
+Revision ID: e8c1f4a7b290
+Revises: d5b8f2a6c417
+Create Date: 2026-10-18 21:12:33.418257
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c1f4a7b290'
+down_revision: Union[str, Sequence[str], None] = 'd5b8f2a6c417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have them
+    inspector = sa.inspect(op.get_bind())
+    columns = [c["name"] for c in inspector.get_columns("knowledge_files")]
+    if "price_count" not in columns:
+        op.add_column("knowledge_files", sa.Column("price_count", sa.Integer(), nullable=True))
+
+    if not inspector.has_table("knowledge_prices"):
+        op.create_table(
+            "knowledge_prices",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("file_id", sa.Integer(), nullable=True),
+            sa.Column("position", sa.Integer(), nullable=True),
+            sa.Column("section", sa.String(), nullable=True),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("article", sa.String(), nullable=True),
+            sa.Column("price", sa.Numeric(precision=12, scale=2), nullable=True),
+            sa.Column("trigram_count", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["file_id"], ["knowledge_files.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(op.f("ix_knowledge_prices_id"), "knowledge_prices", ["id"], unique=False)
+        op.create_index(op.f("ix_knowledge_prices_file_id"), "knowledge_prices", ["file_id"], unique=False)
+        op.create_index(op.f("ix_knowledge_prices_article"), "knowledge_prices", ["article"], unique=False)
+
+    if not inspector.has_table("knowledge_price_trigrams"):
+        op.create_table(
+            "knowledge_price_trigrams",
+            sa.Column("trigram", sa.String(), nullable=False),
+            sa.Column("price_id", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["price_id"], ["knowledge_prices.id"]),
+            sa.PrimaryKeyConstraint("trigram", "price_id"),
+        )
+        op.create_index(
+            op.f("ix_knowledge_price_trigrams_price_id"), "knowledge_price_trigrams", ["price_id"], unique=False
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_knowledge_price_trigrams_price_id"), table_name="knowledge_price_trigrams")
+    op.drop_table("knowledge_price_trigrams")
+    op.drop_index(op.f("ix_knowledge_prices_article"), table_name="knowledge_prices")
+    op.drop_index(op.f("ix_knowledge_prices_file_id"), table_name="knowledge_prices")
+    op.drop_index(op.f("ix_knowledge_prices_id"), table_name="knowledge_prices")
+    op.drop_table("knowledge_prices")
+    with op.batch_alter_table("knowledge_files") as batch_op:
+        batch_op.drop_column("price_count")
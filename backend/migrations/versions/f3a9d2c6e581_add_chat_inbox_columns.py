@@ -0,0 +1,50 @@
+"""Add last message reference and inbox indexes to chats
+
+Revision ID: f3a9d2c6e581
+Revises: e8c1f4a7b290
+Create Date: 2026-10-18 22:27:05.913604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d2c6e581'
+down_revision: Union[str, Sequence[str], None] = 'e8c1f4a7b290'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases bootstrapped by create_all at startup may already have them
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = [c["name"] for c in inspector.get_columns("chats")]
+    if "last_message_id" not in columns:
+        op.add_column("chats", sa.Column("last_message_id", sa.Integer(), nullable=True))
+
+        # One pass over messages; a correlated subquery per chat would scan them per chat
+        last = bind.execute(sa.text("SELECT chat_id, MAX(id) FROM messages GROUP BY chat_id")).all()
+        if last:
+            bind.execute(
+                sa.text("UPDATE chats SET last_message_id = :message_id WHERE id = :chat_id"),
+                [{"chat_id": chat_id, "message_id": message_id} for chat_id, message_id in last]
+            )
+
+    indexes = [i["name"] for i in inspector.get_indexes("chats")]
+    if "ix_chats_updated_at_id" not in indexes:
+        op.create_index("ix_chats_updated_at_id", "chats", ["updated_at", "id"], unique=False)
+    if "ix_chats_status_updated_at_id" not in indexes:
+        op.create_index("ix_chats_status_updated_at_id", "chats", ["status", "updated_at", "id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_chats_status_updated_at_id", table_name="chats")
+    op.drop_index("ix_chats_updated_at_id", table_name="chats")
+    with op.batch_alter_table("chats") as batch_op:
+        batch_op.drop_column("last_message_id")
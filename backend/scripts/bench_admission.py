@@ -0,0 +1,122 @@
+"""
+Admission control against a local fake provider.
+
+The fake provider answers in --latency ms and returns 429 once more than
+--provider-limit requests are in flight. One noisy chat sends --burst
+messages at once, and --quiet other chats send two messages each right
+after it. The script compares:
+- no cap: every turn goes straight to the provider
+- cap, FIFO: the concurrency cap with all turns in one queue
+- cap, fair: the cap with the per-chat weighted fair queue
+- overflow: a short queue, where extra turns get the overflow reply
+For each run it reports provider 429s, overflow replies and latency for the
+quiet chats and for the noisy one.
+
+Usage:
+    python scripts/bench_admission.py [--burst 60] [--quiet 10] [--cap 8] [--provider-limit 10] [--latency 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import settings
+from src.modules.ai_engine.admission import AdmissionController
+from src.modules.ai_engine.models import AIRequest
+from src.modules.ai_engine.service import AIEngineService
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class FakeProvider:
+    """Stand-in for AsyncOpenAI that rate-limits above a concurrency limit."""
+
+    def __init__(self, limit: int, latency_ms: float):
+        self.limit = limit
+        self.latency_ms = latency_ms
+        self.in_flight = 0
+        self.rate_limited = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, messages, **kwargs):
+        self.in_flight += 1
+        try:
+            if self.in_flight > self.limit:
+                self.rate_limited += 1
+                raise RateLimitError("429 Too Many Requests")
+            await asyncio.sleep(self.latency_ms / 1000)
+            message = SimpleNamespace(content="Стоимость замены масла 1500 ₽. Хотите записаться?")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+        finally:
+            self.in_flight -= 1
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run(args, cap: int, queue_size: int, fair: bool):
+    provider = FakeProvider(args.provider_limit, args.latency)
+    controller = AdmissionController(max_concurrency=cap, max_queue=queue_size, max_wait=60, weights={})
+    ai = AIEngineService(client=provider, admission_controller=controller)
+
+    async def turn(chat_id: str, delay: float):
+        await asyncio.sleep(delay)
+        # Without fairness every turn shares one tenant, i.e. a plain FIFO queue
+        context = None if fair else {"company_id": "all"}
+        request = AIRequest(conversation_id=chat_id, text="сколько стоит замена масла", context=context)
+        start = time.perf_counter()
+        response = await ai.process_message(request)
+        return chat_id, (time.perf_counter() - start) * 1000, response.generation_path
+
+    turns = [turn("noisy", 0) for _ in range(args.burst)]
+    turns += [turn(f"quiet-{i}", 0.01 * (n + 1)) for i in range(args.quiet) for n in range(2)]
+    results = await asyncio.gather(*turns)
+
+    quiet = [ms for chat, ms, _ in results if chat != "noisy"]
+    noisy = [ms for chat, ms, _ in results if chat == "noisy"]
+    overflow = sum(path == "overflow" for _, _, path in results)
+    return provider.rate_limited, overflow, quiet, noisy, controller.snapshot()
+
+
+async def main(args):
+    # Keep the local classifier on so each turn is exactly one provider call
+    settings.INTENT_CLASSIFIER_ENABLED = True
+    scenarios = [
+        ("no cap", 10_000, 10_000, True),
+        ("cap, FIFO", args.cap, 10_000, False),
+        ("cap, fair", args.cap, 10_000, True),
+        ("overflow", args.cap, args.cap, True),
+    ]
+    print(f"Provider: {args.latency:.0f} ms per call, 429 above {args.provider_limit} in flight")
+    print(f"Load: 1 chat x {args.burst} messages + {args.quiet} chats x 2 messages\n")
+    print(f"{'scenario':<10} {'429s':>5} {'overflow':>9} {'quiet p50':>10} {'quiet p95':>10} "
+          f"{'noisy p95':>10} {'max depth':>10}")
+    real_stdout = sys.stdout
+    for name, cap, queue_size, fair in scenarios:
+        # The engine logs every provider error and rejection; keep the table readable
+        sys.stdout = open(os.devnull, "w")
+        try:
+            limited, overflow, quiet, noisy, snapshot = await run(args, cap, queue_size, fair)
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+        print(f"{name:<10} {limited:>5} {overflow:>9} {percentile(quiet, 0.5):>8.0f}ms {percentile(quiet, 0.95):>8.0f}ms "
+              f"{percentile(noisy, 0.95):>8.0f}ms {snapshot['max_queue_depth']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=60, help="Messages sent at once by the noisy chat")
+    parser.add_argument("--quiet", type=int, default=10, help="Other chats, two messages each")
+    parser.add_argument("--cap", type=int, default=8, help="Admission concurrency cap")
+    parser.add_argument("--provider-limit", type=int, default=10, help="Provider concurrency before 429")
+    parser.add_argument("--latency", type=float, default=200, help="Provider latency, ms")
+    asyncio.run(main(parser.parse_args()))
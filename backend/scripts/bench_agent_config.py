@@ -0,0 +1,157 @@
+"""
+GET /agent/config with many large knowledge files: eager Text column vs the
+deferred, compressed content column.
+
+The script fills two in-memory SQLite databases with one agent and --files
+knowledge files of --kb KB of extracted text each:
+- before: knowledge_files.content as a plain Text column, mapped the way it
+  was before (loaded by selectinload(AgentConfig.knowledge_files))
+- after: the current models (content deferred and zlib-compressed)
+It then runs the handler's work (AgentService.get_config() and the response
+model) --runs times and reports latency and the peak Python memory per
+request, plus the stored size of the content column.
+
+Usage:
+    python scripts/bench_agent_config.py [--files 50] [--kb 400] [--runs 30]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, JSON, DateTime, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base, relationship, selectinload
+
+from src.database import Base
+from src.models.agent import AgentConfig, KnowledgeFile
+from src.modules.agent.schemas import AgentConfigResponse
+from src.modules.agent.service import AgentService
+
+
+LegacyBase = declarative_base()
+
+
+class LegacyAgentConfig(LegacyBase):
+    __tablename__ = "agent_configs"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    role = Column(String)
+    tone = Column(String)
+    system_prompt = Column(Text)
+    skills = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    knowledge_files = relationship("LegacyKnowledgeFile")
+
+
+class LegacyKnowledgeFile(LegacyBase):
+    __tablename__ = "knowledge_files"
+    id = Column(Integer, primary_key=True)
+    agent_id = Column(Integer, ForeignKey("agent_configs.id"))
+    filename = Column(String)
+    file_path = Column(String)
+    file_size = Column(Integer)
+    content = Column(Text)
+    status = Column(String, default="READY")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+def catalog_text(rng: random.Random, kb: int) -> str:
+    words = ["стрижка", "окрашивание", "укладка", "маникюр", "педикюр", "цена", "руб", "мастер",
+             "скидка", "абонемент", "топ-стилист", "уход", "кератин", "ботокс", "ламинирование"]
+    lines = []
+    size = 0
+    while size < kb * 1024:
+        line = f"{rng.randint(1, 9999)}. " + " ".join(rng.choices(words, k=10)) + f" — {rng.randint(5, 500) * 10} руб"
+        lines.append(line)
+        size += len(line.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+
+async def fill(session_factory, agent_cls, file_cls, texts):
+    async with session_factory() as db:
+        agent = agent_cls(name="Анна", role="Менеджер", tone="Вежливый", system_prompt="", skills={})
+        db.add(agent)
+        await db.flush()
+        for i, text in enumerate(texts):
+            db.add(file_cls(
+                agent_id=agent.id, filename=f"price_{i}.pdf", file_path="", file_size=len(text),
+                content=text, status="READY"
+            ))
+        await db.commit()
+
+
+async def measure(name: str, session_factory, load, runs: int):
+    latencies = []
+    peaks = []
+    for _ in range(runs):
+        async with session_factory() as db:
+            tracemalloc.start()
+            started = time.perf_counter()
+            await load(db)
+            latencies.append((time.perf_counter() - started) * 1000)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024 / 1024)
+            tracemalloc.stop()
+    latencies.sort()
+    print(f"{name:>7} {statistics.median(latencies):>9.1f} {latencies[int(len(latencies) * 0.95) - 1]:>9.1f} "
+          f"{statistics.median(peaks):>12.1f}", end="")
+
+
+async def main(args):
+    rng = random.Random(3)
+    texts = [catalog_text(rng, args.kb) for _ in range(args.files)]
+    print(f"{args.files} files x {args.kb} KB of text, {args.runs} requests each\n")
+    print(f"{'':>7} {'p50 ms':>9} {'p95 ms':>9} {'peak MB/req':>12} {'content column':>16}")
+
+    # Before: plain Text column, loaded with every file
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(LegacyBase.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await fill(factory, LegacyAgentConfig, LegacyKnowledgeFile, texts)
+
+    async def load_before(db):
+        result = await db.execute(
+            select(LegacyAgentConfig).options(selectinload(LegacyAgentConfig.knowledge_files))
+        )
+        return AgentConfigResponse.model_validate(result.scalar_one())
+
+    await measure("before", factory, load_before, args.runs)
+    stored = sum(len(text.encode("utf-8")) for text in texts)
+    print(f" {stored / 1024 / 1024:>13.1f} MB")
+    await engine.dispose()
+
+    # After: current models
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await fill(factory, AgentConfig, KnowledgeFile, texts)
+
+    async def load_after(db):
+        config = await AgentService(db).get_config()
+        return AgentConfigResponse.model_validate(config)
+
+    await measure("after", factory, load_after, args.runs)
+    async with factory() as db:
+        # length() of a BLOB is its size in bytes
+        stored = (await db.execute(select(func.sum(func.length(KnowledgeFile.content))))).scalar()
+    print(f" {stored / 1024 / 1024:>13.1f} MB")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--kb", type=int, default=400, help="Extracted text per file, KB")
+    parser.add_argument("--runs", type=int, default=30)
+    asyncio.run(main(parser.parse_args()))
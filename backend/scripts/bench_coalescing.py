@@ -0,0 +1,124 @@
+"""
+Burst coalescing against simulated widget typing.
+
+Each simulated customer sends --bursts bursts of 1-4 short messages, with
+0.3-1.2 s between messages of a burst and 5-20 s of reading between bursts.
+The messages go through MessageCoalescer and an in-memory JobQueue whose
+handler is a fake AI turn that counts
+LLM calls (two per turn: intent classification and generation) and takes
+--turn-latency ms. The script compares debounce windows: calls per
+conversation, messages per turn, overlapping answers and how long the
+customer waited for the reply after their last message.
+
+Time is compressed by --speed so the run takes seconds.
+
+Usage:
+    python scripts/bench_coalescing.py [--chats 50] [--bursts 6] [--windows 0,1,1.5,2.5] [--speed 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.modules.chat.coalescer import AI_TURN_JOB, MessageCoalescer
+from src.task_queue import JobQueue, MemoryJobStore
+
+
+def typing_script(rng: random.Random, bursts: int):
+    """(delay before message, seconds) for one customer."""
+    delays = []
+    for burst in range(bursts):
+        size = rng.choices([1, 2, 3, 4], weights=[35, 30, 25, 10])[0]
+        delays.append(rng.uniform(5, 20) if burst else rng.uniform(0, 3))
+        delays.extend(rng.uniform(0.3, 1.2) for _ in range(size - 1))
+    return delays
+
+
+async def run(window: float, max_wait: float, scripts, speed: float, turn_latency: float) -> dict:
+    llm_calls = 0
+    turns = 0
+    overlaps = 0
+    active = {}
+    last_sent = {}
+    reply_waits = []
+
+    async def answer(job):
+        nonlocal llm_calls, turns, overlaps
+        chat_id = job.payload["chat_id"]
+        turns += 1
+        llm_calls += 2
+        active[chat_id] = active.get(chat_id, 0) + 1
+        if active[chat_id] > 1:
+            overlaps += 1
+        try:
+            await asyncio.sleep(turn_latency / 1000 / speed)
+        finally:
+            # Superseded turns are cancelled mid-generation
+            active[chat_id] -= 1
+        # The customer's wait counts from their latest message
+        reply_waits.append((time.monotonic() - last_sent[chat_id]) * speed)
+        coalescer.settle(chat_id, job.id)
+
+    queue = JobQueue(store=MemoryJobStore(), workers=len(scripts), poll_interval=0.05)
+    queue.register(AI_TURN_JOB, answer)
+    await queue.start()
+    coalescer = MessageCoalescer(queue, window=window / speed, max_wait=max_wait / speed)
+    if window == 0:
+        # No debounce: every message starts its own turn immediately, as before
+        async def submit(chat_id, message_id, text):
+            record = type("Job", (), {"id": message_id, "payload": {"chat_id": chat_id}})
+            asyncio.create_task(answer(record))
+        coalescer.submit = submit
+
+    async def customer(chat_id, delays):
+        for i, delay in enumerate(delays):
+            await asyncio.sleep(delay / speed)
+            last_sent[chat_id] = time.monotonic()
+            await coalescer.submit(chat_id, i, f"сообщение {i}")
+
+    await asyncio.gather(*(customer(chat_id, delays) for chat_id, delays in enumerate(scripts)))
+    while any(active.values()) or coalescer._pending or coalescer._dispatched:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep((window + turn_latency / 1000) / speed + 0.05)
+    await queue.stop()
+
+    messages = sum(len(d) for d in scripts)
+    reply_waits.sort()
+    return {
+        "messages": messages,
+        "turns": turns,
+        "llm_calls_per_chat": llm_calls / len(scripts),
+        "messages_per_turn": messages / turns if turns else 0,
+        "overlapping_answers": overlaps,
+        "reply_wait_p50": reply_waits[len(reply_waits) // 2] if reply_waits else 0,
+        "reply_wait_p95": reply_waits[int(len(reply_waits) * 0.95)] if reply_waits else 0,
+    }
+
+
+async def main(args):
+    rng = random.Random(7)
+    scripts = [typing_script(rng, args.bursts) for _ in range(args.chats)]
+    print(f"{args.chats} chats, {sum(len(s) for s in scripts)} messages, "
+          f"turn latency {args.turn_latency:.0f} ms, max wait {args.max_wait}s\n")
+    print(f"{'window':>7} {'turns':>6} {'LLM calls/chat':>15} {'msgs/turn':>10} {'overlaps':>9} "
+          f"{'reply p50':>10} {'reply p95':>10}")
+    for window in (float(w) for w in args.windows.split(",")):
+        result = await run(window, args.max_wait, scripts, args.speed, args.turn_latency)
+        print(f"{window:>6.1f}s {result['turns']:>6} {result['llm_calls_per_chat']:>15.1f} "
+              f"{result['messages_per_turn']:>10.2f} {result['overlapping_answers']:>9} "
+              f"{result['reply_wait_p50']:>9.2f}s {result['reply_wait_p95']:>9.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--bursts", type=int, default=6)
+    parser.add_argument("--windows", default="0,1,1.5,2.5", help="Debounce windows to compare, seconds")
+    parser.add_argument("--max-wait", type=float, default=6.0)
+    parser.add_argument("--turn-latency", type=float, default=2500, help="AI turn duration, ms")
+    parser.add_argument("--speed", type=float, default=20, help="Time compression factor")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+"""
+Benchmark of token-budgeted context packing on long chat histories.
+
+Builds synthetic histories of growing length plus a set of knowledge chunks
+and packs them into the prompt budget. Reports:
+- packing time with a cold token-count cache (every message counted) and a
+  warm one (the next turn of the same chat)
+- how many chunks/messages were kept and the tokens used
+- that packing the same input twice gives the same result
+
+Usage:
+    python scripts/bench_context_packer.py [--budget 6000] [--lengths 20,200,2000,20000] [--runs 20]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.modules.ai_engine.context_packer import ContextPacker, TokenCounter
+from src.modules.ai_engine.prompt_builder import PromptBuilder
+from src.modules.ai_engine.retrieval import ScoredChunk
+
+WORDS = (
+    "здравствуйте хочу записаться на замену масла сколько стоит диагностика подвески "
+    "а можно в субботу утром машина киа рио пробег сто тысяч спасибо за ответ "
+    "подскажите цену колодок передних и задних есть ли скидка для постоянных клиентов"
+).split()
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "?"
+
+
+def make_history(length: int, seed: int = 42):
+    rng = random.Random(seed)
+    roles = ["user", "assistant"]
+    # Mostly short chat lines with the occasional long message
+    return [
+        {"role": roles[i % 2], "content": make_text(rng, rng.choice([5, 12, 30, 300]))}
+        for i in range(length)
+    ]
+
+
+def make_chunks(count: int = 5, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        ScoredChunk(chunk_id=i, file_id=1, filename="prices.pdf", content=make_text(rng, 120), score=10.0 - i)
+        for i in range(count)
+    ]
+
+
+def bench(length: int, budget: int, runs: int):
+    history = make_history(length)
+    chunks = make_chunks()
+    fixed = [PromptBuilder._compile(), "**Контекст бизнеса:**\n", "Сколько стоит замена масла?"]
+
+    cold_ms = []
+    for _ in range(runs):
+        packer = ContextPacker(budget, TokenCounter())
+        start = time.perf_counter()
+        packed = packer.pack(fixed, chunks, history)
+        cold_ms.append((time.perf_counter() - start) * 1000)
+
+    warm_ms = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        again = packer.pack(fixed, chunks, history)
+        warm_ms.append((time.perf_counter() - start) * 1000)
+
+    deterministic = (
+        [c.content for c in again.knowledge] == [c.content for c in packed.knowledge]
+        and again.history == packed.history
+    )
+    return packed, sorted(cold_ms)[len(cold_ms) // 2], sorted(warm_ms)[len(warm_ms) // 2], deterministic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=6000, help="Prompt token budget")
+    parser.add_argument("--lengths", default="20,200,2000,20000", help="History lengths to pack")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    counter = TokenCounter()
+    print(f"Token counter: {counter.name}, budget: {args.budget} tokens\n")
+    print(f"{'history':>8} {'kept':>6} {'chunks':>7} {'tokens':>7} {'cold ms':>9} {'warm ms':>9}  deterministic")
+    # Packing logs every drop; keep the table readable
+    real_stdout = sys.stdout
+    for length in (int(n) for n in args.lengths.split(",")):
+        sys.stdout = open(os.devnull, "w")
+        try:
+            packed, cold, warm, deterministic = bench(length, args.budget, args.runs)
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+        print(f"{length:>8} {len(packed.history):>6} {len(packed.knowledge):>7} {packed.tokens:>7} "
+              f"{cold:>9.3f} {warm:>9.3f}  {deterministic}")
+
+
+if __name__ == "__main__":
+    main()
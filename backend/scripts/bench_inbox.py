@@ -0,0 +1,176 @@
+"""
+Operator inbox on a large database: GET /chats/ vs GET /chats/inbox.
+
+The script seeds a SQLite file with --chats chats (with clients) and
+--messages messages spread over them with a long tail, like real traffic:
+most chats are short and a few have thousands of messages. It then runs
+each handler's work (the service call and the response model):
+- all chats: ChatService.get_all_chats() into List[ChatResponse], every
+  message of every chat; --full-runs times, as it takes a minute or more
+- inbox: ChatService.get_inbox() into InboxPage, first page unfiltered and
+  filtered by status and platform, plus a page --deep-pages pages down
+and reports latency and the peak Python memory per request.
+
+The seeded file is kept (--db) and reused when it already has the data.
+
+Usage:
+    python scripts/bench_inbox.py [--chats 10000] [--messages 1000000] [--runs 50] [--full-runs 2]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database import Base
+from src.models.chat import ChatPlatform, ChatStatus, MessageRole
+from src.modules.chat.schemas import ChatResponse, InboxPage
+from src.modules.chat.service import ChatService
+
+
+PHRASES = [
+    "Здравствуйте, товар ещё в наличии?", "Сколько стоит доставка до Оренбурга?",
+    "Бампер передний на гранту есть?", "Подскажите, какая гарантия на запчасти?",
+    "Можно оплатить картой при получении?", "Спасибо, оформляйте заказ",
+    "Добрый день! Да, в наличии, могу отложить до вечера.",
+    "Доставка по городу бесплатная от 5000 рублей, по области от 300 рублей.",
+]
+
+
+def seed(path: str, chats: int, messages: int):
+    """Fill the database with plain sqlite3: an ORM insert of a million rows takes minutes."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+    rng = random.Random(7)
+    # Pareto-ish message counts, scaled to the requested total
+    weights = [rng.paretovariate(1.2) for _ in range(chats)]
+    scale = messages / sum(weights)
+    counts = [max(1, int(w * scale)) for w in weights]
+    counts[0] += messages - sum(counts)
+
+    start = datetime(2026, 1, 1)
+    platforms = list(ChatPlatform)
+    statuses = [ChatStatus.AI, ChatStatus.AI, ChatStatus.HUMAN, ChatStatus.DONE]
+    conn = sqlite3.connect(path)
+    message_id = 0
+    for chat_id in range(1, chats + 1):
+        opened = start + timedelta(minutes=rng.randint(0, 60 * 24 * 200))
+        rows = []
+        at = opened
+        for i in range(counts[chat_id - 1]):
+            message_id += 1
+            at += timedelta(seconds=rng.randint(5, 3600))
+            role = MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT
+            rows.append((message_id, chat_id, role.name, rng.choice(PHRASES), at, at))
+        conn.executemany(
+            "INSERT INTO messages (id, chat_id, role, content, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        conn.execute(
+            "INSERT INTO chats (id, external_id, platform, status, item_name, unread_count, summary_source_tokens, "
+            "last_message_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?)",
+            (chat_id, f"bench-{chat_id}", rng.choice(platforms).name, rng.choice(statuses).name,
+             "Бампер передний", rng.randint(0, 3), message_id, opened, at)
+        )
+        conn.execute(
+            "INSERT INTO chat_clients (chat_id, name, history, created_at, updated_at) VALUES (?, ?, '[]', ?, ?)",
+            (chat_id, f"Клиент {chat_id}", opened, opened)
+        )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def seeded(path: str, chats: int, messages: int) -> bool:
+    if not os.path.exists(path):
+        return False
+    conn = sqlite3.connect(path)
+    try:
+        counts = conn.execute("SELECT (SELECT count(*) FROM chats), (SELECT count(*) FROM messages)").fetchone()
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return counts == (chats, messages)
+
+
+async def measure(name: str, session_factory, load, runs: int):
+    latencies = []
+    for _ in range(runs):
+        async with session_factory() as db:
+            started = time.perf_counter()
+            await load(db)
+            latencies.append((time.perf_counter() - started) * 1000)
+    # Memory on a separate run: tracemalloc slows allocation-heavy code down
+    async with session_factory() as db:
+        tracemalloc.start()
+        await load(db)
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    latencies.sort()
+    p95 = latencies[math.ceil(len(latencies) * 0.95) - 1]
+    print(f"{name:<28} {statistics.median(latencies):>10.1f} {p95:>10.1f} {peak:>12.1f}")
+
+
+async def main(args):
+    if not seeded(args.db, args.chats, args.messages):
+        if os.path.exists(args.db):
+            os.remove(args.db)
+        print(f"Seeding {args.chats} chats / {args.messages} messages into {args.db}...")
+        started = time.perf_counter()
+        seed(args.db, args.chats, args.messages)
+        print(f"Seeded in {time.perf_counter() - started:.0f} s")
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{args.db}")
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    print(f"\n{args.chats} chats, {args.messages} messages, page size {args.limit}\n")
+    print(f"{'':<28} {'p50 ms':>10} {'p95 ms':>10} {'peak MB/req':>12}")
+
+    async def all_chats(db):
+        chats = await ChatService(db).get_all_chats()
+        return [ChatResponse.model_validate(chat) for chat in chats]
+
+    def inbox(**filters):
+        async def load(db):
+            chats, next_cursor = await ChatService(db).get_inbox(limit=args.limit, **filters)
+            return InboxPage(chats=chats, next_cursor=next_cursor)
+        return load
+
+    # Cursor of a page deep in the list, found once by walking the pages
+    async with factory() as db:
+        cursor = None
+        for _ in range(args.deep_pages):
+            _, cursor = await ChatService(db).get_inbox(limit=args.limit, cursor=cursor)
+
+    if args.full_runs:
+        await measure("GET /chats/ (all messages)", factory, all_chats, args.full_runs)
+    await measure("inbox, first page", factory, inbox(), args.runs)
+    await measure("inbox, status=HUMAN", factory, inbox(status="HUMAN"), args.runs)
+    await measure("inbox, platform=avito", factory, inbox(platform="avito"), args.runs)
+    await measure(f"inbox, page {args.deep_pages + 1}", factory, inbox(cursor=cursor), args.runs)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--full-runs", type=int, default=2, help="Runs of GET /chats/; 0 skips it")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--deep-pages", type=int, default=100)
+    parser.add_argument("--db", default="/tmp/bench_inbox.db")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,154 @@
+"""
+Benchmark: full knowledge dump vs BM25 top-k retrieval.
+
+Builds an in-memory SQLite knowledge base from test_prices.pdf copied N times
+(100 by default), then for a set of customer questions compares:
+- prompt size (characters of business context and of the whole system prompt)
+- context assembly latency (DB + formatting)
+- end-to-end latency of AIEngineService, against a simulated provider whose
+  latency grows with prompt length, or the real one with --live
+
+Usage:
+    python scripts/bench_retrieval.py [--copies 100] [--live]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pypdf import PdfReader
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from src.database import Base
+from src.models.agent import AgentConfig, KnowledgeFile
+from src.modules.ai_engine.prompt_builder import PromptBuilder
+from src.modules.ai_engine.retrieval import KnowledgeIndex, format_knowledge
+from src.modules.ai_engine.service import AIEngineService
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "Сколько стоят тормозные колодки на Гранту?",
+    "Есть ли фара передняя левая LED для Весты?",
+    "Какая цена генератора 110А?",
+    "Какие условия доставки по области?",
+    "Нужен радиатор охлаждения, сколько стоит?",
+]
+
+# Simulated provider: fixed overhead plus prefill time per prompt token
+PROVIDER_BASE_MS = 300
+PROVIDER_MS_PER_1K_TOKENS = 40
+CHARS_PER_TOKEN = 3  # Rough average for Russian text on BPE tokenizers
+
+
+class SimulatedProvider:
+    """Stand-in for AsyncOpenAI whose latency depends on prompt size."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.prompt_chars = []
+
+    async def create(self, model, messages, **kwargs):
+        chars = sum(len(m["content"]) for m in messages)
+        self.prompt_chars.append(chars)
+        tokens = chars / CHARS_PER_TOKEN
+        await asyncio.sleep((PROVIDER_BASE_MS + PROVIDER_MS_PER_1K_TOKENS * tokens / 1000) / 1000)
+        message = SimpleNamespace(content="general_inquiry")
+        usage = SimpleNamespace(prompt_tokens=int(tokens), completion_tokens=1, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def load_pdf_text() -> str:
+    reader = PdfReader(os.path.join(BASE_DIR, "test_prices.pdf"))
+    return "\n".join(page.extract_text() for page in reader.pages)
+
+
+async def seed(session_factory, copies: int):
+    text = load_pdf_text()
+    async with session_factory() as db:
+        config = AgentConfig(name="Анна", role="Менеджер", tone="Вежливый")
+        db.add(config)
+        await db.flush()
+        index = KnowledgeIndex(db)
+        for i in range(copies):
+            file = KnowledgeFile(
+                agent_id=config.id,
+                filename=f"prices_{i:03d}.pdf",
+                file_path=f"/uploads/prices_{i:03d}.pdf",
+                file_size=len(text),
+                content=f"Филиал №{i + 1}\n{text}"
+            )
+            db.add(file)
+            await db.flush()
+            await index.index_file(file)
+        await db.commit()
+
+
+async def full_dump_context(db: AsyncSession) -> str:
+    """The pre-retrieval behaviour: every file pasted into the prompt."""
+    result = await db.execute(select(KnowledgeFile))
+    files = result.scalars().all()
+    texts = [f"--- {f.filename} ---\n{f.content}" for f in files if f.content]
+    return "\n\nБАЗА ЗНАНИЙ:\n" + "\n".join(texts) if texts else ""
+
+
+async def retrieval_context(db: AsyncSession, question: str) -> str:
+    return format_knowledge(await KnowledgeIndex(db).search(question))
+
+
+def prompt_chars(context: str, question: str) -> int:
+    return sum(len(m["content"]) for m in PromptBuilder().build(question, business_context=context))
+
+
+async def measure(session_factory, build_context, ai: AIEngineService):
+    sizes, context_ms, e2e_ms = [], [], []
+    for question in QUESTIONS:
+        async with session_factory() as db:
+            start = time.perf_counter()
+            context = await build_context(db, question)
+            built = time.perf_counter()
+            await ai._classify_intent(question)
+            await ai._generate_response(user_message=question, business_context=context)
+            done = time.perf_counter()
+        sizes.append(prompt_chars(context, question))
+        context_ms.append((built - start) * 1000)
+        e2e_ms.append((done - start) * 1000)
+    n = len(QUESTIONS)
+    return sum(sizes) / n, sum(context_ms) / n, sum(e2e_ms) / n
+
+
+async def main(copies: int, live: bool):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    start = time.perf_counter()
+    await seed(session_factory, copies)
+    print(f"Seeded and indexed {copies} copies of test_prices.pdf in {time.perf_counter() - start:.2f}s")
+
+    ai = AIEngineService() if live else AIEngineService(client=SimulatedProvider())
+
+    dump = await measure(session_factory, lambda db, q: full_dump_context(db), ai)
+    top_k = await measure(session_factory, retrieval_context, ai)
+
+    print(f"\n{'mode':<12}{'prompt chars':>14}{'~tokens':>10}{'context ms':>12}{'e2e ms':>10}")
+    for name, (chars, ctx_ms, e2e) in (("full dump", dump), ("bm25 top-k", top_k)):
+        print(f"{name:<12}{chars:>14.0f}{chars / CHARS_PER_TOKEN:>10.0f}{ctx_ms:>12.1f}{e2e:>10.1f}")
+    print(f"\nPrompt reduction: {dump[0] / max(top_k[0], 1):.1f}x, "
+          f"end-to-end speedup: {dump[2] / max(top_k[2], 1e-9):.2f}x")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--live", action="store_true", help="Call the configured OpenAI-compatible API")
+    args = parser.parse_args()
+    asyncio.run(main(args.copies, args.live))
@@ -0,0 +1,130 @@
+"""
+Offline evaluation of the local intent classifier.
+
+Trains the classifier on the seed phrases (plus labelled messages from the
+database with --db) and evaluates it on a labelled fixture set. Reports:
+- accuracy over all messages
+- coverage: share of messages confident enough to skip the LLM call
+- accuracy on the covered messages (the ones that would never reach the LLM)
+- latency: local prediction time vs the LLM classification calls saved
+- a threshold sweep: coverage and precision of the covered messages per
+  threshold, and the lowest threshold whose precision reaches
+  --target-precision (what INTENT_CLASSIFIER_THRESHOLD should be set to)
+
+The fixtures are held out: none of them is a seed phrase.
+
+Usage:
+    python scripts/eval_intent_classifier.py [--fixtures FILE] [--threshold 0.75] [--target-precision 0.95] [--llm-ms 700] [--db]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import settings
+from src.modules.ai_engine.intent_classifier import IntentClassifier, SEED_EXAMPLES
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "intents.jsonl")
+
+
+def load_fixtures(path: str):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def train(use_db: bool) -> IntentClassifier:
+    classifier = IntentClassifier()
+    if not use_db:
+        return classifier.fit(SEED_EXAMPLES)
+    from src.database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        logged = await classifier.train_from_messages(db)
+    print(f"Trained on {len(SEED_EXAMPLES)} seed phrases + {logged} labelled messages")
+    return classifier
+
+
+def sweep(classifier: IntentClassifier, fixtures, target_precision: float):
+    """Coverage and precision per threshold; the lowest threshold that reaches the target precision."""
+    predictions = []
+    for item in fixtures:
+        prediction = classifier.predict(item["text"])
+        if prediction:
+            predictions.append((prediction.confidence, prediction.intent == item["intent"]))
+
+    n = len(fixtures)
+    chosen = None
+    print(f"\nTemperature:           {classifier.temperature}")
+    print(f"{'threshold':>10} {'coverage':>10} {'precision':>10}")
+    for step in range(30, 100, 5):
+        threshold = step / 100
+        covered = [correct for confidence, correct in predictions if confidence >= threshold]
+        if not covered:
+            continue
+        precision = sum(covered) / len(covered)
+        print(f"{threshold:>10.2f} {len(covered) / n:>10.1%} {precision:>10.1%}")
+        # Precision must hold from here up, not just at one lucky point
+        if precision < target_precision:
+            chosen = None
+        elif chosen is None:
+            chosen = threshold
+    if chosen is None:
+        print(f"No threshold reaches {target_precision:.0%} precision")
+    else:
+        print(f"Lowest threshold with >= {target_precision:.0%} precision: {chosen:.2f}")
+
+
+def evaluate(classifier: IntentClassifier, fixtures, threshold: float, llm_ms: float):
+    correct = covered = covered_correct = 0
+    confusion = Counter()
+    start = time.perf_counter()
+    for item in fixtures:
+        prediction = classifier.predict(item["text"])
+        predicted = prediction.intent if prediction else "general_inquiry"
+        confident = prediction is not None and prediction.confidence >= threshold
+        correct += predicted == item["intent"]
+        if confident:
+            covered += 1
+            covered_correct += predicted == item["intent"]
+        if predicted != item["intent"]:
+            confusion[(item["intent"], predicted)] += 1
+    local_ms = (time.perf_counter() - start) * 1000
+
+    n = len(fixtures)
+    print(f"\nMessages:              {n}")
+    print(f"Threshold:             {threshold}")
+    print(f"Accuracy (all):        {correct / n:.1%}")
+    print(f"Coverage (no LLM):     {covered / n:.1%} ({covered}/{n})")
+    if covered:
+        print(f"Accuracy (covered):    {covered_correct / covered:.1%}")
+    print(f"Local latency:         {local_ms / n:.3f} ms/message")
+    print(f"LLM calls saved:       {covered}")
+    print(f"Latency saved:         {covered * llm_ms / 1000:.1f}s total, "
+          f"{covered * llm_ms / n:.0f} ms/message on average (at {llm_ms:.0f} ms per LLM call)")
+    if confusion:
+        print("\nMost common errors (expected -> predicted):")
+        for (expected, predicted), count in confusion.most_common(5):
+            print(f"  {expected:>16} -> {predicted:<16} x{count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--threshold", type=float, default=settings.INTENT_CLASSIFIER_THRESHOLD)
+    parser.add_argument("--target-precision", type=float, default=0.95)
+    parser.add_argument("--llm-ms", type=float, default=700, help="Typical latency of one LLM classification call")
+    parser.add_argument("--db", action="store_true", help="Also train on labelled messages from the database")
+    args = parser.parse_args()
+
+    classifier = asyncio.run(train(args.db))
+    fixtures = load_fixtures(args.fixtures)
+    evaluate(classifier, fixtures, args.threshold, args.llm_ms)
+    sweep(classifier, fixtures, args.target_precision)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Fault-injecting stand-in for an OpenAI-compatible provider, plus a test run.
+
+Starts a local /v1/chat/completions server that injects errors (500, 429),
+latency spikes and hangs at the given rates. It then drives the real
+AsyncOpenAI SDK against that server, once directly and once through
+ResilientClient, and compares success rate and latency. A final outage
+phase (every request fails) shows the circuit breaker failing fast and
+recovering once the provider is healthy again.
+
+Usage:
+    python scripts/fault_injection_server.py [--calls 200] [--error-rate 0.1] [--rate-limit-rate 0.05]
+        [--spike-rate 0.05] [--hang-rate 0.02] [--latency 100] [--spike-latency 2000] [--hedge]
+    python scripts/fault_injection_server.py --serve   # only run the server on --port
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import AsyncOpenAI
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import settings
+from src.modules.ai_engine.transport import CircuitBreaker, CircuitOpenError, ResilientClient
+
+app = FastAPI()
+faults = {
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "spike_rate": 0.0,
+    "hang_rate": 0.0,
+    "latency_ms": 100.0,
+    "spike_ms": 2000.0,
+    "outage": False,
+}
+rng = random.Random(1)
+
+
+def completion(text: str) -> dict:
+    return {
+        "id": "chatcmpl-local",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "fault-injector",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    roll = rng.random()
+    if faults["outage"] or roll < faults["error_rate"]:
+        return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+    roll -= faults["error_rate"]
+    if roll < faults["rate_limit_rate"]:
+        return JSONResponse({"error": {"message": "injected rate limit"}}, status_code=429)
+    roll -= faults["rate_limit_rate"]
+    if roll < faults["hang_rate"]:
+        await asyncio.sleep(3600)
+    roll -= faults["hang_rate"]
+    delay = faults["spike_ms"] if roll < faults["spike_rate"] else faults["latency_ms"]
+    await asyncio.sleep(delay / 1000)
+
+    if body.get("stream"):
+        async def events():
+            for word in "Здравствуйте! Чем могу помочь?".split():
+                chunk = {
+                    "id": "chatcmpl-local", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": "fault-injector",
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+    return completion("general_inquiry")
+
+
+def start_server(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def drive(client, calls: int, concurrency: int = 10):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await client.chat.completions.create(
+                    model="fault-injector",
+                    messages=[{"role": "user", "content": "Сколько стоит?"}],
+                    max_tokens=20
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception:
+                failures += 1
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, failures
+
+
+def report(name: str, latencies, failures: int, calls: int):
+    ordered = sorted(latencies) or [0.0]
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    print(f"{name:<12} success {len(latencies) / calls:>6.1%}  failures {failures:>4}  "
+          f"p50 {pick(0.5):>7.0f}ms  p95 {pick(0.95):>7.0f}ms  p99 {pick(0.99):>7.0f}ms")
+
+
+async def main(args):
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    faults.update(
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, spike_rate=args.spike_rate,
+        hang_rate=args.hang_rate, latency_ms=args.latency, spike_ms=args.spike_latency
+    )
+    settings.LLM_HEDGE_MIN_DELAY = args.latency * 2 / 1000
+    print(f"Faults: {args.error_rate:.0%} 500s, {args.rate_limit_rate:.0%} 429s, {args.spike_rate:.0%} "
+          f"spikes of {args.spike_latency:.0f}ms, {args.hang_rate:.0%} hangs; deadline {args.deadline}s\n")
+
+    # The bare SDK with its default retries, limited to the same deadline
+    bare = AsyncOpenAI(api_key="local", base_url=base_url, timeout=args.deadline)
+    latencies, failures = await drive(bare, args.calls)
+    report("bare SDK", latencies, failures, args.calls)
+
+    sdk = AsyncOpenAI(api_key="local", base_url=base_url, max_retries=0)
+    settings.LLM_DEADLINE = args.deadline
+    resilient = ResilientClient(sdk, breaker=CircuitBreaker(failure_threshold=5, cooldown=1.0), hedge=args.hedge)
+    latencies, failures = await drive(resilient, args.calls)
+    report("resilient", latencies, failures, args.calls)
+    print(f"             {resilient.snapshot()}")
+
+    print("\nOutage: every request fails")
+    faults["outage"] = True
+    start = time.perf_counter()
+    latencies, failures = await drive(resilient, 50)
+    print(f"50 calls failed in {time.perf_counter() - start:.2f}s, "
+          f"{resilient.stats['short_circuited']} short-circuited, breaker {resilient.breaker.state}")
+    faults["outage"] = False
+    await asyncio.sleep(1.1)
+    # One at a time: while half-open the breaker lets a single probe through
+    latencies, failures = await drive(resilient, 20, concurrency=1)
+    print(f"After recovery: {len(latencies)}/20 succeeded, breaker {resilient.breaker.state}")
+    try:
+        faults["outage"] = True
+        for _ in range(10):
+            try:
+                await resilient.chat.completions.create(model="fault-injector", messages=[{"role": "user", "content": "?"}])
+            except CircuitOpenError:
+                print("Circuit open: the engine would hand the chat to a human")
+                break
+            except Exception:
+                pass
+    finally:
+        faults["outage"] = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help="Only run the stand-in server")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.05)
+    parser.add_argument("--spike-rate", type=float, default=0.05)
+    parser.add_argument("--hang-rate", type=float, default=0.02)
+    parser.add_argument("--latency", type=float, default=100, help="Normal latency, ms")
+    parser.add_argument("--spike-latency", type=float, default=2000, help="Latency spike, ms")
+    parser.add_argument("--deadline", type=float, default=5.0, help="Per-call deadline, seconds")
+    parser.add_argument("--hedge", action="store_true", help="Enable hedged requests")
+    args = parser.parse_args()
+    if args.serve:
+        uvicorn.run(app, host="127.0.0.1", port=args.port)
+    else:
+        start_server(args.port)
+        asyncio.run(main(args))
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Any, Dict, List
 import os
 
 class Settings(BaseSettings):
@@ -41,6 +42,125 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = ""
     OPENAI_BASE_URL: str = "https://api.openai.com/v1"  # OpenRouter: https://openrouter.ai/api/v1
     OPENAI_MODEL: str = "gpt-4o-mini"
+    # Several OpenAI-compatible endpoints, as JSON; empty means the single endpoint above.
+    # [{"name": "openrouter", "base_url": "...", "api_key": "...", "model": "...", "weight": 1}]
+    LLM_ENDPOINTS: List[Dict[str, Any]] = []
+    LLM_EWMA_ALPHA: float = 0.2  # Weight of the newest sample in endpoint latency/error averages
+    LLM_ENDPOINT_MAX_ERROR_RATE: float = 0.5  # EWMA error rate that ejects an endpoint
+    LLM_ENDPOINT_COOLDOWN: float = 30.0  # Seconds an ejected endpoint is skipped
+    LLM_ENDPOINT_EXPLORE: float = 0.05  # Share of requests sent to a random healthy endpoint
+    LLM_ENDPOINT_TIMEOUT: float = 10.0  # Seconds before failing over from an endpoint that has not answered
+    GENERATION_MODE: str = "two_call"  # two_call | single_call (intent + reply in one JSON call)
+    INTENT_CLASSIFIER_ENABLED: bool = True  # Local fast path before LLM intent classification
+    INTENT_CLASSIFIER_THRESHOLD: float = 0.75  # Below this calibrated confidence the LLM classifies; lowest with 95% held-out precision
+
+    # Model tiers per intent and message complexity (short | normal | long), as JSON.
+    # An empty "model" means OPENAI_MODEL; optional usd_per_1k_prompt / usd_per_1k_completion
+    # enable cost estimates on /ai/metrics.
+    MODEL_TIERS: Dict[str, Dict[str, Any]] = {
+        "fast": {"model": "", "max_tokens": 300, "temperature": 0.5},
+        "standard": {"model": "", "max_tokens": 800, "temperature": 0.7},
+        "strong": {"model": "", "max_tokens": 1000, "temperature": 0.4},
+    }
+    MODEL_ROUTES: List[Dict[str, str]] = [  # First matching rule wins; omitted keys match anything
+        {"intent": "complaint", "tier": "strong"},
+        {"intent": "handoff_request", "tier": "fast"},
+        {"intent": "general_inquiry", "complexity": "short", "tier": "fast"},
+        {"complexity": "long", "tier": "strong"},
+    ]
+    MODEL_DEFAULT_TIER: str = "standard"
+
+    # Admission control for LLM calls
+    LLM_MAX_CONCURRENCY: int = 16  # Turns talking to the provider at once
+    LLM_QUEUE_SIZE: int = 200  # Waiting turns beyond the cap before overflow
+    LLM_QUEUE_TIMEOUT: float = 20.0  # Seconds a turn may wait for a slot
+    LLM_TENANT_WEIGHTS: Dict[str, float] = {}  # e.g. {"company:1": 2}; default weight 1
+    LLM_OVERFLOW_POLICY: str = "canned"  # canned (ask to retry) | handoff (switch chat to HUMAN)
+    BATCH_CONCURRENCY: int = 8  # Items of one /ai/process/batch call in flight; keep below LLM_MAX_CONCURRENCY
+    BATCH_MAX_ITEMS: int = 1000
+
+    # Burst coalescing of widget messages into one AI turn
+    CHAT_DEBOUNCE_WINDOW: float = 1.5  # Seconds of quiet before answering; 0 answers every message
+    CHAT_DEBOUNCE_MAX_WAIT: float = 6.0  # Longest wait after the first message of a burst
+
+    # Operator inbox (GET /chats/inbox) and chat history pages (GET /chats/{id}/messages)
+    INBOX_PAGE_SIZE: int = 50  # Chats per page unless the caller asks for fewer
+    INBOX_MAX_PAGE_SIZE: int = 200
+    INBOX_PREVIEW_CHARS: int = 120  # Last message preview length
+    CHAT_MESSAGES_PAGE_SIZE: int = 50  # Messages in chat detail and per history page
+    CHAT_MESSAGES_MAX_PAGE_SIZE: int = 200
+
+    # Background job queue (AI turns of widget chats)
+    JOB_QUEUE_BACKEND: str = "database"  # database (durable, `jobs` table) | memory (tests, scripts)
+    JOB_WORKERS: int = 8  # Jobs run at once per process; LLM calls inside still wait for admission
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF: float = 2.0  # Seconds before the first retry, doubled per attempt
+    JOB_POLL_INTERVAL: float = 1.0  # Seconds between polls when no job is ready; also how soon a job cancelled elsewhere stops
+    JOB_LEASE: float = 120.0  # A running job whose worker stops renewing this is queued again
+    JOB_RETENTION_HOURS: int = 72  # Finished jobs are deleted after this
+
+    # LLM transport: deadlines, retries, hedging, circuit breaker
+    LLM_DEADLINE: float = 30.0  # Seconds per call, all attempts included
+    LLM_CLASSIFY_DEADLINE: float = 8.0  # Intent classification is optional, so give up sooner
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BACKOFF: float = 0.3  # Seconds; full jitter, doubled per attempt
+    LLM_HEDGE_ENABLED: bool = False  # Duplicate slow non-streaming calls after the p95 latency
+    LLM_HEDGE_MIN_DELAY: float = 1.0  # Seconds; never hedge earlier than this
+    LLM_BREAKER_FAILURES: int = 5  # Failed calls in a row that open the circuit
+    LLM_BREAKER_COOLDOWN: float = 30.0  # Seconds before a probe call is let through
+
+    # Agent config cache and cross-worker invalidation
+    AGENT_CACHE_TTL: int = 300  # Seconds; safety net when invalidations cannot reach a worker
+    CACHE_INVALIDATION_BACKEND: str = "local"  # local | redis (pub/sub across uvicorn workers)
+
+    # Answer cache for repeated questions
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIZE: int = 2000  # In-memory LRU entries
+    ANSWER_CACHE_TTL: int = 6 * 3600  # Seconds
+    ANSWER_CACHE_SQLITE_PATH: str = ""  # Optional shared on-disk tier, e.g. "answer_cache.db"
+
+    # Knowledge retrieval
+    KNOWLEDGE_CHUNK_CHARS: int = 600  # Target chunk size when splitting knowledge files
+    KNOWLEDGE_TOP_K: int = 5  # Chunks injected into the prompt per message
+    RETRIEVAL_MODE: str = "bm25"  # bm25 | dense | hybrid
+    KNOWLEDGE_INDEX_DIR: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "knowledge_index")
+    EMBEDDING_BACKEND: str = "hashing"  # hashing (offline) | openai (uses OPENAI_BASE_URL)
+    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIM: int = 512  # Hashing embedder only
+
+    # Knowledge file ingestion (text extraction runs as a background job)
+    KNOWLEDGE_UPLOAD_DIR: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")  # Content-addressed blobs and extracted text
+    KNOWLEDGE_MAX_FILE_MB: int = 25
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024  # Uploads are streamed to disk in pieces of this size
+    KNOWLEDGE_MAX_PAGES: int = 500  # Longer PDFs are rejected
+    EXTRACTION_PROCESSES: int = 2  # Worker processes parsing PDFs, shared by all extraction jobs
+    EXTRACTION_PAGES_PER_TASK: int = 8  # Pages one process extracts per task; also the progress step
+
+    # Direct price lookup over price list rows parsed from knowledge files
+    PRICE_LOOKUP_ENABLED: bool = True
+    PRICE_LOOKUP_LIMIT: int = 5  # Rows put in the prompt / reply
+    PRICE_MATCH_MIN_SCORE: float = 0.35  # Trigram (Dice) similarity of question and row name
+    PRICE_MATCH_RELATIVE: float = 0.85  # Rows below this share of the best score are dropped
+    PRICE_REPLY_MODE: str = "llm"  # llm (rows go to the prompt) | template (confident price questions skip the LLM)
+    PRICE_DIRECT_MIN_SCORE: float = 0.6  # Best row score needed for a template reply
+
+    # Prompt token budget (persona + knowledge + history + message)
+    CONTEXT_TOKEN_BUDGET: int = 6000  # Models missing from CONTEXT_TOKEN_BUDGETS
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {"gpt-4o-mini": 12000, "gpt-4o": 12000}  # JSON in .env
+
+    # Rolling chat summaries
+    SUMMARY_ENABLED: bool = True
+    SUMMARY_KEEP_RECENT: int = 6  # Newest messages always sent verbatim
+    SUMMARY_TRIGGER: int = 8  # Unsummarized messages beyond the verbatim ones that trigger folding
+    SUMMARY_BATCH_MAX: int = 40  # Messages folded per LLM call
+    SUMMARY_MAX_WORDS: int = 150
+    SUMMARY_MODEL: str = ""  # Empty means OPENAI_MODEL
+
+    # Per-turn latency tracing (/debug/traces)
+    TRACE_ENABLED: bool = True
+    TRACE_BUFFER_SIZE: int = 500  # Finished traces kept in memory
+    TRACE_OTLP_ENDPOINT: str = ""  # e.g. "http://localhost:4318/v1/traces"; needs opentelemetry-sdk
+    TRACE_SERVICE_NAME: str = "profit-flow-backend"
 
     class Config:
         env_file = ".env"
@@ -1,12 +1,14 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from contextlib import asynccontextmanager
+from typing import Optional
 import os
 import socketio
 
-from src.database import engine, Base
+from src.config import settings
+from src.database import engine, Base, AsyncSessionLocal
 from src.socket_manager import sio
 
 # Get the directory where main.py is located
@@ -20,9 +22,39 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     print("Database tables ready!")
+
+    # Index knowledge files uploaded before chunked retrieval existed
+    from src.modules.ai_engine.retrieval import KnowledgeIndex
+    from src.modules.ai_engine.prices import PriceIndex
+    from src.modules.ai_engine.vector_store import DenseIndex
+    from src.modules.ai_engine.intent_classifier import intent_classifier
+    async with AsyncSessionLocal() as db:
+        indexed = await KnowledgeIndex(db).backfill()
+        if indexed:
+            print(f"Indexed {indexed} knowledge files for retrieval")
+        parsed = await PriceIndex(db).backfill()
+        if parsed:
+            print(f"Parsed price rows of {parsed} knowledge files")
+        if settings.RETRIEVAL_MODE in ("dense", "hybrid"):
+            try:
+                added, removed = await DenseIndex(db).sync()
+                print(f"Vector index synced: +{added} / -{removed} chunks")
+            except Exception as e:
+                print(f"Error syncing vector index: {e}")
+        if settings.INTENT_CLASSIFIER_ENABLED:
+            logged = await intent_classifier.train_from_messages(db)
+            print(f"Intent classifier trained on {logged} labelled messages")
+    from src.modules.agent.cache import invalidation_bus
+    from src.task_queue import job_queue
+    from src.modules.agent.extraction import document_extractor
+    await invalidation_bus.start()
+    await job_queue.start()
     yield
     # Shutdown: Close connections
     print("Profit Flow Backend Shutting Down...")
+    await job_queue.stop()
+    document_extractor.shutdown()
+    await invalidation_bus.stop()
 
 # Rename to fastapi_app to avoid confusion
 fastapi_app = FastAPI(
@@ -58,6 +90,7 @@ from src.modules.onboarding.router import router as onboarding_router
 from src.modules.integrations.telegram.router import router as telegram_router
 from src.modules.integrations.vk.router import router as vk_router
 from src.modules.admin.router import router as admin_router
+from src.modules.admin.deps import get_current_admin
 from src.modules.auth.router import router as auth_router
 
 fastapi_app.include_router(auth_router)
@@ -90,6 +123,20 @@ async def test_widget():
 async def health_check():
     return {"status": "ok", "service": "Profit Flow Backend"}
 
+@fastapi_app.get("/debug/traces", dependencies=[Depends(get_current_admin)])
+async def debug_traces(limit: int = 20, name: Optional[str] = None):
+    """
+    Slowest recent traces with their stage breakdown, plus p50/p95 per stage.
+    name filters by trace, e.g. socket.send_message or ai.process_message.
+    Admins only: traces identify chats, tenants and what they asked about.
+    """
+    from src.tracing import tracer
+    return {
+        "buffered": len(tracer.traces),
+        "stages": tracer.stage_summary(name),
+        "slowest": [t.to_dict() for t in tracer.slowest(limit, name)],
+    }
+
 @fastapi_app.get("/")
 async def root():
     return {"message": "Welcome to Profit Flow AI Platform API"}
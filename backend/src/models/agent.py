@@ -1,6 +1,9 @@
-from sqlalchemy import Column, String, Text, JSON, Integer, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, JSON, Integer, Numeric, ForeignKey, Enum as SQLEnum
+from sqlalchemy.orm import deferred, relationship
+from src.database import Base
 from src.models.base import BaseModel
+from src.models.types import CompressedText
+import enum
 
 
 class AgentConfig(BaseModel):
@@ -15,13 +18,68 @@ class AgentConfig(BaseModel):
     knowledge_files = relationship("KnowledgeFile", back_populates="agent", cascade="all, delete-orphan")
 
 
+class KnowledgeFileStatus(str, enum.Enum):
+    PROCESSING = "PROCESSING"  # Text extraction job queued or running
+    READY = "READY"            # Extracted and indexed for retrieval
+    FAILED = "FAILED"          # Could not be extracted, see error
+
+
 class KnowledgeFile(BaseModel):
     __tablename__ = "knowledge_files"
 
     agent_id = Column(Integer, ForeignKey("agent_configs.id"))
     filename = Column(String)
-    file_path = Column(String)
+    file_path = Column(String)  # Blob in the knowledge store (src.modules.agent.storage)
     file_size = Column(Integer)
-    content = Column(Text, nullable=True)  # Extracted text content
+    sha256 = Column(String(64), index=True, nullable=True)  # Key in the knowledge store
+    # Extracted text of files uploaded before the knowledge store. Compressed and
+    # deferred: only retrieval reads it, with undefer(KnowledgeFile.content)
+    content = deferred(Column(CompressedText, nullable=True))
+    status = Column(SQLEnum(KnowledgeFileStatus), default=KnowledgeFileStatus.READY)
+    job_id = Column(Integer, nullable=True)  # Extraction job in src.task_queue
+    pages_total = Column(Integer, nullable=True)  # PDFs only; progress of the extraction
+    pages_done = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    price_count = Column(Integer, nullable=True)  # Rows in knowledge_prices; None until parsed
     
     agent = relationship("AgentConfig", back_populates="knowledge_files")
+
+
+class KnowledgeChunk(BaseModel):
+    """A retrieval unit cut from a knowledge file's extracted text."""
+    __tablename__ = "knowledge_chunks"
+
+    file_id = Column(Integer, ForeignKey("knowledge_files.id"), index=True)
+    position = Column(Integer)  # Order of the chunk inside the file
+    content = Column(Text)
+    length = Column(Integer)  # Number of indexed terms (BM25 document length)
+
+
+class KnowledgePosting(Base):
+    """Inverted index entry: term -> chunk with its term frequency."""
+    __tablename__ = "knowledge_postings"
+
+    term = Column(String, primary_key=True)
+    chunk_id = Column(Integer, ForeignKey("knowledge_chunks.id"), primary_key=True, index=True)
+    tf = Column(Integer, default=1)
+
+
+class KnowledgePrice(BaseModel):
+    """A price list row parsed from a knowledge file, for direct price lookup."""
+    __tablename__ = "knowledge_prices"
+
+    file_id = Column(Integer, ForeignKey("knowledge_files.id"), index=True)
+    position = Column(Integer)  # Order of the row inside the file
+    section = Column(String, nullable=True)  # Table heading, e.g. "LADA GRANTA"
+    name = Column(String)
+    article = Column(String, index=True, nullable=True)  # Upper case
+    price = Column(Numeric(12, 2))
+    trigram_count = Column(Integer)  # Distinct trigrams of name + section
+
+
+class KnowledgePriceTrigram(Base):
+    """Trigram index entry: trigram of a price row's name -> the row."""
+    __tablename__ = "knowledge_price_trigrams"
+
+    trigram = Column(String, primary_key=True)
+    price_id = Column(Integer, ForeignKey("knowledge_prices.id"), primary_key=True, index=True)
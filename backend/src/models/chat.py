@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Text, Enum as SQLEnum, Integer, JSON
+from sqlalchemy import Column, String, ForeignKey, Text, Enum as SQLEnum, Integer, JSON, Index
 from sqlalchemy.orm import relationship
 from src.models.base import BaseModel
 import enum
@@ -34,10 +34,23 @@ class Chat(BaseModel):
     status = Column(SQLEnum(ChatStatus), default=ChatStatus.AI)
     item_name = Column(String, nullable=True)  # For Avito: product name
     unread_count = Column(Integer, default=0)
+    summary = Column(Text, nullable=True)  # Rolling summary of messages folded out of the prompt
+    summary_until_message_id = Column(Integer, nullable=True)  # Last message included in the summary
+    summary_source_tokens = Column(Integer, default=0)  # Prompt tokens of the messages it replaces
+    last_message_id = Column(Integer, nullable=True)  # Newest message, for the inbox preview
     
     messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan", order_by="Message.created_at")
     client = relationship("ChatClient", back_populates="chat", uselist=False, cascade="all, delete-orphan")
 
+    # Not a column: ChatService sets it when messages hold only the newest page
+    has_more_messages = False
+
+    __table_args__ = (
+        # Keyset pagination of the inbox, newest activity first
+        Index("ix_chats_updated_at_id", "updated_at", "id"),
+        Index("ix_chats_status_updated_at_id", "status", "updated_at", "id"),
+    )
+
 
 class Message(BaseModel):
     __tablename__ = "messages"
@@ -45,9 +58,15 @@ class Message(BaseModel):
     chat_id = Column(Integer, ForeignKey("chats.id"))
     role = Column(SQLEnum(MessageRole))
     content = Column(Text)
+    intent = Column(String, nullable=True)  # LLM-labelled intent of user messages (classifier training data)
     
     chat = relationship("Chat", back_populates="messages")
 
+    __table_args__ = (
+        # History pages of one chat (keyset on id) and its newest message
+        Index("ix_messages_chat_id_id", "chat_id", "id"),
+    )
+
 
 class ChatClient(BaseModel):
     """Client/contact info associated with a chat"""
@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import Column, String, Text, Enum as SQLEnum, Integer, JSON, DateTime
+from src.models.base import BaseModel
+import enum
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"  # Out of attempts
+    CANCELLED = "cancelled"
+
+
+class Job(BaseModel):
+    """A unit of background work for src.task_queue (e.g. one AI turn)."""
+    __tablename__ = "jobs"
+
+    kind = Column(String, index=True)  # Name of the registered handler
+    key = Column(String, index=True, nullable=True)  # Jobs with the same key run one at a time, e.g. "chat:12"
+    payload = Column(JSON, default=dict)
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, index=True)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow, index=True)  # Retries are delayed
+    locked_until = Column(DateTime, nullable=True)  # Lease of the worker running it
+    error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)
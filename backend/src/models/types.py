@@ -0,0 +1,21 @@
+import zlib
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed in a binary column; reads return str."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(value.encode("utf-8"))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value  # SQLite keeps the type of rows written before compression
+        return zlib.decompress(value).decode("utf-8")
@@ -0,0 +1,183 @@
+"""
+Read-through cache of the agent configuration and knowledge metadata.
+
+Every AI turn needs the agent persona, the config version, the knowledge
+fingerprint, the BM25 corpus statistics and the number of price rows. These
+change a few times a week, so they are loaded once into an immutable
+AgentSnapshot and reused until AgentService writes invalidate it.
+
+Invalidation goes through InvalidationBus. With CACHE_INVALIDATION_BACKEND=redis
+it is also published on a Redis channel, so every uvicorn worker drops its
+copy immediately. AGENT_CACHE_TTL is a safety net for deployments without Redis.
+"""
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.agent import KnowledgeChunk, KnowledgePrice
+from src.modules.ai_engine.answer_cache import answer_cache
+
+
+@dataclass(frozen=True)
+class AgentSnapshot:
+    id: int
+    name: str
+    role: str
+    tone: str
+    system_prompt: Optional[str]
+    skills: dict
+    config_version: str
+    knowledge_version: str
+    chunk_count: int
+    avg_chunk_length: float
+    price_count: int = 0  # Parsed price list rows; no lookup when 0
+    loaded_at: float = field(default_factory=time.time)
+
+
+class InvalidationBus:
+    """Fan-out of cache invalidations to local listeners and other workers."""
+
+    CHANNEL = "profitflow:agent-cache"
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._listeners: List[Callable[[bool], Awaitable[None]]] = []
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+
+    def on_invalidate(self, callback: Callable[[bool], Awaitable[None]]):
+        """Register callback(from_this_worker) to run on every invalidation."""
+        self._listeners.append(callback)
+
+    async def start(self):
+        """Subscribe to invalidations from other workers (redis backend only)."""
+        if settings.CACHE_INVALIDATION_BACKEND != "redis" or self._task:
+            return
+        try:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+            pubsub = self._redis.pubsub()
+            await pubsub.subscribe(self.CHANNEL)
+            self._task = asyncio.create_task(self._listen(pubsub))
+            print(f"Cache invalidation bus listening on redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}")
+        except Exception as e:
+            print(f"Cache invalidation bus unavailable, using local invalidation only: {e}")
+            self._redis = None
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def publish(self):
+        """Invalidate locally and tell the other workers."""
+        await self._dispatch(from_this_worker=True)
+        if self._redis:
+            try:
+                await self._redis.publish(self.CHANNEL, self.worker_id)
+            except Exception as e:
+                print(f"Error publishing cache invalidation: {e}")
+
+    async def _listen(self, pubsub):
+        async for message in pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            origin = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+            if origin != self.worker_id:
+                await self._dispatch(from_this_worker=False)
+
+    async def _dispatch(self, from_this_worker: bool):
+        for callback in self._listeners:
+            try:
+                await callback(from_this_worker)
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+
+
+class AgentCache:
+    """Versioned read-through cache holding one AgentSnapshot."""
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl or settings.AGENT_CACHE_TTL
+        self._snapshot: Optional[AgentSnapshot] = None
+        self._generation = 0  # Bumped on every invalidation
+        self._lock = asyncio.Lock()
+        self.stats = {"hits": 0, "loads": 0, "invalidations": 0}
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and time.time() - self._snapshot.loaded_at < self.ttl
+
+    async def get(self, db: AsyncSession) -> AgentSnapshot:
+        if self._fresh():
+            self.stats["hits"] += 1
+            return self._snapshot
+        async with self._lock:
+            if self._fresh():
+                self.stats["hits"] += 1
+                return self._snapshot
+            generation = self._generation
+            snapshot = await self._load(db)
+            # A write that landed while loading makes this snapshot stale already
+            if generation == self._generation:
+                self._snapshot = snapshot
+            self.stats["loads"] += 1
+            return snapshot
+
+    async def invalidate(self, from_this_worker: bool = True):
+        self._generation += 1
+        self._snapshot = None
+        self.stats["invalidations"] += 1
+
+    async def _load(self, db: AsyncSession) -> AgentSnapshot:
+        from .service import AgentService
+
+        service = AgentService(db)
+        config = await service.get_config(with_knowledge=False)
+        knowledge_version = await service.get_knowledge_version()
+
+        stats = await db.execute(
+            select(func.count(KnowledgeChunk.id), func.avg(KnowledgeChunk.length))
+        )
+        chunk_count, avg_length = stats.one()
+        price_count = (await db.execute(select(func.count(KnowledgePrice.id)))).scalar()
+
+        return AgentSnapshot(
+            id=config.id,
+            name=config.name,
+            role=config.role,
+            tone=config.tone,
+            system_prompt=config.system_prompt,
+            skills=dict(config.skills or {}),
+            config_version=AgentService.config_version(config),
+            knowledge_version=knowledge_version,
+            chunk_count=chunk_count or 0,
+            avg_chunk_length=float(avg_length or 1),
+            price_count=price_count or 0
+        )
+
+    def snapshot_stats(self) -> dict:
+        return {
+            **self.stats,
+            "cached": self._snapshot is not None,
+            "config_version": self._snapshot.config_version if self._snapshot else None,
+            "knowledge_version": self._snapshot.knowledge_version if self._snapshot else None,
+            "ttl": self.ttl,
+            "backend": settings.CACHE_INVALIDATION_BACKEND,
+        }
+
+
+invalidation_bus = InvalidationBus()
+agent_cache = AgentCache()
+invalidation_bus.on_invalidate(agent_cache.invalidate)
+# The answer cache's SQLite tier is shared, so only the writing worker clears it
+invalidation_bus.on_invalidate(lambda from_this_worker: answer_cache.invalidate(disk=from_this_worker))
@@ -0,0 +1,130 @@
+"""
+Text extraction for knowledge files, off the event loop.
+
+pypdf is pure Python and CPU-bound: parsing a 200-page catalog inside a
+request handler froze every request and websocket of the process for
+seconds. Extraction runs in a pool of EXTRACTION_PROCESSES worker processes
+instead. A PDF's pages are split into tasks of EXTRACTION_PAGES_PER_TASK
+pages that run in parallel, and the caller is told how many pages are done
+as tasks finish. PDFs over KNOWLEDGE_MAX_PAGES are rejected.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from src.config import settings
+
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]  # (pages done, pages total)
+
+
+class ExtractionError(Exception):
+    """The file cannot be turned into text; trying again will not help."""
+
+
+# Run in the worker processes, so they stay module-level and take a path, not bytes
+
+def _count_pages(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def _extract_pages(path: str, start: int, stop: int) -> List[str]:
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        raise ExtractionError("File is neither a PDF nor UTF-8 text")
+
+
+class DocumentExtractor:
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        pages_per_task: Optional[int] = None,
+        max_pages: Optional[int] = None
+    ):
+        self.processes = processes or settings.EXTRACTION_PROCESSES
+        self.pages_per_task = pages_per_task or settings.EXTRACTION_PAGES_PER_TASK
+        self.max_pages = max_pages or settings.KNOWLEDGE_MAX_PAGES
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: a forked child would inherit the event loop, sockets and DB connections
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def extract(self, path: str, filename: str, progress: Optional[ProgressCallback] = None) -> str:
+        """Text of the stored file. Raises ExtractionError for files that cannot be read."""
+        if not filename.lower().endswith(".pdf"):
+            return await asyncio.to_thread(_read_text, path)
+
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        try:
+            total = await self._run(loop, pool, _count_pages, path)
+        except (BrokenProcessPool, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            raise ExtractionError(f"Cannot read PDF: {e}") from e
+        if total > self.max_pages:
+            raise ExtractionError(f"PDF has {total} pages, the limit is {self.max_pages}")
+        if progress:
+            await progress(0, total)
+
+        async def extract_range(start: int, stop: int) -> Tuple[int, List[str]]:
+            return start, await self._run(loop, pool, _extract_pages, path, start, stop)
+
+        tasks = [
+            asyncio.create_task(extract_range(start, min(start + self.pages_per_task, total)))
+            for start in range(0, total, self.pages_per_task)
+        ]
+        pages: List[str] = [""] * total
+        done = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                try:
+                    start, texts = await finished
+                except (BrokenProcessPool, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    raise ExtractionError(f"Cannot extract text from PDF: {e}") from e
+                pages[start:start + len(texts)] = texts
+                done += len(texts)
+                if progress:
+                    await progress(done, total)
+        finally:
+            # Pages not started yet are dropped from the pool's queue
+            for task in tasks:
+                task.cancel()
+        return "\n".join(pages)
+
+    async def _run(self, loop, pool, fn, *args):
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); the next extraction gets a fresh pool
+            if self._pool is pool:
+                self._pool = None
+            raise
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+document_extractor = DocumentExtractor()
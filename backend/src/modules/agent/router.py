@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
+from src.config import settings
 from src.database import get_db
 from .schemas import AgentConfigResponse, AgentConfigCreate, KnowledgeFileResponse
 from .service import AgentService
@@ -32,13 +33,33 @@ async def upload_knowledge(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db)
 ):
-    """Upload a knowledge base file and process it."""
+    """
+    Upload a knowledge base file; its text is extracted by a background job (see job_id).
+    Re-uploading an identical file returns the existing one.
+    """
+    if file.size is not None and file.size > settings.KNOWLEDGE_MAX_FILE_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"File is larger than {settings.KNOWLEDGE_MAX_FILE_MB} MB")
     service = AgentService(db)
-    content = await file.read()
-    return await service.add_knowledge_file(
-        filename=file.filename,
-        content=content
-    )
+    try:
+        return await service.add_knowledge_file(
+            filename=file.filename,
+            read=file.read
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@router.get("/knowledge/{file_id}", response_model=KnowledgeFileResponse)
+async def get_knowledge(
+    file_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Knowledge file with its extraction status and progress."""
+    service = AgentService(db)
+    file = await service.get_knowledge_file(file_id)
+    if not file:
+        raise HTTPException(status_code=404, detail="Knowledge file not found")
+    return file
 
 
 @router.delete("/knowledge/{file_id}")
@@ -1,12 +1,20 @@
 from pydantic import BaseModel
 from typing import List, Optional, Dict
 from datetime import datetime
+from src.models.agent import KnowledgeFileStatus
 
 
 class KnowledgeFileResponse(BaseModel):
     id: int
     filename: str
     file_size: int
+    sha256: Optional[str] = None
+    status: KnowledgeFileStatus = KnowledgeFileStatus.READY
+    job_id: Optional[int] = None
+    pages_total: Optional[int] = None
+    pages_done: Optional[int] = None
+    error: Optional[str] = None
+    price_count: Optional[int] = None
     created_at: datetime
     
     class Config:
@@ -1,20 +1,45 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.orm import selectinload
 from typing import Optional
+import asyncio
+import hashlib
+import os
 
-from src.models.agent import AgentConfig, KnowledgeFile
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.models.agent import AgentConfig, KnowledgeFile, KnowledgeFileStatus
+from src.modules.ai_engine.knowledge import index_knowledge_file, remove_knowledge_file
+from src.task_queue import JobRecord, job_queue
+from .cache import invalidation_bus
+from .extraction import ExtractionError, document_extractor
+from .storage import Reader, knowledge_store
+
+
+KNOWLEDGE_EXTRACT_JOB = "knowledge_extract"
+
+
+def knowledge_key(file_id: int) -> str:
+    return f"knowledge:{file_id}"
+
+
+def _remove_upload(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 
 class AgentService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
-    async def get_config(self) -> AgentConfig:
+    async def get_config(self, with_knowledge: bool = True) -> AgentConfig:
         """Get the single agent config or create default."""
-        result = await self.db.execute(
-            select(AgentConfig).options(selectinload(AgentConfig.knowledge_files))
-        )
+        query = select(AgentConfig)
+        if with_knowledge:
+            query = query.options(selectinload(AgentConfig.knowledge_files))
+        result = await self.db.execute(query)
         config = result.scalar_one_or_none()
         
         if not config:
@@ -35,6 +60,24 @@ class AgentService:
             
         return config
 
+    @staticmethod
+    def config_version(config: Optional[AgentConfig]) -> str:
+        """Changes whenever the agent config is saved."""
+        if not config:
+            return "default"
+        return f"{config.id}:{config.updated_at.isoformat() if config.updated_at else ''}"
+
+    async def get_knowledge_version(self) -> str:
+        """Fingerprint of the knowledge base; changes on every upload or delete."""
+        result = await self.db.execute(
+            select(KnowledgeFile.id, KnowledgeFile.file_size, KnowledgeFile.updated_at)
+            .order_by(KnowledgeFile.id)
+        )
+        digest = hashlib.sha256()
+        for file_id, size, updated_at in result.all():
+            digest.update(f"{file_id}:{size}:{updated_at}|".encode())
+        return digest.hexdigest()[:16]
+
     async def update_config(self, config_data: dict) -> AgentConfig:
         """Update agent configuration."""
         config = await self.get_config()
@@ -45,6 +88,7 @@ class AgentService:
                 setattr(config, key, value)
                 
         await self.db.commit()
+        await invalidation_bus.publish()
         
         # Reload with eager loading for knowledge_files
         result = await self.db.execute(
@@ -54,49 +98,66 @@ class AgentService:
         )
         return result.scalar_one()
 
-    async def add_knowledge_file(self, filename: str, content: bytes) -> KnowledgeFile:
-        """Add a knowledge base file and extract its content."""
-        config = await self.get_config()
-        
-        extracted_text = ""
-        
-        # Extract text if PDF
-        if filename.lower().endswith('.pdf'):
-            try:
-                import io
-                from pypdf import PdfReader
-                
-                pdf_file = io.BytesIO(content)
-                reader = PdfReader(pdf_file)
-                
-                text_parts = []
-                for page in reader.pages:
-                    text_parts.append(page.extract_text())
-                
-                extracted_text = "\n".join(text_parts)
-                print(f"Extracted {len(extracted_text)} chars from {filename}")
-            except Exception as e:
-                print(f"Error extracting text from PDF: {e}")
-                extracted_text = "Error extracting text."
-        else:
-            # Try to decode as text
-            try:
-                extracted_text = content.decode('utf-8')
-            except:
-                pass
+    async def add_knowledge_file(self, filename: str, read: Reader) -> KnowledgeFile:
+        """
+        Stream an upload into the knowledge store and queue its text extraction.
+        The file is PROCESSING until the job marks it READY (or FAILED). An upload
+        identical to an existing file returns that file instead of a copy.
+        """
+        sha256, size = await knowledge_store.save_stream(read, settings.KNOWLEDGE_MAX_FILE_MB * 1024 * 1024)
+        config = await self.get_config(with_knowledge=False)
+
+        result = await self.db.execute(
+            select(KnowledgeFile)
+            .where(
+                KnowledgeFile.agent_id == config.id,
+                KnowledgeFile.sha256 == sha256,
+                KnowledgeFile.status != KnowledgeFileStatus.FAILED
+            )
+            .order_by(KnowledgeFile.id)
+            .limit(1)
+        )
+        existing = result.scalar_one_or_none()
+        if existing:
+            print(f"Knowledge file {filename} is identical to {existing.filename} (id {existing.id}), linked")
+            return existing
 
         file = KnowledgeFile(
             agent_id=config.id,
             filename=filename,
-            file_path=f"/uploads/{filename}",
-            file_size=len(content),
-            content=extracted_text
+            file_path=knowledge_store.blob_path(sha256),
+            file_size=size,
+            sha256=sha256,
+            status=KnowledgeFileStatus.PROCESSING
         )
         self.db.add(file)
+        # Committed before enqueueing: a worker in another process must see the row
+        await self.db.commit()
+
+        file.job_id = await job_queue.enqueue(
+            KNOWLEDGE_EXTRACT_JOB, {"file_id": file.id}, key=knowledge_key(file.id)
+        )
         await self.db.commit()
         await self.db.refresh(file)
         return file
 
+    async def get_knowledge_file(self, file_id: int) -> Optional[KnowledgeFile]:
+        return await self.db.get(KnowledgeFile, file_id)
+
+    async def finish_knowledge_file(self, file_id: int, text: str) -> Optional[KnowledgeFile]:
+        """Index the extracted text (already in the store) for retrieval and mark the file READY."""
+        file = await self.db.get(KnowledgeFile, file_id)
+        if file is None:
+            return None  # Deleted while it was being extracted
+        file.status = KnowledgeFileStatus.READY
+        file.error = None
+        print(f"Extracted {len(text)} chars from {file.filename}")
+
+        # The status is committed together with the indexes
+        await index_knowledge_file(self.db, file, text)
+        await invalidation_bus.publish()
+        return file
+
     async def delete_knowledge_file(self, file_id: int):
         """Delete a knowledge base file record."""
         result = await self.db.execute(
@@ -104,5 +165,67 @@ class AgentService:
         )
         file = result.scalar_one_or_none()
         if file:
+            if file.status == KnowledgeFileStatus.PROCESSING:
+                await job_queue.cancel_key(knowledge_key(file.id), reason="deleted")
+            await remove_knowledge_file(self.db, file.id)
             await self.db.delete(file)
             await self.db.commit()
+            await invalidation_bus.publish()
+            await self._remove_stored(file)
+
+    async def _remove_stored(self, file: KnowledgeFile):
+        """Drop the file's blob and text unless an identical upload still uses them."""
+        if not file.sha256:
+            if file.file_path:
+                await asyncio.to_thread(_remove_upload, file.file_path)
+            return
+        result = await self.db.execute(
+            select(KnowledgeFile.id).where(KnowledgeFile.sha256 == file.sha256).limit(1)
+        )
+        if result.scalar_one_or_none() is None:
+            await knowledge_store.remove(file.sha256)
+
+
+async def extract_knowledge_file(job: JobRecord) -> dict:
+    """Job handler: extract the file's text in the process pool, then index it."""
+    file_id = job.payload["file_id"]
+    async with AsyncSessionLocal() as db:
+        file = await db.get(KnowledgeFile, file_id)
+        if file is None:
+            return {"skipped": "deleted"}
+        path, filename, sha256 = file.file_path, file.filename, file.sha256
+
+    async def progress(done: int, total: int):
+        # updated_at is kept so progress does not change the knowledge version
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(KnowledgeFile)
+                .where(KnowledgeFile.id == file_id)
+                .values(pages_done=done, pages_total=total, updated_at=KnowledgeFile.updated_at)
+            )
+            await db.commit()
+
+    # A blob uploaded before (then deleted and uploaded again) keeps its text
+    text = await knowledge_store.read_text(sha256) if sha256 else None
+    try:
+        if text is None:
+            text = await document_extractor.extract(path, filename, progress)
+            if sha256:
+                await knowledge_store.write_text(sha256, text)
+    except ExtractionError as e:
+        print(f"Error extracting text from {filename}: {e}")
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(KnowledgeFile)
+                .where(KnowledgeFile.id == file_id)
+                .values(status=KnowledgeFileStatus.FAILED, error=str(e))
+            )
+            await db.commit()
+        return {"status": "failed", "error": str(e)}
+
+    async with AsyncSessionLocal() as db:
+        file = await AgentService(db).finish_knowledge_file(file_id, text)
+    return {"status": "ready" if file else "deleted", "chars": len(text)}
+
+
+job_queue.register(KNOWLEDGE_EXTRACT_JOB, extract_knowledge_file)
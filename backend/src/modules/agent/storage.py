@@ -0,0 +1,119 @@
+"""
+Content-addressed store for uploaded knowledge files and their extracted text.
+
+Uploads are streamed to disk in UPLOAD_CHUNK_BYTES pieces and hashed on the
+way, so memory does not grow with the file size. A blob is kept once, under
+its SHA-256 (objects/ab/abcdef...), with the extracted text next to it,
+zlib-compressed (abcdef....txt.z). Identical uploads share the blob, and
+AgentService links them to the existing KnowledgeFile instead of indexing the
+same text twice.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+import zlib
+from typing import Awaitable, Callable, Optional, Tuple
+
+from src.config import settings
+
+
+Reader = Callable[[int], Awaitable[bytes]]  # e.g. UploadFile.read
+
+
+class KnowledgeStore:
+    def __init__(self, root: Optional[str] = None, chunk_bytes: Optional[int] = None):
+        self.root = root or settings.KNOWLEDGE_UPLOAD_DIR
+        self.chunk_bytes = chunk_bytes or settings.UPLOAD_CHUNK_BYTES
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def text_path(self, digest: str) -> str:
+        return self.blob_path(digest) + ".txt.z"
+
+    def _plain_text_path(self, digest: str) -> str:
+        # Texts written before they were compressed
+        return self.blob_path(digest) + ".txt"
+
+    async def save_stream(self, read: Reader, max_bytes: int) -> Tuple[str, int]:
+        """
+        Copy the stream into the store and return (sha256, size).
+        Raises ValueError once the stream exceeds max_bytes; nothing is kept then.
+        """
+        tmp_dir = os.path.join(self.root, "tmp")
+        await asyncio.to_thread(os.makedirs, tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            while True:
+                chunk = await read(self.chunk_bytes)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"File is larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(_remove, tmp_path)
+            raise
+        await asyncio.to_thread(f.close)
+
+        sha = digest.hexdigest()
+        await asyncio.to_thread(self._commit_blob, tmp_path, sha)
+        return sha, size
+
+    def _commit_blob(self, tmp_path: str, sha: str):
+        path = self.blob_path(sha)
+        if os.path.exists(path):
+            os.remove(tmp_path)  # Same content is already stored
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    async def write_text(self, digest: str, text: str):
+        await asyncio.to_thread(_write_text, self.text_path(digest), text)
+
+    async def read_text(self, digest: str) -> Optional[str]:
+        """Extracted text of the blob, None if it has not been extracted."""
+        return await asyncio.to_thread(_read_text, self.text_path(digest), self._plain_text_path(digest))
+
+    async def remove(self, digest: str):
+        """Delete the blob and its text; the caller checks nothing references them."""
+        await asyncio.to_thread(_remove, self.blob_path(digest))
+        await asyncio.to_thread(_remove, self.text_path(digest))
+        await asyncio.to_thread(_remove, self._plain_text_path(digest))
+
+
+def _write_text(path: str, text: str):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(zlib.compress(text.encode("utf-8")))
+    os.replace(tmp_path, path)
+
+
+def _read_text(path: str, plain_path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return zlib.decompress(f.read()).decode("utf-8")
+    except FileNotFoundError:
+        pass
+    try:
+        with open(plain_path, encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+knowledge_store = KnowledgeStore()
@@ -0,0 +1,163 @@
+"""
+Admission control for outbound LLM calls.
+
+At most LLM_MAX_CONCURRENCY turns talk to the provider at once. When they
+are all busy, requests wait in a weighted fair queue (start-time fair
+queuing): each tenant, a company or else a chat, advances its own virtual
+clock by 1/weight per request. A chat that sends fifty messages therefore
+queues behind its own backlog and not in front of everyone else. Requests that
+find the queue full, or wait longer than LLM_QUEUE_TIMEOUT, are rejected and
+get the overflow reply chosen by LLM_OVERFLOW_POLICY.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from src.config import settings
+from .metrics import LatencyTracker
+from .models import AIRequest, AIResponse
+
+
+OVERFLOW_REPLY = "Сейчас очень много обращений. Пожалуйста, повторите вопрос через минуту."
+HANDOFF_REPLY = "Сейчас очень много обращений, поэтому я передал ваш вопрос менеджеру. Он ответит в ближайшее время."
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason  # queue_full | timeout
+
+
+def tenant_for(request: AIRequest) -> str:
+    """Fair-queuing key: the company when the caller passes one, else the chat."""
+    company_id = (request.context or {}).get("company_id")
+    if company_id is not None:
+        return f"company:{company_id}"
+    return f"chat:{request.conversation_id}"
+
+
+def overflow_response(policy: Optional[str] = None) -> AIResponse:
+    """Reply for a turn that was not admitted."""
+    policy = policy or settings.LLM_OVERFLOW_POLICY
+    if policy == "handoff":
+        return AIResponse(
+            text=HANDOFF_REPLY,
+            intent="handoff_request",
+            intent_source="default",
+            suggested_actions=["connect_operator"],
+            generation_path="overflow",
+            handoff=True
+        )
+    return AIResponse(
+        text=OVERFLOW_REPLY,
+        intent="general_inquiry",
+        intent_source="default",
+        suggested_actions=["provide_info"],
+        generation_path="overflow"
+    )
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        weights: Optional[Dict[str, float]] = None
+    ):
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self.max_queue = max_queue if max_queue is not None else settings.LLM_QUEUE_SIZE
+        self.max_wait = max_wait or settings.LLM_QUEUE_TIMEOUT
+        self.weights = weights if weights is not None else settings.LLM_TENANT_WEIGHTS
+        self.active = 0
+        self._queue = []  # (virtual finish, seq, tenant, future)
+        self._queued = 0  # Live entries; cancelled ones stay in the heap until popped
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self.wait_tracker = LatencyTracker()
+        self.stats = Counter()
+        self.max_depth = 0
+        self.queued_by_tenant: Counter = Counter()
+
+    async def acquire(self, tenant: str):
+        """Wait for a slot; raises AdmissionRejected."""
+        if self.active < self.max_concurrency and not self._queued:
+            self.active += 1
+            self.stats["admitted"] += 1
+            self.wait_tracker.observe(0.0)
+            return
+        if self._queued >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            raise AdmissionRejected("queue_full")
+
+        start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish = start + 1.0 / max(self.weights.get(tenant, 1.0), 1e-6)
+        self._last_finish[tenant] = finish
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (finish, next(self._seq), tenant, future))
+        self._queued += 1
+        self.queued_by_tenant[tenant] += 1
+        self.max_depth = max(self.max_depth, self._queued)
+
+        enqueued = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the wait ended; pass it on
+                self.release()
+            else:
+                future.cancel()
+                self._dequeued(tenant)
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats["rejected_timeout"] += 1
+                raise AdmissionRejected("timeout")
+            raise
+        self.stats["admitted"] += 1
+        self.wait_tracker.observe((time.perf_counter() - enqueued) * 1000)
+
+    def release(self):
+        """Free a slot, handing it to the queued request with the earliest virtual finish."""
+        while self._queue:
+            finish, _, tenant, future = heapq.heappop(self._queue)
+            if future.cancelled():
+                continue
+            self._virtual_time = finish
+            self._dequeued(tenant)
+            future.set_result(None)  # The slot moves over; active stays the same
+            return
+        self.active -= 1
+
+    def _dequeued(self, tenant: str):
+        self._queued -= 1
+        self.queued_by_tenant[tenant] -= 1
+        if self.queued_by_tenant[tenant] <= 0:
+            del self.queued_by_tenant[tenant]
+            # A drained tenant whose finish the clock has passed starts from the clock anyway
+            if self._last_finish.get(tenant, 0.0) <= self._virtual_time:
+                self._last_finish.pop(tenant, None)
+        if not self._queued and self._last_finish:
+            # Idle queue: move the clock past every finish tag, as SFQ does, and forget them
+            self._virtual_time = max(self._virtual_time, max(self._last_finish.values()))
+            self._last_finish.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self._queued,
+            "max_queue_depth": self.max_depth,
+            "queue_size": self.max_queue,
+            "admitted": self.stats["admitted"],
+            "rejected_queue_full": self.stats["rejected_queue_full"],
+            "rejected_timeout": self.stats["rejected_timeout"],
+            "wait_ms": self.wait_tracker.snapshot(),
+            "queued_by_tenant": dict(self.queued_by_tenant.most_common(10)),
+        }
+
+
+admission = AdmissionController()
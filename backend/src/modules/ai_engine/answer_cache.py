@@ -0,0 +1,158 @@
+"""
+Answer cache for repeated customer questions.
+
+Keys combine the normalised question, the agent config version and a
+fingerprint of the knowledge base, so any change to the inputs of a reply
+produces a new key. Entries live in an in-memory LRU with TTL and, when
+ANSWER_CACHE_SQLITE_PATH is set, in a SQLite file shared by all workers.
+AgentService writes also clear the cache explicitly.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Optional
+
+from src.config import settings
+from .models import AIResponse
+from .retrieval import tokenize
+
+
+# Replies to these intents depend on the customer, not just the question
+CACHEABLE_INTENTS = {"pricing_query", "general_inquiry"}
+
+
+def normalize_question(text: str) -> str:
+    """Case, punctuation and inflection-insensitive form of a question."""
+    return " ".join(tokenize(text))
+
+
+class AnswerCache:
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        sqlite_path: Optional[str] = None
+    ):
+        self.max_size = max_size or settings.ANSWER_CACHE_SIZE
+        self.ttl = ttl or settings.ANSWER_CACHE_TTL
+        self.sqlite_path = sqlite_path if sqlite_path is not None else settings.ANSWER_CACHE_SQLITE_PATH
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, response dict, generation ms)
+        self._db_ready = False
+        self.stats = {
+            "hits_memory": 0,
+            "hits_disk": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "saved_ms": 0.0,
+        }
+
+    @staticmethod
+    def make_key(question: str, config_version: str, knowledge_version: str, context: Optional[dict] = None) -> str:
+        raw = json.dumps(
+            [normalize_question(question), config_version, knowledge_version, context or {}],
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[AIResponse]:
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry and entry[0] > now:
+            self._entries.move_to_end(key)
+            self.stats["hits_memory"] += 1
+            self.stats["saved_ms"] += entry[2]
+            return AIResponse(**entry[1])
+        if entry:
+            del self._entries[key]
+
+        if self.sqlite_path:
+            row = await asyncio.to_thread(self._disk_get, key, now)
+            if row:
+                payload, generation_ms, expires_at = row
+                self._remember(key, expires_at, json.loads(payload), generation_ms)
+                self.stats["hits_disk"] += 1
+                self.stats["saved_ms"] += generation_ms
+                return AIResponse(**json.loads(payload))
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, response: AIResponse, generation_ms: float = 0.0):
+        expires_at = time.time() + self.ttl
+        payload = response.model_dump()
+        self._remember(key, expires_at, payload, generation_ms)
+        self.stats["stores"] += 1
+        if self.sqlite_path:
+            await asyncio.to_thread(self._disk_set, key, json.dumps(payload, ensure_ascii=False), generation_ms, expires_at)
+
+    async def invalidate(self, disk: bool = True):
+        """Drop every entry (agent config or knowledge changed)."""
+        self._entries.clear()
+        self.stats["invalidations"] += 1
+        if disk and self.sqlite_path:
+            await asyncio.to_thread(self._disk_clear)
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits_memory"] + self.stats["hits_disk"] + self.stats["misses"]
+        hits = self.stats["hits_memory"] + self.stats["hits_disk"]
+        return {
+            **self.stats,
+            "saved_ms": round(self.stats["saved_ms"], 1),
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "disk": bool(self.sqlite_path),
+        }
+
+    def _remember(self, key: str, expires_at: float, payload: dict, generation_ms: float):
+        self._entries[key] = (expires_at, payload, generation_ms)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    # SQLite tier (runs in a worker thread)
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._db_ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.sqlite_path)), exist_ok=True)
+        conn = sqlite3.connect(self.sqlite_path, timeout=5)
+        if not self._db_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, payload TEXT, generation_ms REAL, expires_at REAL)"
+            )
+            self._db_ready = True
+        return conn
+
+    def _disk_get(self, key: str, now: float):
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "SELECT payload, generation_ms, expires_at FROM answers WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+
+    def _disk_set(self, key: str, payload: str, generation_ms: float, expires_at: float):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, payload, generation_ms, expires_at) VALUES (?, ?, ?, ?)",
+                (key, payload, generation_ms, expires_at)
+            )
+            conn.execute("DELETE FROM answers WHERE expires_at <= ?", (time.time(),))
+
+    def _disk_clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM answers")
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,174 @@
+"""
+Token-budgeted packing of the prompt context.
+
+Each model gets a prompt budget (settings.CONTEXT_TOKEN_BUDGETS, falling back
+to CONTEXT_TOKEN_BUDGET). The persona, business info and the user message are
+always sent; the rest of the budget is filled by priority:
+1. knowledge chunks, most relevant first
+2. history, newest message first, stopping at the first one that does not fit
+   so the kept history stays contiguous
+The only partial item is the top knowledge chunk or the newest history message
+when nothing else of its kind fits. Packing is deterministic for equal inputs.
+
+Tokens are counted with tiktoken when it is installed, otherwise with a local
+approximation that errs on the side of overcounting Cyrillic text.
+"""
+import math
+import re
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from src.config import settings
+from .retrieval import ScoredChunk, format_chunk
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency
+    tiktoken = None
+
+
+MESSAGE_OVERHEAD = 4  # Role and separator tokens the chat format adds per message
+MIN_PARTIAL_TOKENS = 64  # Smaller remainders are not worth a truncated item
+TRUNCATION_MARK = "…"
+CHARS_PER_TOKEN = 3  # Approximate counter: Cyrillic words split into ~3-char pieces
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+class TokenCounter:
+    def __init__(self, model: Optional[str] = None):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    self.encoding = tiktoken.encoding_for_model(model or "")
+                except KeyError:  # Unknown model name: the encoding of current OpenAI models
+                    self.encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:  # e.g. the BPE file cannot be downloaded
+                print(f"tiktoken unavailable, approximating token counts: {e}")
+        self.name = self.encoding.name if self.encoding else "approx"
+        self.count = lru_cache(maxsize=8192)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.encoding:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return sum(math.ceil(len(t) / CHARS_PER_TOKEN) for t in _TOKEN_RE.findall(text))
+
+    def truncate(self, text: str, max_tokens: int, keep_tail: bool = False) -> str:
+        """Cut text to at most max_tokens, keeping its start (or its end)."""
+        if self.count(text) <= max_tokens:
+            return text
+        max_tokens -= 1  # Room for the truncation mark
+        if self.encoding:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            kept = tokens[-max_tokens:] if keep_tail else tokens[:max_tokens]
+            text = self.encoding.decode(kept) if max_tokens > 0 else ""
+        else:
+            matches = list(_TOKEN_RE.finditer(text))
+            if keep_tail:
+                matches.reverse()
+            used = 0
+            cut = 0 if not keep_tail else len(text)
+            for match in matches:
+                used += math.ceil(len(match.group()) / CHARS_PER_TOKEN)
+                if used > max_tokens:
+                    break
+                cut = match.start() if keep_tail else match.end()
+            text = text[cut:] if keep_tail else text[:cut]
+        return TRUNCATION_MARK + text.lstrip() if keep_tail else text.rstrip() + TRUNCATION_MARK
+
+
+@dataclass
+class PackedContext:
+    knowledge: List[ScoredChunk]
+    history: List[dict]
+    tokens: int
+    budget: int
+    dropped_chunks: int = 0
+    dropped_messages: int = 0
+    truncated: List[str] = field(default_factory=list)  # "knowledge:<chunk_id>" / "history"
+
+
+class ContextPacker:
+    def __init__(self, budget: int, counter: TokenCounter):
+        self.budget = budget
+        self.counter = counter
+
+    def message_tokens(self, text: str) -> int:
+        return self.counter.count(text) + MESSAGE_OVERHEAD
+
+    def pack(
+        self,
+        fixed: List[str],
+        knowledge: List[ScoredChunk],
+        history: List[dict]
+    ) -> PackedContext:
+        """
+        fixed: messages that are always sent (persona, business info, user message).
+        knowledge: chunks in relevance order. history: oldest to newest.
+        """
+        used = sum(self.message_tokens(text) for text in fixed)
+        packed = PackedContext(knowledge=[], history=[], tokens=used, budget=self.budget)
+
+        for chunk in knowledge:
+            remaining = self.budget - packed.tokens
+            # Chunks share the knowledge message, so only the separator is extra
+            cost = self.counter.count(format_chunk(chunk)) + 1
+            if cost <= remaining:
+                packed.knowledge.append(chunk)
+                packed.tokens += cost
+            elif not packed.knowledge and remaining >= MIN_PARTIAL_TOKENS:
+                header = self.counter.count(format_chunk(replace(chunk, content="")))
+                content = self.counter.truncate(chunk.content, remaining - header - 1)
+                packed.knowledge.append(replace(chunk, content=content))
+                packed.tokens += self.counter.count(format_chunk(packed.knowledge[-1])) + 1
+                packed.truncated.append(f"knowledge:{chunk.chunk_id}")
+            else:
+                packed.dropped_chunks += 1
+
+        kept = []
+        for index in range(len(history) - 1, -1, -1):
+            msg = history[index]
+            remaining = self.budget - packed.tokens
+            cost = self.message_tokens(msg["content"])
+            if cost <= remaining:
+                kept.append(msg)
+                packed.tokens += cost
+                continue
+            if not kept and remaining >= MIN_PARTIAL_TOKENS:
+                content = self.counter.truncate(msg["content"], remaining - MESSAGE_OVERHEAD, keep_tail=True)
+                kept.append({**msg, "content": content})
+                packed.tokens += self.message_tokens(content)
+                packed.truncated.append("history")
+                index -= 1
+            packed.dropped_messages = index + 1
+            break
+        packed.history = list(reversed(kept))
+
+        if packed.dropped_chunks or packed.dropped_messages or packed.truncated:
+            print(
+                f"Context packing ({packed.tokens}/{self.budget} tokens, {self.counter.name}): "
+                f"dropped {packed.dropped_chunks} knowledge chunks, {packed.dropped_messages} history messages, "
+                f"truncated {packed.truncated or 'nothing'}"
+            )
+        return packed
+
+
+_counters: Dict[str, TokenCounter] = {}
+
+
+def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    model = model or settings.OPENAI_MODEL
+    if model not in _counters:
+        _counters[model] = TokenCounter(model)
+    return _counters[model]
+
+
+def budget_for_model(model: Optional[str] = None) -> int:
+    model = model or settings.OPENAI_MODEL
+    return settings.CONTEXT_TOKEN_BUDGETS.get(model, settings.CONTEXT_TOKEN_BUDGET)
+
+
+def get_packer(model: Optional[str] = None) -> ContextPacker:
+    return ContextPacker(budget_for_model(model), get_token_counter(model))
@@ -0,0 +1,112 @@
+"""
+Text embedders for dense knowledge retrieval.
+
+All embedders return L2-normalised float32 matrices (one row per text), so a
+dot product between rows is their cosine similarity.
+"""
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from src.config import settings
+from .retrieval import tokenize
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class Embedder(ABC):
+    """Interface: turn a batch of texts into a (len(texts), dim) matrix."""
+
+    name: str = "base"
+
+    @abstractmethod
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+
+@lru_cache(maxsize=200_000)
+def _feature_slot(feature: str, dim: int) -> tuple:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, 1.0 if value >> 63 else -1.0
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic offline embedder: hashed word and character n-gram features.
+    Shared character trigrams let inflected forms ("колодки" / "колодок")
+    land close together without any model download.
+    """
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or settings.EMBEDDING_DIM
+        self.name = f"hashing-{self.dim}"
+
+    def _features(self, text: str):
+        for token in tokenize(text):
+            yield f"w:{token}", 1.0
+            padded = f" {token} "
+            for i in range(len(padded) - 2):
+                yield f"c:{padded[i:i + 3]}", 0.5
+
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                slot, sign = _feature_slot(feature, self.dim)
+                matrix[row, slot] += sign * weight
+        return _normalize(matrix)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        # A knowledge file's chunks take hundreds of ms; queries stay on the loop
+        if len(texts) > 16:
+            return await asyncio.to_thread(self._embed_sync, texts)
+        return self._embed_sync(texts)
+
+
+class OpenAIEmbedder(Embedder):
+    """Embeddings from any OpenAI-compatible /embeddings endpoint."""
+
+    BATCH_SIZE = 64
+
+    def __init__(self, model: Optional[str] = None, client: Optional[AsyncOpenAI] = None):
+        self.model = model or settings.EMBEDDING_MODEL
+        self.name = f"openai:{self.model}"
+        self.client = client or AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL
+        )
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            batch = texts[start:start + self.BATCH_SIZE]
+            response = await self.client.embeddings.create(model=self.model, input=batch)
+            ordered = sorted(response.data, key=lambda item: item.index)
+            rows.extend(item.embedding for item in ordered)
+        if not rows:
+            return np.zeros((0, 0), dtype=np.float32)
+        return _normalize(np.asarray(rows, dtype=np.float32))
+
+
+_embedder: Optional[Embedder] = None
+
+
+def get_embedder() -> Embedder:
+    """Return the process-wide embedder selected by settings.EMBEDDING_BACKEND."""
+    global _embedder
+    if _embedder is None:
+        if settings.EMBEDDING_BACKEND == "openai":
+            _embedder = OpenAIEmbedder()
+        else:
+            _embedder = HashingEmbedder()
+    return _embedder
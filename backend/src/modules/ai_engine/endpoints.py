@@ -0,0 +1,228 @@
+"""
+Latency-aware routing across several OpenAI-compatible endpoints.
+
+settings.LLM_ENDPOINTS lists the endpoints (for example OpenRouter, OpenAI and a
+self-hosted server), each with its own model name and weight. Every call
+updates the endpoint's EWMA latency and EWMA error rate. A request goes to
+the healthy endpoint with the lowest latency / weight; a small share
+(LLM_ENDPOINT_EXPLORE) goes to a random healthy endpoint instead, so a
+recovered or slower endpoint keeps getting measured. An endpoint whose error
+rate passes LLM_ENDPOINT_MAX_ERROR_RATE is ejected for LLM_ENDPOINT_COOLDOWN
+seconds. A retryable failure fails over to the next endpoint within the same
+call, and so does an endpoint that has not answered within
+LLM_ENDPOINT_TIMEOUT: a hung endpoint must not use up the whole call
+deadline. Routing events are kept so operators can see why traffic moved.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from openai import AsyncOpenAI
+
+from src.config import settings
+from src.tracing import current_span
+from .transport import is_retryable
+
+ERROR_PENALTY_MS = 10_000  # A failed call scores like a reply this slow
+
+
+@dataclass
+class Endpoint:
+    name: str
+    client: object
+    model: Optional[str] = None  # This endpoint's name for settings.OPENAI_MODEL
+    models: Dict[str, str] = field(default_factory=dict)  # Other requested models -> this endpoint's names
+    weight: float = 1.0
+    base_url: str = ""
+    ewma_latency_ms: Optional[float] = None
+    ewma_error: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    ejected_until: float = 0.0
+    last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def score(self) -> float:
+        """Lower is better. Unmeasured endpoints go first so they get a latency sample."""
+        latency = self.ewma_latency_ms or 0.0
+        return (latency + self.ewma_error * ERROR_PENALTY_MS) / max(self.weight, 1e-6)
+
+    def model_for(self, requested: str) -> str:
+        if requested in self.models:
+            return self.models[requested]
+        if requested == settings.OPENAI_MODEL and self.model:
+            return self.model
+        return requested
+
+
+class EndpointRouter:
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        alpha: Optional[float] = None,
+        max_error_rate: Optional[float] = None,
+        cooldown: Optional[float] = None,
+        explore: Optional[float] = None,
+        timeout: Optional[float] = None
+    ):
+        if not endpoints:
+            raise ValueError("EndpointRouter needs at least one endpoint")
+        self.endpoints = endpoints
+        self.alpha = alpha or settings.LLM_EWMA_ALPHA
+        self.max_error_rate = max_error_rate or settings.LLM_ENDPOINT_MAX_ERROR_RATE
+        self.cooldown = cooldown if cooldown is not None else settings.LLM_ENDPOINT_COOLDOWN
+        self.explore = explore if explore is not None else settings.LLM_ENDPOINT_EXPLORE
+        self.timeout = timeout if timeout is not None else settings.LLM_ENDPOINT_TIMEOUT
+        self.events = deque(maxlen=50)
+        self._current: Optional[str] = None
+        # Same call shape as AsyncOpenAI: client.chat.completions.create(...)
+        self.chat = SimpleNamespace(completions=self)
+
+    @classmethod
+    def from_settings(cls) -> "EndpointRouter":
+        configs = settings.LLM_ENDPOINTS or [{
+            "name": "default",
+            "base_url": settings.OPENAI_BASE_URL,
+            "api_key": settings.OPENAI_API_KEY,
+        }]
+        endpoints = []
+        for i, config in enumerate(configs):
+            base_url = config.get("base_url", settings.OPENAI_BASE_URL)
+            endpoints.append(Endpoint(
+                name=config.get("name") or f"endpoint-{i}",
+                # Retries and deadlines live in ResilientClient
+                client=AsyncOpenAI(api_key=config.get("api_key") or settings.OPENAI_API_KEY, base_url=base_url, max_retries=0),
+                model=config.get("model"),
+                models=config.get("models") or {},
+                weight=float(config.get("weight", 1.0)),
+                base_url=base_url
+            ))
+        return cls(endpoints)
+
+    def ranked(self) -> List[Endpoint]:
+        """Endpoints in the order they would be tried for the next request."""
+        healthy = [e for e in self.endpoints if e.healthy]
+        ejected = sorted((e for e in self.endpoints if not e.healthy), key=lambda e: e.ejected_until)
+        if not healthy:
+            # Everything is ejected: try the one that comes back soonest first
+            return ejected
+        ordered = sorted(healthy, key=Endpoint.score)
+        self._note_preferred(ordered[0])
+        if len(ordered) > 1 and random.random() < self.explore:
+            pick = random.choices(ordered, weights=[e.weight for e in ordered])[0]
+            ordered.remove(pick)
+            ordered.insert(0, pick)
+        return ordered + ejected
+
+    async def create(self, **kwargs):
+        requested = kwargs.get("model") or settings.OPENAI_MODEL
+        error = None
+        candidates = self.ranked()
+        for i, endpoint in enumerate(candidates):
+            started = time.perf_counter()
+            endpoint.requests += 1
+            call = endpoint.client.chat.completions.create(**{**kwargs, "model": endpoint.model_for(requested)})
+            try:
+                # The last candidate gets whatever is left of the caller's deadline
+                if self.timeout and i < len(candidates) - 1:
+                    result = await asyncio.wait_for(call, self.timeout)
+                else:
+                    result = await call
+            except asyncio.CancelledError:
+                # The caller's deadline (or the caller) gave up: the endpoint was at least this slow
+                self._record_abandoned(endpoint, (time.perf_counter() - started) * 1000)
+                raise
+            except Exception as e:
+                self._record(endpoint, None, e)
+                if not is_retryable(e):
+                    raise
+                error = e
+                continue
+            self._record(endpoint, (time.perf_counter() - started) * 1000, None)
+            current_span().set(endpoint=endpoint.name)
+            return result
+        raise error
+
+    def _note_preferred(self, endpoint: Endpoint):
+        if endpoint.name == self._current:
+            return
+        previous = next((e for e in self.endpoints if e.name == self._current), None)
+        self._current = endpoint.name
+        if previous is None:
+            return
+        if not previous.healthy:
+            reason = f"{previous.name} is ejected"
+        else:
+            reason = f"score {endpoint.score():.0f} vs {previous.score():.0f} for {previous.name}"
+        self._event(f"preferred endpoint now ({reason})", endpoint)
+
+    def _record(self, endpoint: Endpoint, latency_ms: Optional[float], error: Optional[Exception]):
+        a = self.alpha
+        if error is None:
+            endpoint.ewma_latency_ms = latency_ms if endpoint.ewma_latency_ms is None else (
+                a * latency_ms + (1 - a) * endpoint.ewma_latency_ms
+            )
+            endpoint.ewma_error = (1 - a) * endpoint.ewma_error
+            if endpoint.ejected_until:
+                endpoint.ejected_until = 0.0
+                self._event("recovered", endpoint)
+            return
+
+        endpoint.failures += 1
+        endpoint.last_error = f"{type(error).__name__}: {error}"[:200]
+        endpoint.ewma_error = a + (1 - a) * endpoint.ewma_error
+        if endpoint.ewma_error >= self.max_error_rate and endpoint.healthy:
+            endpoint.ejected_until = time.monotonic() + self.cooldown
+            self._event(f"ejected for {self.cooldown:.0f}s, error rate {endpoint.ewma_error:.2f}", endpoint)
+        else:
+            self._event(f"call failed: {endpoint.last_error}", endpoint)
+
+    def _record_abandoned(self, endpoint: Endpoint, elapsed_ms: float):
+        """
+        A call cancelled before it finished. Past LLM_ENDPOINT_TIMEOUT it counts
+        as a timeout, so a hung endpoint is ejected even when the caller's
+        deadline fires first; a shorter one only raises the latency estimate.
+        """
+        if self.timeout and elapsed_ms >= self.timeout * 1000:
+            self._record(endpoint, None, asyncio.TimeoutError(f"no answer in {elapsed_ms / 1000:.1f}s"))
+        elif endpoint.ewma_latency_ms is None or elapsed_ms > endpoint.ewma_latency_ms:
+            a = self.alpha
+            endpoint.ewma_latency_ms = elapsed_ms if endpoint.ewma_latency_ms is None else (
+                a * elapsed_ms + (1 - a) * endpoint.ewma_latency_ms
+            )
+
+    def _event(self, message: str, endpoint: Endpoint):
+        self.events.append({"at": time.time(), "endpoint": endpoint.name, "event": message})
+        print(f"LLM endpoint {endpoint.name}: {message}")
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        return {
+            "current": self._current,
+            "order": [e.name for e in sorted(self.endpoints, key=lambda e: (not e.healthy, e.score()))],
+            "endpoints": [
+                {
+                    "name": e.name,
+                    "base_url": e.base_url,
+                    "model": e.model,
+                    "weight": e.weight,
+                    "healthy": e.healthy,
+                    "ejected_for_s": round(e.ejected_until - now, 1) if not e.healthy else 0,
+                    "ewma_latency_ms": round(e.ewma_latency_ms, 1) if e.ewma_latency_ms is not None else None,
+                    "ewma_error": round(e.ewma_error, 4),
+                    "score": round(e.score(), 1),
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "last_error": e.last_error,
+                }
+                for e in self.endpoints
+            ],
+            "events": list(self.events)[-20:],
+        }
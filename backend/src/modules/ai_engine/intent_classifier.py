@@ -0,0 +1,206 @@
+"""
+In-process intent classifier used as a fast path before the LLM.
+
+A multinomial naive Bayes model over word stems and character trigrams. It
+starts from a small set of seed phrases and is retrained from user messages
+whose intent was labelled by the LLM, so it learns the wording customers
+actually use. The posterior of the best class is the confidence score; the
+engine only skips the LLM call when it clears INTENT_CLASSIFIER_THRESHOLD.
+
+Naive Bayes counts a word's trigrams as independent evidence, so its raw
+posteriors are close to 1 even for messages it barely knows. Every fit
+therefore picks a softmax temperature by cross-validation: the one that
+minimises the log loss of held-out predictions. The threshold itself comes
+from held-out precision (scripts/eval_intent_classifier.py --target-precision).
+"""
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.chat import Message, MessageRole
+from .retrieval import tokenize
+
+
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("сколько стоит", "pricing_query"),
+    ("какая цена", "pricing_query"),
+    ("почем", "pricing_query"),
+    ("сколько будет стоить ремонт", "pricing_query"),
+    ("цена на колодки", "pricing_query"),
+    ("прайс пришлите", "pricing_query"),
+    ("какая стоимость услуги", "pricing_query"),
+    ("есть скидки", "pricing_query"),
+    ("хочу записаться", "booking_request"),
+    ("запишите меня на завтра", "booking_request"),
+    ("можно забронировать время", "booking_request"),
+    ("есть свободное время в субботу", "booking_request"),
+    ("хочу записаться на замену масла", "booking_request"),
+    ("когда можно приехать", "booking_request"),
+    ("запись на сегодня", "booking_request"),
+    ("позовите менеджера", "handoff_request"),
+    ("соедините с оператором", "handoff_request"),
+    ("хочу поговорить с человеком", "handoff_request"),
+    ("живой человек есть", "handoff_request"),
+    ("переключите на менеджера", "handoff_request"),
+    ("позвоните мне", "handoff_request"),
+    ("ужасный сервис", "complaint"),
+    ("я недоволен", "complaint"),
+    ("хочу пожаловаться", "complaint"),
+    ("мне продали брак", "complaint"),
+    ("верните деньги", "complaint"),
+    ("вы испортили машину", "complaint"),
+    ("здравствуйте", "general_inquiry"),
+    ("спасибо", "general_inquiry"),
+    ("где вы находитесь", "general_inquiry"),
+    ("какой у вас адрес", "general_inquiry"),
+    ("до скольки работаете", "general_inquiry"),
+    ("есть доставка", "general_inquiry"),
+    ("какая гарантия", "general_inquiry"),
+    ("добрый день", "general_inquiry"),
+]
+
+
+TEMPERATURES = (1.0, 1.5, 2.0, 2.5, 3.0, 4.0, 5.0, 6.0, 8.0, 10.0, 15.0, 20.0)
+CALIBRATION_SAMPLE = 2000  # Held-out predictions used to pick the temperature
+
+
+@dataclass
+class IntentPrediction:
+    intent: str
+    confidence: float
+    scores: dict  # intent -> posterior probability
+
+
+def extract_features(text: str) -> List[str]:
+    """Word stems plus character trigrams inside each word."""
+    features = []
+    for token in tokenize(text):
+        features.append(f"w:{token}")
+        padded = f" {token} "
+        features.extend(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+class IntentClassifier:
+    """Multinomial naive Bayes with Laplace smoothing and a calibrated softmax temperature."""
+
+    def __init__(self, alpha: float = 0.5, folds: int = 5):
+        self.alpha = alpha
+        self.folds = folds
+        self.temperature = 1.0
+        self.class_counts: Counter = Counter()
+        self.feature_counts: dict = defaultdict(Counter)
+        self.feature_totals: Counter = Counter()
+        self.vocabulary: set = set()
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.class_counts)
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "IntentClassifier":
+        """Train from scratch on (text, intent) pairs, then calibrate the temperature on held-out folds."""
+        featurized = [(features, intent) for features, intent in
+                      ((extract_features(text), intent) for text, intent in examples) if features]
+        self.class_counts = Counter()
+        self.feature_counts = defaultdict(Counter)
+        self.feature_totals = Counter()
+        self.vocabulary = set()
+        for features, intent in featurized:
+            self.class_counts[intent] += 1
+            self.feature_counts[intent].update(features)
+            self.feature_totals[intent] += len(features)
+            self.vocabulary.update(features)
+        self.temperature = self._calibrate(featurized)
+        return self
+
+    def _calibrate(self, featurized: Sequence[Tuple[List[str], str]]) -> float:
+        """Temperature with the lowest log loss on cross-validated predictions; 1.0 with too little data."""
+        if len(featurized) < self.folds * 2:
+            return 1.0
+        # Every k-th example of a spread-out sample is held out in fold k
+        step = max(1, len(featurized) // CALIBRATION_SAMPLE)
+        sample = featurized[::step]
+        held_out = []
+        for fold in range(self.folds):
+            test = sample[fold::self.folds]
+            model = self._without(test)
+            for features, intent in test:
+                log_scores = model._log_scores(features)
+                if log_scores and intent in log_scores:
+                    held_out.append((log_scores, intent))
+        if not held_out:
+            return 1.0
+
+        def log_loss(temperature: float) -> float:
+            return -sum(math.log(max(softmax(scores, temperature)[intent], 1e-12)) for scores, intent in held_out)
+
+        return min(TEMPERATURES, key=log_loss)
+
+    def _without(self, examples: Sequence[Tuple[List[str], str]]) -> "IntentClassifier":
+        """A copy trained on everything but the examples: counts are additive, so subtract them."""
+        model = IntentClassifier(self.alpha, self.folds)
+        model.class_counts = self.class_counts.copy()
+        model.feature_counts = defaultdict(Counter, {i: c.copy() for i, c in self.feature_counts.items()})
+        model.feature_totals = self.feature_totals.copy()
+        for features, intent in examples:
+            model.class_counts[intent] -= 1
+            model.feature_counts[intent].subtract(features)
+            model.feature_totals[intent] -= len(features)
+        model.class_counts = +model.class_counts
+        model.vocabulary = {f for counts in model.feature_counts.values() for f, n in counts.items() if n > 0}
+        return model
+
+    def _log_scores(self, features: List[str]) -> Optional[Dict[str, float]]:
+        features = [f for f in features if f in self.vocabulary]
+        if not self.trained or not features:
+            return None
+
+        total_docs = sum(self.class_counts.values())
+        vocab_size = len(self.vocabulary)
+        log_scores = {}
+        for intent, docs in self.class_counts.items():
+            denominator = self.feature_totals[intent] + self.alpha * vocab_size
+            counts = self.feature_counts[intent]
+            score = math.log(docs / total_docs)
+            for feature in features:
+                score += math.log((counts[feature] + self.alpha) / denominator)
+            log_scores[intent] = score
+        return log_scores
+
+    def predict(self, text: str) -> Optional[IntentPrediction]:
+        log_scores = self._log_scores(extract_features(text))
+        if log_scores is None:
+            return None
+        posteriors = softmax(log_scores, self.temperature)
+        best = max(posteriors, key=posteriors.get)
+        return IntentPrediction(intent=best, confidence=posteriors[best], scores=posteriors)
+
+    async def train_from_messages(self, db: AsyncSession, limit: int = 20000) -> int:
+        """
+        Retrain on the seed phrases plus the latest labelled user messages.
+        Returns the number of logged messages used.
+        """
+        result = await db.execute(
+            select(Message.content, Message.intent)
+            .where(Message.role == MessageRole.USER, Message.intent.is_not(None))
+            .order_by(Message.id.desc())
+            .limit(limit)
+        )
+        logged = [(content, intent) for content, intent in result.all() if content]
+        self.fit(SEED_EXAMPLES + logged)
+        return len(logged)
+
+
+def softmax(log_scores: Dict[str, float], temperature: float) -> Dict[str, float]:
+    """Normalised posteriors from log scores, flattened by the temperature."""
+    peak = max(log_scores.values())
+    exp_scores = {intent: math.exp((score - peak) / temperature) for intent, score in log_scores.items()}
+    norm = sum(exp_scores.values())
+    return {intent: value / norm for intent, value in exp_scores.items()}
+
+
+intent_classifier = IntentClassifier().fit(SEED_EXAMPLES)
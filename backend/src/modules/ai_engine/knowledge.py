@@ -0,0 +1,44 @@
+"""
+Indexing of knowledge files for the AI engine.
+
+The agent module hands over a file's extracted text here and never touches
+the indexes themselves. A file is cut into BM25 chunks (KnowledgeIndex), its
+price list rows are parsed (PriceIndex) and its chunks are embedded for
+dense retrieval (DenseIndex). Embedding is best-effort: chunks it misses are
+picked up by DenseIndex.sync() on startup.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.models.agent import KnowledgeFile
+from .prices import PriceIndex
+from .retrieval import KnowledgeIndex
+from .vector_store import DenseIndex
+
+
+async def index_knowledge_file(db: AsyncSession, file: KnowledgeFile, text: str) -> int:
+    """
+    Index the file's text and commit, together with any pending changes to
+    the file itself. Returns the number of chunks.
+    """
+    chunks = await KnowledgeIndex(db).index_file(file, text)
+    print(f"Indexed {len(chunks)} chunks from {file.filename}")
+    prices = await PriceIndex(db).index_file(file, text)
+    if prices:
+        print(f"Parsed {prices} price rows from {file.filename}")
+    await db.commit()
+
+    try:
+        await DenseIndex(db).index_chunks(chunks)
+    except Exception as e:
+        print(f"Error embedding knowledge chunks: {e}")
+    return len(chunks)
+
+
+async def remove_knowledge_file(db: AsyncSession, file_id: int):
+    """Drop the file from every index; the caller commits."""
+    try:
+        await DenseIndex(db).remove_file(file_id)
+    except Exception as e:
+        print(f"Error removing knowledge vectors: {e}")
+    await KnowledgeIndex(db).remove_file(file_id)
+    await PriceIndex(db).remove_file(file_id)
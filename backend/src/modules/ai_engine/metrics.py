@@ -0,0 +1,86 @@
+"""
+Lightweight in-process metrics for the AI engine.
+"""
+from collections import deque
+from typing import Optional
+
+
+class LatencyTracker:
+    """Rolling window of latency samples (ms) with percentile snapshots."""
+
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def observe(self, ms: float):
+        self.samples.append(ms)
+        self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        if not self.samples:
+            return {"count": self.count, "window": 0, "mean": None, "p50": None, "p95": None, "max": None}
+        return {
+            "count": self.count,
+            "window": len(self.samples),
+            "mean": round(sum(self.samples) / len(self.samples), 1),
+            "p50": round(self.percentile(0.5), 1),
+            "p95": round(self.percentile(0.95), 1),
+            "max": round(max(self.samples), 1),
+        }
+
+
+# Time to first streamed token and total streamed generation time
+ttft_tracker = LatencyTracker()
+stream_total_tracker = LatencyTracker()
+# Prompt tokens saved per call by sending the chat summary instead of the messages it folds
+summary_tokens_saved = LatencyTracker()
+
+
+class PromptUsageTracker:
+    """Prompt/completion token totals, including prompt tokens served from the provider cache."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+
+    def observe(self, usage) -> Optional[dict]:
+        """Record the usage block of a chat completion; returns the counts read from it."""
+        if usage is None:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details else None
+        if cached is None:
+            # Some OpenAI-compatible providers report cache hits under their own name
+            cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        counts = {
+            "prompt_tokens": usage.prompt_tokens or 0,
+            "cached_tokens": cached or 0,
+            "completion_tokens": usage.completion_tokens or 0,
+        }
+        self.calls += 1
+        self.prompt_tokens += counts["prompt_tokens"]
+        self.cached_tokens += counts["cached_tokens"]
+        self.completion_tokens += counts["completion_tokens"]
+        return counts
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else None,
+        }
+
+
+# Token usage reported by the provider for every chat completion call
+prompt_usage_tracker = PromptUsageTracker()
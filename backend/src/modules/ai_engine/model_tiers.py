@@ -0,0 +1,113 @@
+"""
+Model tiering: pick model, max_tokens and temperature per reply.
+
+settings.MODEL_ROUTES is an ordered list of rules matched on the intent and
+the message complexity (short | normal | long); the first match names a tier
+from settings.MODEL_TIERS, otherwise MODEL_DEFAULT_TIER is used. A thank-you
+note can then go to a small fast model with a short answer budget while a
+complaint gets the stronger one. Each decision is logged with its latency
+and token usage, and per-tier totals (with an estimated cost when the tier
+has prices) are kept for /ai/metrics.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from src.config import settings
+from .metrics import LatencyTracker
+from .retrieval import tokenize
+
+
+SHORT_MESSAGE_WORDS = 6
+LONG_MESSAGE_WORDS = 30
+
+
+def message_complexity(text: str) -> str:
+    words = len(tokenize(text))
+    if words >= LONG_MESSAGE_WORDS or text.count("?") >= 2:
+        return "long"
+    if words <= SHORT_MESSAGE_WORDS:
+        return "short"
+    return "normal"
+
+
+@dataclass(frozen=True)
+class TierDecision:
+    tier: str
+    model: str
+    max_tokens: int
+    temperature: float
+    intent: Optional[str]
+    complexity: str
+
+
+class TierStats:
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency = LatencyTracker()
+
+
+class ModelTierRouter:
+    def __init__(self, tiers: Optional[Dict[str, dict]] = None, routes: Optional[List[dict]] = None):
+        self.tiers = tiers if tiers is not None else settings.MODEL_TIERS
+        self.routes = routes if routes is not None else settings.MODEL_ROUTES
+        self.stats: Dict[str, TierStats] = {}
+
+    def choose(self, intent: Optional[str], text: str) -> TierDecision:
+        """Tier for a reply; intent may be None when it is not known yet."""
+        complexity = message_complexity(text)
+        tier = settings.MODEL_DEFAULT_TIER
+        for rule in self.routes:
+            if rule.get("intent") not in (None, intent):
+                continue
+            if rule.get("complexity") not in (None, complexity):
+                continue
+            tier = rule["tier"]
+            break
+        config = self.tiers.get(tier) or {}
+        return TierDecision(
+            tier=tier,
+            model=config.get("model") or settings.OPENAI_MODEL,
+            max_tokens=int(config.get("max_tokens", 800)),
+            temperature=float(config.get("temperature", 0.7)),
+            intent=intent,
+            complexity=complexity
+        )
+
+    def record(self, decision: TierDecision, latency_ms: float, usage: Optional[dict] = None):
+        stats = self.stats.setdefault(decision.tier, TierStats())
+        stats.calls += 1
+        stats.latency.observe(latency_ms)
+        if usage:
+            stats.prompt_tokens += usage["prompt_tokens"]
+            stats.completion_tokens += usage["completion_tokens"]
+        tokens = f"{usage['prompt_tokens']}+{usage['completion_tokens']} tokens" if usage else "usage n/a"
+        print(
+            f"Model tier {decision.tier} ({decision.model}, max_tokens={decision.max_tokens}) "
+            f"intent={decision.intent or 'unknown'} complexity={decision.complexity}: {latency_ms:.0f} ms, {tokens}"
+        )
+
+    def snapshot(self) -> dict:
+        result = {}
+        for tier, stats in self.stats.items():
+            config = self.tiers.get(tier) or {}
+            cost = None
+            if "usd_per_1k_prompt" in config or "usd_per_1k_completion" in config:
+                cost = (
+                    stats.prompt_tokens * float(config.get("usd_per_1k_prompt", 0))
+                    + stats.completion_tokens * float(config.get("usd_per_1k_completion", 0))
+                ) / 1000
+            result[tier] = {
+                "model": config.get("model") or settings.OPENAI_MODEL,
+                "calls": stats.calls,
+                "latency_ms": stats.latency.snapshot(),
+                "prompt_tokens": stats.prompt_tokens,
+                "completion_tokens": stats.completion_tokens,
+                "est_cost_usd": round(cost, 6) if cost is not None else None,
+                "cost_per_call_usd": round(cost / stats.calls, 6) if cost is not None and stats.calls else None,
+            }
+        return result
+
+
+model_router = ModelTierRouter()
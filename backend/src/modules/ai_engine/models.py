@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from src.config import settings
 from typing import Optional, List
 from enum import Enum
 
@@ -17,7 +18,29 @@ class AIResponse(BaseModel):
     text: str
     intent: Optional[str] = None
     confidence: float = 0.0
+    intent_source: Optional[str] = None  # classifier | llm | default
     suggested_actions: List[str] = []
+    generation_path: Optional[str] = None  # two_call | single_call | single_call_fallback | local_intent | stream | cache | price_lookup | overflow
+    ttft_ms: Optional[float] = None  # Time to first token, streaming only
+    handoff: bool = False  # The caller should switch the chat to HUMAN
+
+class AIStreamChunk(BaseModel):
+    """One event of AIEngineService.stream_message: a text delta or the final response."""
+    delta: str = ""
+    response: Optional[AIResponse] = None
+
+class AIBatchRequest(BaseModel):
+    requests: List[AIRequest] = Field(..., min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+    use_knowledge: bool = True  # Retrieve knowledge and agent config from the database per item
+
+class AIBatchResult(BaseModel):
+    """One NDJSON line of /ai/process/batch."""
+    index: int  # Position in the request list; results arrive in completion order
+    conversation_id: str
+    ok: bool
+    latency_ms: float
+    response: Optional[AIResponse] = None
+    error: Optional[str] = None
 
 class RAGDocument(BaseModel):
     title: str
@@ -0,0 +1,335 @@
+"""
+Direct price lookup over the price lists in the knowledge base.
+
+Most knowledge files are price lists. When a file is indexed, the rows that
+look like (item, article, price) are parsed out of its text into
+knowledge_prices. Each row's name, together with its section (e.g. the car
+model heading the table), is split into character trigrams stored in
+knowledge_price_trigrams, the same way BM25 postings are stored for chunks.
+
+A question is matched against articles exactly and against names by shared
+trigrams (Dice similarity), so "колодки передние на гранту" finds "Тормозные
+колодки передние (комплект)" under LADA GRANTA with two indexed queries.
+The matched rows go to the prompt as exact prices, or straight into a
+template reply (PRICE_REPLY_MODE=template). Names are only matched for
+messages that ask about a price; any other message is looked up only by
+the articles it contains, and not at all when it has none.
+"""
+import re
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.agent import KnowledgeChunk, KnowledgeFile, KnowledgeFileStatus, KnowledgePrice, KnowledgePriceTrigram
+from .retrieval import ScoredChunk, stem
+
+
+# "7 500", "1200", "1 250,50 руб." - at most 6 digits without separators, so articles are not prices
+PRICE_RE = re.compile(
+    r"^(\d{1,3}(?:[  ]\d{3})+|\d{1,6})(?:[.,](\d{1,2}))?\s*(?:руб\.?|р\.?|₽)?$", re.IGNORECASE
+)
+# One-line rows: "Стрижка мужская — 800 руб", "Фара левая 2190-3711011 5 400"
+ROW_RE = re.compile(
+    r"^(?P<name>.*?[^\W\d_].*?[^\W\d_)])(?P<sep>\s*(?:[:—–]|\.{2,}|\s-)?\s+|\s*[:—–]\s*)"
+    r"(?:(?P<article>(?=\S*\d)[0-9A-Za-zА-Яа-я][0-9A-Za-zА-Яа-я\-./]{3,})\s+)?"
+    r"(?P<price>\d{1,3}(?:[  ]\d{3})+|\d{1,6})(?:[.,](?P<cents>\d{1,2}))?\s*(?P<currency>руб\.?|р\.?|₽)?$",
+    re.IGNORECASE
+)
+ARTICLE_RE = re.compile(r"^(?=.*\d)[0-9A-Za-zА-Яа-я][0-9A-Za-zА-Яа-я\-./]{3,}$")
+QUERY_ARTICLE_RE = re.compile(r"[0-9A-Za-zА-Яа-я][0-9A-Za-zА-Яа-я\-./]*\d[0-9A-Za-zА-Яа-я\-./]*")
+WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+# Words that ask about a price: "сколько", "стоит", "стоимость", "цены", "почём", "прайс", "обойдется"
+PRICE_QUESTION_RE = re.compile(r"\b(?:сколько|стои\w*|стоят|цен[аыуео]\w{0,2}|поч[её]м|прайс\w*|обойд\w*)\b", re.IGNORECASE)
+
+HEADER_WORDS = {"наименование", "артикул", "цена", "цена, руб.", "цена, руб", "стоимость", "код", "товар", "услуга"}
+# Words of a price question that say nothing about the item
+QUERY_STOPWORDS = {
+    "сколько", "стоит", "стоят", "стоить", "будет", "цена", "цену", "цены", "почем", "почём", "стоимость",
+    "какая", "какой", "какие", "подскажите", "скажите", "а", "у", "вас", "на", "для", "и", "в", "есть",
+    "руб", "рублей", "пожалуйста", "нужен", "нужна", "нужно", "нужны", "хочу", "купить",
+}
+# Latin letters spelled in Cyrillic, so "гранта" meets the "LADA GRANTA" heading
+TRANSLIT = str.maketrans({
+    "a": "а", "b": "б", "c": "к", "d": "д", "e": "е", "f": "ф", "g": "г", "h": "х", "i": "и",
+    "j": "й", "k": "к", "l": "л", "m": "м", "n": "н", "o": "о", "p": "п", "q": "к", "r": "р",
+    "s": "с", "t": "т", "u": "у", "v": "в", "w": "в", "x": "кс", "y": "ы", "z": "з",
+})
+
+
+@dataclass
+class PriceRow:
+    name: str
+    article: Optional[str]
+    price: Decimal
+    section: Optional[str]
+
+
+@dataclass
+class PriceMatch:
+    price_id: int
+    file_id: int
+    name: str
+    article: Optional[str]
+    price: Decimal
+    section: Optional[str]
+    score: float
+
+
+def _parse_price(digits: str, cents: Optional[str] = None) -> Optional[Decimal]:
+    try:
+        value = Decimal(digits.replace(" ", "").replace(" ", ""))
+    except InvalidOperation:
+        return None
+    if cents:
+        value += Decimal(cents.ljust(2, "0")) / 100
+    return value if value > 0 else None
+
+
+def _is_header(line: str) -> bool:
+    return line.lower().rstrip(":") in HEADER_WORDS
+
+
+def _is_section(line: str) -> bool:
+    # Table headings like "LADA GRANTA": upper case letters, no digits-only cells
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= 3 and line.upper() == line and not ARTICLE_RE.match(line)
+
+
+def parse_price_rows(text: str) -> List[PriceRow]:
+    """
+    Rows of the price tables in extracted text. PDF tables usually come out
+    one cell per line (name, article, price), simpler lists one row per line.
+    A section heading covers the table under it: a one-line row after a cell
+    table, or a blank line after a one-line list, ends it.
+    """
+    rows = []
+    section = None
+    section_kind = None  # "cells" or "lines" once the section has rows
+    pending: List[str] = []  # Cells seen since the last row
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            if section_kind == "lines":
+                section, section_kind = None, None
+            continue
+        if _is_header(line):
+            continue
+        cell = PRICE_RE.match(line)
+        if cell:
+            price = _parse_price(cell.group(1), cell.group(2))
+            name, article = None, None
+            if len(pending) >= 2 and ARTICLE_RE.match(pending[-1]):
+                name, article = pending[-2], pending[-1]
+            elif pending and not ARTICLE_RE.match(pending[-1]):
+                name = pending[-1]
+            if name and price and WORD_RE.search(name) and len(name) <= 200:
+                rows.append(PriceRow(name, article.upper() if article else None, price, section))
+                if section:
+                    section_kind = section_kind or "cells"
+            pending = []
+            continue
+        row = ROW_RE.match(line)
+        # Without a currency, separator or article "работаем с 9 до 21" is not a row
+        if row and (row.group("currency") or row.group("sep").strip() or row.group("article")):
+            price = _parse_price(row.group("price"), row.group("cents"))
+            name = row.group("name").strip(" .:—–-•·*")
+            if price and len(name) <= 200 and not _is_section(line):
+                if section_kind == "cells":
+                    section, section_kind = None, None
+                article = row.group("article")
+                rows.append(PriceRow(name, article.upper() if article else None, price, section))
+                if section:
+                    section_kind = "lines"
+                pending = []
+                continue
+        if _is_section(line):
+            section, section_kind = line, None
+            pending = []
+            continue
+        pending.append(line)
+    return rows
+
+
+def trigrams(text: str, stopwords: Iterable[str] = ()) -> Set[str]:
+    """
+    Character trigrams of the words, lowercased, with Latin spelled in
+    Cyrillic and endings stemmed, so "фару левую" meets "Фара левая".
+    """
+    stop = set(stopwords)
+    grams = set()
+    for word in WORD_RE.findall(text.lower().replace("ё", "е")):
+        if word in stop or word.isdigit():
+            continue
+        padded = f" {stem(word.translate(TRANSLIT))} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def query_articles(query: str) -> Set[str]:
+    """Tokens of a message that look like articles, upper-cased as they are stored."""
+    return {a.upper() for a in QUERY_ARTICLE_RE.findall(query) if ARTICLE_RE.match(a)}
+
+
+def asks_price(text: str) -> bool:
+    return PRICE_QUESTION_RE.search(text) is not None
+
+
+def format_price(value: Decimal) -> str:
+    if value == value.to_integral_value():
+        return f"{int(value):,}".replace(",", " ")
+    return f"{value:,.2f}".replace(",", " ").replace(".", ",")
+
+
+def format_price_match(match: PriceMatch) -> str:
+    parts = [match.name]
+    if match.section:
+        parts.append(f"({match.section})")
+    if match.article:
+        parts.append(f"арт. {match.article}")
+    return " ".join(parts) + f" — {format_price(match.price)} руб."
+
+
+def price_chunk(matches: List[PriceMatch]) -> ScoredChunk:
+    """Matches as a knowledge chunk that goes first in the prompt."""
+    return ScoredChunk(
+        chunk_id=0,
+        file_id=matches[0].file_id,
+        filename="Точные цены из прайс-листа",
+        content="\n".join(format_price_match(m) for m in matches),
+        score=1.0
+    )
+
+
+def price_reply(matches: List[PriceMatch]) -> str:
+    """Template answer to a price question, without the LLM."""
+    if len(matches) == 1:
+        return f"{format_price_match(matches[0])}\nПодсказать что-нибудь ещё?"
+    lines = "\n".join(f"• {format_price_match(m)}" for m in matches)
+    return f"Вот что нашлось в прайс-листе:\n{lines}\nУточните, какой вариант вам нужен?"
+
+
+class PriceIndex:
+    """Price rows of the knowledge files with a trigram index on their names."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def index_file(self, file: KnowledgeFile, text: str) -> int:
+        """
+        Replace the file's price rows with those parsed from text and set
+        file.price_count. The caller owns the transaction and commits.
+        """
+        await self.remove_file(file.id)
+        rows = parse_price_rows(text or "")
+        for position, row in enumerate(rows):
+            grams = trigrams(f"{row.name} {row.section or ''}")
+            price = KnowledgePrice(
+                file_id=file.id,
+                position=position,
+                section=row.section,
+                name=row.name,
+                article=row.article,
+                price=row.price,
+                trigram_count=len(grams)
+            )
+            self.db.add(price)
+            await self.db.flush()
+            if grams:
+                await self.db.execute(
+                    insert(KnowledgePriceTrigram),
+                    [{"trigram": gram, "price_id": price.id} for gram in grams]
+                )
+        file.price_count = len(rows)
+        return len(rows)
+
+    async def remove_file(self, file_id: int):
+        price_ids = select(KnowledgePrice.id).where(KnowledgePrice.file_id == file_id)
+        await self.db.execute(
+            delete(KnowledgePriceTrigram).where(KnowledgePriceTrigram.price_id.in_(price_ids))
+        )
+        await self.db.execute(delete(KnowledgePrice).where(KnowledgePrice.file_id == file_id))
+
+    async def backfill(self) -> int:
+        """
+        Parse the price rows of ready files indexed before price lookup
+        existed, from their chunks. Returns files parsed.
+        """
+        result = await self.db.execute(
+            select(KnowledgeFile).where(
+                KnowledgeFile.status == KnowledgeFileStatus.READY,
+                KnowledgeFile.price_count.is_(None)
+            )
+        )
+        files = result.scalars().all()
+        for file in files:
+            chunks = await self.db.execute(
+                select(KnowledgeChunk.content)
+                .where(KnowledgeChunk.file_id == file.id)
+                .order_by(KnowledgeChunk.position)
+            )
+            lines = []
+            for i, content in enumerate(chunks.scalars().all()):
+                # Every chunk after the first repeats the previous chunk's last line
+                lines.extend(content.split("\n")[1 if i else 0:])
+            await self.index_file(file, "\n".join(lines))
+        if files:
+            await self.db.commit()
+        return len(files)
+
+    async def lookup(self, query: str, limit: Optional[int] = None, by_name: bool = True) -> List[PriceMatch]:
+        """
+        Rows for the question: exact article matches first, then (with
+        by_name) names by trigram similarity.
+        """
+        limit = limit or settings.PRICE_LOOKUP_LIMIT
+        matches = {}
+
+        articles = query_articles(query)
+        if articles:
+            result = await self.db.execute(select(KnowledgePrice).where(KnowledgePrice.article.in_(articles)))
+            for price in result.scalars().all():
+                matches[price.id] = self._match(price, 1.0)
+
+        grams = trigrams(query, QUERY_STOPWORDS) if by_name else set()
+        if grams:
+            shared = func.count().label("shared")
+            result = await self.db.execute(
+                select(KnowledgePriceTrigram.price_id, shared)
+                .where(KnowledgePriceTrigram.trigram.in_(grams))
+                .group_by(KnowledgePriceTrigram.price_id)
+                .order_by(shared.desc())
+                .limit(limit * 10)
+            )
+            candidates = dict(result.all())
+            if candidates:
+                result = await self.db.execute(
+                    select(KnowledgePrice).where(KnowledgePrice.id.in_(candidates))
+                )
+                for price in result.scalars().all():
+                    # Dice coefficient of the query's and the row's trigram sets
+                    score = 2 * candidates[price.id] / (len(grams) + (price.trigram_count or 1))
+                    if score >= settings.PRICE_MATCH_MIN_SCORE and price.id not in matches:
+                        matches[price.id] = self._match(price, score)
+
+        ranked = sorted(matches.values(), key=lambda m: m.score, reverse=True)
+        if not ranked:
+            return []
+        # Keep the rows about as good as the best one, e.g. original and analogue of a part
+        cutoff = ranked[0].score * settings.PRICE_MATCH_RELATIVE
+        return [m for m in ranked if m.score >= cutoff][:limit]
+
+    @staticmethod
+    def _match(price: KnowledgePrice, score: float) -> PriceMatch:
+        return PriceMatch(
+            price_id=price.id,
+            file_id=price.file_id,
+            name=price.name,
+            article=price.article,
+            price=price.price,
+            section=price.section,
+            score=round(score, 4)
+        )
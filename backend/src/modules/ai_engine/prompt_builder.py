@@ -0,0 +1,135 @@
+"""
+Chat completion prompt assembly, laid out for provider-side prefix caching.
+
+Providers cache the longest prompt prefix they have seen recently, so the
+messages go from most to least stable:
+1. persona + system instructions (+ the JSON format for structured calls),
+   compiled once per agent config version and reused verbatim
+2. business context and retrieved knowledge
+3. the rolling summary of older messages, when the chat has one
+4. recent chat history as role-tagged messages
+5. the current user message
+Knowledge and history are trimmed to the model's token budget by ContextPacker.
+"""
+from collections import OrderedDict
+from typing import List, Optional
+
+from .prompts import PERSONA_PROMPT, KNOWLEDGE_PROMPT, STRUCTURED_RESPONSE_PROMPT, CONVERSATION_SUMMARY_PROMPT
+from .retrieval import ScoredChunk, format_knowledge
+from .context_packer import get_packer
+from .metrics import summary_tokens_saved
+
+# How stored message roles are presented to the model
+HISTORY_ROLES = {
+    "user": "user",
+    "assistant": "assistant",
+    "manager": "assistant",  # A human operator speaks for the business too
+    "system": "system",
+}
+
+
+class PromptBuilder:
+    def __init__(self, max_prefixes: int = 32):
+        self.max_prefixes = max_prefixes
+        self._prefixes: OrderedDict = OrderedDict()  # (config_version, structured) -> text
+        self.stats = {"compiled": 0, "reused": 0}
+
+    def prefix(self, agent_config=None, structured: bool = False) -> str:
+        """The stable system message, compiled once per agent config version."""
+        key = (agent_config.config_version if agent_config else None, structured)
+        cached = self._prefixes.get(key)
+        if cached is not None:
+            self._prefixes.move_to_end(key)
+            self.stats["reused"] += 1
+            return cached
+
+        text = self._compile(agent_config)
+        if structured:
+            text += "\n" + STRUCTURED_RESPONSE_PROMPT
+        self._prefixes[key] = text
+        while len(self._prefixes) > self.max_prefixes:
+            self._prefixes.popitem(last=False)
+        self.stats["compiled"] += 1
+        return text
+
+    def build(
+        self,
+        user_message: str,
+        chat_history: Optional[List[dict]] = None,
+        business_context: str = "",
+        agent_config=None,
+        structured: bool = False,
+        knowledge: Optional[List[ScoredChunk]] = None,
+        model: Optional[str] = None
+    ) -> List[dict]:
+        """Messages for a chat completion call, packed into the model's token budget."""
+        prefix = self.prefix(agent_config, structured)
+        business_context = business_context.strip()
+        summary = next((m for m in chat_history or [] if m.get("role") == "summary"), None)
+        summary_text = CONVERSATION_SUMMARY_PROMPT.format(summary=summary["content"]) if summary else None
+
+        packer = get_packer(model)
+        fixed = [prefix, KNOWLEDGE_PROMPT.format(business_context=business_context), user_message]
+        if summary_text:
+            fixed.append(summary_text)
+            # What the folded messages would have cost, minus the summary that replaces them
+            summary_tokens_saved.observe(summary.get("source_tokens", 0) - packer.message_tokens(summary_text))
+        packed = packer.pack(
+            fixed=fixed,
+            knowledge=knowledge or [],
+            history=self.history_messages(chat_history, user_message)
+        )
+        context = (business_context + format_knowledge(packed.knowledge)).strip()
+        messages = [
+            {"role": "system", "content": prefix},
+            {"role": "system", "content": KNOWLEDGE_PROMPT.format(
+                business_context=context or "Информация о бизнесе не указана."
+            )},
+        ]
+        if summary_text:
+            messages.append({"role": "system", "content": summary_text})
+        messages.extend(packed.history)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    @staticmethod
+    def history_messages(chat_history: Optional[List[dict]], user_message: str = "") -> List[dict]:
+        """Stored chat messages as role-tagged messages, without the current one or the summary."""
+        history = list(chat_history or [])
+        # Chat routes save the incoming message before loading the history
+        if history and history[-1].get("role") == "user" and history[-1].get("content") == user_message:
+            history.pop()
+        messages = []
+        for msg in history:
+            content = msg.get("content")
+            role = HISTORY_ROLES.get(msg.get("role"))
+            if content and role:
+                messages.append({"role": role, "content": content})
+        return messages
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "size": len(self._prefixes)}
+
+    @staticmethod
+    def _compile(agent_config=None) -> str:
+        # Default values if config is missing
+        name = "Profit Flow AI"
+        role = "умный бизнес-ассистент"
+        tone = "дружелюбным и профессиональным"
+        system_instructions = ""
+
+        if agent_config:
+            name = agent_config.name or name
+            role = agent_config.role or role
+            tone = agent_config.tone or tone
+            system_instructions = agent_config.system_prompt or ""
+
+        return PERSONA_PROMPT.format(
+            name=name,
+            role=role,
+            tone=tone,
+            system_instructions=system_instructions
+        )
+
+
+prompt_builder = PromptBuilder()
@@ -0,0 +1,256 @@
+"""
+Lexical retrieval over the agent knowledge base.
+
+Knowledge files are split into chunks at upload time. Every chunk is stored
+together with its postings (term -> chunk, tf), so the inverted index lives in
+the database and survives restarts. At query time only the postings of the
+query terms are read and ranked with BM25.
+"""
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+
+from src.config import settings
+from src.models.agent import KnowledgeFile, KnowledgeChunk, KnowledgePosting
+
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Common Russian inflection endings, longest first. Stripping them is a crude
+# stemmer, but it lets "колодки" and "колодка" meet in the same posting list.
+RU_ENDINGS = sorted([
+    "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ов", "ев", "ей", "ий", "ый", "ой", "ая", "яя", "ое", "ее", "ые", "ие",
+    "ых", "их", "ом", "ем", "ам", "ям", "ах", "ях", "ую", "юю",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь",
+], key=len, reverse=True)
+
+
+@dataclass
+class ScoredChunk:
+    chunk_id: int
+    file_id: int
+    filename: str
+    content: str
+    score: float
+
+
+def stem(token: str) -> str:
+    """Strip a common Russian inflection ending; short and non-Cyrillic tokens stay as they are."""
+    if len(token) <= 4 or not ("а" <= token[0] <= "я"):
+        return token
+    for ending in RU_ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= 3:
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split into word tokens and stem them."""
+    text = text.lower().replace("ё", "е")
+    return [stem(t) for t in TOKEN_RE.findall(text)]
+
+
+def chunk_text(text: str, max_chars: Optional[int] = None) -> List[str]:
+    """
+    Split text into chunks of roughly max_chars, cutting on line boundaries.
+    Price lists put one cell per line, so a chunk is a run of table rows.
+    The last line of a chunk is repeated at the start of the next one, so a
+    row cut in the middle still appears whole in one of them.
+    """
+    max_chars = max_chars or settings.KNOWLEDGE_CHUNK_CHARS
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        # Break overly long lines (plain prose without newlines) on words
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            lines.append(line[:cut].strip())
+            line = line[cut:].strip()
+        if line:
+            lines.append(line)
+
+    chunks = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if current and size + len(line) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current = [current[-1]]
+            size = len(current[0])
+        current.append(line)
+        size += len(line) + 1
+    if current and (not chunks or len(current) > 1):
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class KnowledgeIndex:
+    """Persistent BM25 index over knowledge chunks."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def index_file(self, file: KnowledgeFile, content: Optional[str] = None) -> List[KnowledgeChunk]:
+        """
+        Chunk the file's extracted text (file.content, which must be loaded with
+        undefer, unless given) and write chunks and postings. The caller owns
+        the transaction and commits.
+        """
+        await self.remove_file(file.id)
+        content = content if content is not None else file.content
+        if not content:
+            return []
+
+        chunks = []
+        for position, text in enumerate(chunk_text(content)):
+            terms = Counter(tokenize(text))
+            chunk = KnowledgeChunk(
+                file_id=file.id,
+                position=position,
+                content=text,
+                length=sum(terms.values())
+            )
+            self.db.add(chunk)
+            await self.db.flush()
+            chunks.append(chunk)
+            if terms:
+                await self.db.execute(
+                    insert(KnowledgePosting),
+                    [{"term": term, "chunk_id": chunk.id, "tf": tf} for term, tf in terms.items()]
+                )
+        return chunks
+
+    async def remove_file(self, file_id: int):
+        """Drop all chunks and postings of a file."""
+        chunk_ids = select(KnowledgeChunk.id).where(KnowledgeChunk.file_id == file_id)
+        await self.db.execute(
+            delete(KnowledgePosting).where(KnowledgePosting.chunk_id.in_(chunk_ids))
+        )
+        await self.db.execute(
+            delete(KnowledgeChunk).where(KnowledgeChunk.file_id == file_id)
+        )
+
+    async def backfill(self) -> int:
+        """Index files uploaded before chunking existed. Returns files indexed."""
+        indexed = select(KnowledgeChunk.file_id).distinct()
+        result = await self.db.execute(
+            select(KnowledgeFile)
+            .options(undefer(KnowledgeFile.content))
+            .where(
+                KnowledgeFile.content.is_not(None),
+                KnowledgeFile.id.not_in(indexed)
+            )
+        )
+        files = result.scalars().all()
+        for file in files:
+            await self.index_file(file)
+        if files:
+            await self.db.commit()
+        return len(files)
+
+    async def search(
+        self,
+        query: str,
+        top_k: Optional[int] = None,
+        stats: Optional[Tuple[int, float]] = None
+    ) -> List[ScoredChunk]:
+        """
+        Return the top_k chunks for the query ranked by BM25.
+        stats is (chunk count, average chunk length); queried when not given.
+        """
+        top_k = top_k or settings.KNOWLEDGE_TOP_K
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        if stats is None:
+            result = await self.db.execute(
+                select(func.count(KnowledgeChunk.id), func.avg(KnowledgeChunk.length))
+            )
+            stats = result.one()
+        total, avg_length = stats
+        if not total:
+            return []
+        avg_length = float(avg_length or 1)
+
+        result = await self.db.execute(
+            select(KnowledgePosting.term, KnowledgePosting.chunk_id, KnowledgePosting.tf, KnowledgeChunk.length)
+            .join(KnowledgeChunk, KnowledgeChunk.id == KnowledgePosting.chunk_id)
+            .where(KnowledgePosting.term.in_(terms))
+        )
+        postings = result.all()
+
+        df = Counter(term for term, _, _, _ in postings)
+        scores: dict = {}
+        for term, chunk_id, tf, length in postings:
+            idf = math.log(1 + (total - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * (length or 0) / avg_length)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return await self.load_chunks(best)
+
+    async def load_chunks(self, ranked: List[tuple]) -> List[ScoredChunk]:
+        """Fetch chunk text for (chunk_id, score) pairs, preserving order."""
+        if not ranked:
+            return []
+        result = await self.db.execute(
+            select(KnowledgeChunk.id, KnowledgeChunk.file_id, KnowledgeChunk.content, KnowledgeFile.filename)
+            .join(KnowledgeFile, KnowledgeFile.id == KnowledgeChunk.file_id)
+            .where(KnowledgeChunk.id.in_([chunk_id for chunk_id, _ in ranked]))
+        )
+        rows = {row.id: row for row in result.all()}
+        return [
+            ScoredChunk(
+                chunk_id=chunk_id,
+                file_id=rows[chunk_id].file_id,
+                filename=rows[chunk_id].filename,
+                content=rows[chunk_id].content,
+                score=score
+            )
+            for chunk_id, score in ranked if chunk_id in rows
+        ]
+
+
+def fuse_rankings(rankings: List[List[ScoredChunk]], top_k: int, k: int = 60) -> List[ScoredChunk]:
+    """Reciprocal rank fusion of several ranked lists (e.g. BM25 + dense)."""
+    fused: dict = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking):
+            score = 1.0 / (k + rank + 1)
+            if chunk.chunk_id in fused:
+                fused[chunk.chunk_id].score += score
+            else:
+                fused[chunk.chunk_id] = ScoredChunk(
+                    chunk_id=chunk.chunk_id,
+                    file_id=chunk.file_id,
+                    filename=chunk.filename,
+                    content=chunk.content,
+                    score=score
+                )
+    return sorted(fused.values(), key=lambda c: c.score, reverse=True)[:top_k]
+
+
+def format_knowledge(chunks: List[ScoredChunk]) -> str:
+    """Render retrieved chunks as the knowledge section of the prompt."""
+    if not chunks:
+        return ""
+    return "\n\nБАЗА ЗНАНИЙ:\n" + "\n".join(format_chunk(c) for c in chunks)
+
+
+def format_chunk(chunk: ScoredChunk) -> str:
+    return f"--- {chunk.filename} ---\n{chunk.content}"
@@ -1,6 +1,17 @@
+import json
+import time
 from fastapi import APIRouter, Depends
-from .models import AIRequest, AIResponse
+from fastapi.responses import StreamingResponse
+from src.database import AsyncSessionLocal
+from .models import AIBatchRequest, AIRequest, AIResponse
 from .service import ai_service, AIEngineService
+from .metrics import ttft_tracker, stream_total_tracker, prompt_usage_tracker, summary_tokens_saved
+from .summarizer import summarizer
+from .prompt_builder import prompt_builder
+from .admission import admission
+from .model_tiers import model_router
+from .answer_cache import answer_cache
+from src.modules.agent.cache import agent_cache
 
 router = APIRouter(prefix="/ai", tags=["AI Engine"])
 
@@ -15,6 +26,76 @@ async def process_message(
     """
     return await service.process_message(request)
 
+@router.post("/process/batch")
+async def process_batch(
+    batch: AIBatchRequest,
+    service: AIEngineService = Depends(lambda: ai_service)
+):
+    """
+    Process a list of messages concurrently under the engine's limits.
+    Streams one NDJSON line per item as it completes (AIBatchResult, with
+    per-item latency and error), then a final summary line.
+    """
+    async def lines():
+        started = time.perf_counter()
+        ok = failed = 0
+        session_factory = AsyncSessionLocal if batch.use_knowledge else None
+        async for result in service.process_batch(batch.requests, session_factory=session_factory):
+            ok += result.ok
+            failed += not result.ok
+            yield result.model_dump_json() + "\n"
+        yield json.dumps({
+            "done": True,
+            "total": len(batch.requests),
+            "ok": ok,
+            "failed": failed,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/health")
 async def ai_health():
     return {"status": "AI Engine Online", "model": "Mock-v1"}
+
+@router.get("/metrics")
+async def ai_metrics():
+    """
+    Streaming latency: time to first token and total generation time (ms).
+    Token usage, including prompt tokens the provider served from its prefix cache.
+    Admission control: active LLM turns, queue depth and wait time.
+    Transport: retries, hedges, timeouts and the provider circuit breaker.
+    Model tiers: calls, latency, tokens and estimated cost per tier.
+    Summaries: folding runs and prompt tokens saved per call by chat summaries.
+    Coalescing: widget messages and the AI turns they were merged into.
+    Jobs: the background queue running those turns.
+    """
+    from src.socket_manager import coalescer
+    from src.task_queue import job_queue
+    return {
+        "ttft_ms": ttft_tracker.snapshot(),
+        "stream_total_ms": stream_total_tracker.snapshot(),
+        "prompt_tokens": prompt_usage_tracker.snapshot(),
+        "prompt_prefixes": prompt_builder.snapshot(),
+        "admission": admission.snapshot(),
+        "transport": ai_service.client.snapshot(),
+        "model_tiers": model_router.snapshot(),
+        "summaries": {**summarizer.snapshot(), "tokens_saved_per_call": summary_tokens_saved.snapshot()},
+        "coalescing": coalescer.snapshot(),
+        "jobs": await job_queue.snapshot()
+    }
+
+@router.get("/cache/stats")
+async def answer_cache_stats():
+    """Answer cache hit/miss counters and estimated generation time saved."""
+    return {
+        "answers": answer_cache.snapshot(),
+        "agent_config": agent_cache.snapshot_stats()
+    }
+
+@router.get("/endpoints")
+async def llm_endpoints():
+    """Per-endpoint EWMA latency/error rate, health and recent routing events."""
+    if not ai_service.endpoints:
+        return {"current": None, "order": [], "endpoints": [], "events": []}
+    return ai_service.endpoints.snapshot()
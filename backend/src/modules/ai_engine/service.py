@@ -1,22 +1,41 @@
+import asyncio
+import json
+import time
+from contextlib import aclosing
 from openai import AsyncOpenAI
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from src.config import settings
-from .models import AIRequest, AIResponse, MessageRole
-from .prompts import SYSTEM_PROMPT, INTENT_CLASSIFICATION_PROMPT
-from src.models.agent import KnowledgeFile
+from src.tracing import current_span, span, trace, traced
+from .models import AIBatchResult, AIRequest, AIResponse, AIStreamChunk, MessageRole
+from .prompts import INTENT_CLASSIFICATION_PROMPT
+from .prompt_builder import prompt_builder
+from .retrieval import KnowledgeIndex, ScoredChunk, fuse_rankings
+from .prices import PriceIndex, PriceMatch, asks_price, price_chunk, price_reply, query_articles
+from .vector_store import DenseIndex
+from .intent_classifier import IntentPrediction, intent_classifier
+from .metrics import ttft_tracker, stream_total_tracker, prompt_usage_tracker
+from .answer_cache import CACHEABLE_INTENTS, answer_cache
+from .admission import AdmissionController, AdmissionRejected, admission, overflow_response, tenant_for
+from .transport import CircuitOpenError, ResilientClient, unavailable_response
+from .endpoints import EndpointRouter
+from .model_tiers import TierDecision, model_router
+from src.modules.agent.cache import AgentSnapshot, agent_cache
 
+VALID_INTENTS = ["booking_request", "pricing_query", "general_inquiry", "complaint", "handoff_request"]
 
-from src.modules.agent.service import AgentService
 
 class AIEngineService:
-    def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            base_url=settings.OPENAI_BASE_URL
-        )
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        admission_controller: Optional[AdmissionController] = None
+    ):
+        # Without an explicit client, calls are routed across settings.LLM_ENDPOINTS
+        self.endpoints = None if client else EndpointRouter.from_settings()
+        self.client = ResilientClient(client or self.endpoints)
         self.model = settings.OPENAI_MODEL
+        self.admission = admission_controller or admission
 
     async def process_message(
         self,
@@ -26,125 +45,659 @@ class AIEngineService:
     ) -> AIResponse:
         """
         Main entry point for processing a message.
-        1. Retrieve Knowledge
+        1. Retrieve Knowledge (top-k chunks relevant to the message)
         2. Retrieve Agent Config
         3. Classify Intent
         4. Generate Response (LLM)
+        Step 3 is answered locally when the in-process classifier is confident.
+        Otherwise, with GENERATION_MODE=single_call steps 3 and 4 are one
+        structured LLM call; malformed output falls back to the two-call path.
+        LLM work waits for an admission slot; turns that are not admitted get
+        the overflow reply (settings.LLM_OVERFLOW_POLICY). While the provider
+        circuit is open the turn is handed off to a human instead. Exact prices
+        found in the parsed price lists go to the prompt, or with
+        PRICE_REPLY_MODE=template answer a confident price question directly.
         """
-        # Retrieve knowledge and config if db provided
-        knowledge_context = ""
-        agent_config = None
-        
-        if db:
-            agent_service = AgentService(db)
-            
-            # Get agent config
+        with trace("ai.process_message", conversation_id=request.conversation_id) as turn_span:
+            started = time.perf_counter()
+            agent_config = await self._load_agent_config(db)
+
+            cache_key = await self._answer_cache_key(request, chat_history, db, agent_config)
+            if cache_key:
+                with span("answer_cache.get") as lookup:
+                    cached = await answer_cache.get(cache_key)
+                    lookup.set(hit=cached is not None)
+                if cached:
+                    cached.generation_path = "cache"
+                    turn_span.set(generation_path="cache", intent=cached.intent)
+                    return cached
+
+            business_context, knowledge, prices = await self._prepare_context(request, db, agent_config)
+            await self._release_connection(db)
+
+            direct = self._price_response(request, prices)
+            if direct:
+                turn_span.set(generation_path=direct.generation_path, intent=direct.intent)
+                return direct
+
+            tenant = tenant_for(request)
             try:
-                agent_config = await agent_service.get_config()
-            except Exception as e:
-                print(f"Error retrieving agent config: {e}")
+                with span("admission.wait", tenant=tenant):
+                    await self.admission.acquire(tenant)
+            except AdmissionRejected as e:
+                print(f"LLM admission rejected ({e.reason}) for {tenant}")
+                turn_span.set(generation_path="overflow")
+                return overflow_response()
+            try:
+                response = await self._generate_turn(request, chat_history, business_context, knowledge, agent_config)
+            except CircuitOpenError:
+                turn_span.set(generation_path="circuit_open")
+                return unavailable_response()
+            finally:
+                self.admission.release()
+
+            turn_span.set(generation_path=response.generation_path, intent=response.intent)
+            if cache_key and response.intent in CACHEABLE_INTENTS:
+                await answer_cache.set(cache_key, response, (time.perf_counter() - started) * 1000)
+            return response
+
+    async def _generate_turn(
+        self,
+        request: AIRequest,
+        chat_history: Optional[List[dict]],
+        business_context: str,
+        knowledge: List[ScoredChunk],
+        agent_config: Optional[AgentSnapshot]
+    ) -> AIResponse:
+        """Intent + reply for an admitted turn of process_message."""
+        # Fast path: a confident local prediction replaces the LLM classification call
+        prediction = self._predict_intent(request.text)
+        intent = None
+        intent_source = "llm"
+        if prediction and prediction.confidence >= settings.INTENT_CLASSIFIER_THRESHOLD:
+            intent = prediction.intent
+            intent_source = "classifier"
+
+        response_text = None
+        generation_path = "two_call"
+        if intent is not None:
+            generation_path = "local_intent"
+        elif settings.GENERATION_MODE == "single_call":
+            structured = await self._generate_structured(
+                user_message=request.text,
+                chat_history=chat_history,
+                business_context=business_context,
+                knowledge=knowledge,
+                agent_config=agent_config
+            )
+            if structured:
+                intent, response_text = structured
+                generation_path = "single_call"
+            else:
+                generation_path = "single_call_fallback"
+
+        if response_text is None:
+            # Classify intent
+            if intent is None:
+                intent = await self._classify_intent(request.text)
+                if intent is None:
+                    intent, intent_source = "general_inquiry", "default"
+
+            # Generate response
+            response_text = await self._generate_response(
+                user_message=request.text,
+                chat_history=chat_history,
+                business_context=business_context,
+                knowledge=knowledge,
+                agent_config=agent_config,
+                tier=model_router.choose(intent, request.text)
+            )
+
+        # For LLM-labelled intents this is the local model's probability of that label
+        confidence = prediction.scores.get(intent, 0.0) if prediction else 0.0
+
+        return AIResponse(
+            text=response_text,
+            intent=intent,
+            confidence=round(confidence, 4),
+            intent_source=intent_source,
+            suggested_actions=self._get_suggested_actions(intent),
+            generation_path=generation_path
+        )
+
+    async def stream_message(
+        self,
+        request: AIRequest,
+        chat_history: Optional[List[dict]] = None,
+        db: Optional[AsyncSession] = None
+    ) -> AsyncIterator[AIStreamChunk]:
+        """
+        Streaming variant of process_message.
+        Yields text deltas as the model produces them, then a final chunk
+        carrying the complete AIResponse. When the local classifier is not
+        confident, LLM intent classification runs concurrently with generation
+        instead of before it.
+        """
+        with trace("ai.stream_message", conversation_id=request.conversation_id) as turn_span:
+            started = time.perf_counter()
+            agent_config = await self._load_agent_config(db)
 
+            cache_key = await self._answer_cache_key(request, chat_history, db, agent_config)
+            if cache_key:
+                with span("answer_cache.get") as lookup:
+                    cached = await answer_cache.get(cache_key)
+                    lookup.set(hit=cached is not None)
+                if cached:
+                    cached.generation_path = "cache"
+                    turn_span.set(generation_path="cache", intent=cached.intent)
+                    yield AIStreamChunk(delta=cached.text)
+                    yield AIStreamChunk(response=cached)
+                    return
+
+            business_context, knowledge, prices = await self._prepare_context(request, db, agent_config)
+            await self._release_connection(db)
+
+            direct = self._price_response(request, prices)
+            if direct:
+                turn_span.set(generation_path=direct.generation_path, intent=direct.intent)
+                yield AIStreamChunk(delta=direct.text)
+                yield AIStreamChunk(response=direct)
+                return
+
+            tenant = tenant_for(request)
+            try:
+                with span("admission.wait", tenant=tenant):
+                    await self.admission.acquire(tenant)
+            except AdmissionRejected as e:
+                print(f"LLM admission rejected ({e.reason}) for {tenant}")
+                turn_span.set(generation_path="overflow")
+                response = overflow_response()
+                yield AIStreamChunk(delta=response.text)
+                yield AIStreamChunk(response=response)
+                return
+
+            # The slot is held until generation ends or the consumer stops iterating
+            try:
+                turn = self._stream_turn(request, chat_history, business_context, knowledge, agent_config, started)
+                async with aclosing(turn):
+                    async for chunk in turn:
+                        if chunk.response:
+                            response = chunk.response
+                            turn_span.set(generation_path=response.generation_path, intent=response.intent, ttft_ms=response.ttft_ms)
+                            if cache_key and response.intent in CACHEABLE_INTENTS:
+                                await answer_cache.set(cache_key, response, (time.perf_counter() - started) * 1000)
+                        yield chunk
+            except CircuitOpenError:
+                turn_span.set(generation_path="circuit_open")
+                response = unavailable_response()
+                yield AIStreamChunk(delta=response.text)
+                yield AIStreamChunk(response=response)
+            finally:
+                self.admission.release()
+
+    async def _stream_turn(
+        self,
+        request: AIRequest,
+        chat_history: Optional[List[dict]],
+        business_context: str,
+        knowledge: List[ScoredChunk],
+        agent_config: Optional[AgentSnapshot],
+        started: float
+    ) -> AsyncIterator[AIStreamChunk]:
+        """Deltas, then the final response, for an admitted turn of stream_message."""
+        prediction = self._predict_intent(request.text)
+        intent = None
+        intent_source = "llm"
+        intent_task = None
+        if prediction and prediction.confidence >= settings.INTENT_CLASSIFIER_THRESHOLD:
+            intent = prediction.intent
+            intent_source = "classifier"
+        else:
+            intent_task = asyncio.create_task(self._classify_intent(request.text))
+
+        parts = []
+        ttft_ms = None
+        try:
+            # Generation starts before an LLM-classified intent is known
+            async for delta in self._stream_response(
+                user_message=request.text,
+                chat_history=chat_history,
+                business_context=business_context,
+                knowledge=knowledge,
+                agent_config=agent_config,
+                tier=model_router.choose(intent, request.text)
+            ):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                    ttft_tracker.observe(ttft_ms)
+                parts.append(delta)
+                yield AIStreamChunk(delta=delta)
+
+            if intent_task:
+                intent = await intent_task
+                if intent is None:
+                    intent, intent_source = "general_inquiry", "default"
+        finally:
+            if intent_task and not intent_task.done():
+                intent_task.cancel()
+
+        total_ms = (time.perf_counter() - started) * 1000
+        stream_total_tracker.observe(total_ms)
+        confidence = prediction.scores.get(intent, 0.0) if prediction else 0.0
+        response = AIResponse(
+            text="".join(parts).strip(),
+            intent=intent,
+            confidence=round(confidence, 4),
+            intent_source=intent_source,
+            suggested_actions=self._get_suggested_actions(intent),
+            generation_path="stream",
+            ttft_ms=round(ttft_ms, 1) if ttft_ms is not None else None
+        )
+        yield AIStreamChunk(response=response)
+
+    async def process_batch(
+        self,
+        requests: List[AIRequest],
+        session_factory=None,
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[AIBatchResult]:
+        """
+        Process many requests concurrently, yielding results as they complete.
+        At most `concurrency` items are in flight, and each goes through
+        process_message, so admission control and the caches apply as usual.
+        A failed item yields an error result instead of failing the batch.
+        With session_factory every item gets its own database session.
+        """
+        concurrency = min(concurrency or settings.BATCH_CONCURRENCY, len(requests))
+        pending = iter(enumerate(requests))
+        # Bounded, so workers wait for a slow consumer instead of buffering results
+        results: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+
+        async def worker():
+            for index, request in pending:
+                await results.put(await self._process_batch_item(index, request, session_factory))
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for _ in range(len(requests)):
+                yield await results.get()
+        finally:
+            for task in workers:
+                task.cancel()
+
+    async def _process_batch_item(self, index: int, request: AIRequest, session_factory=None) -> AIBatchResult:
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            if session_factory:
+                async with session_factory() as db:
+                    response = await self.process_message(request, db=db)
+            else:
+                response = await self.process_message(request)
+            # Not admitted or provider down: report so the caller can retry the item
+            if response.generation_path in ("overflow", "circuit_open"):
+                error = response.generation_path
+        except Exception as e:
+            print(f"Batch item {index} failed: {e}")
+            error = f"{type(e).__name__}: {e}"
+        return AIBatchResult(
+            index=index,
+            conversation_id=request.conversation_id,
+            ok=error is None,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            response=response,
+            error=error
+        )
+
+    @staticmethod
+    async def _release_connection(db: Optional[AsyncSession]):
+        """
+        End the session's read transaction so its connection goes back to the
+        pool while the LLM call runs; the session checks one out again if the
+        caller uses it afterwards. Callers commit their own writes, so only
+        reads are pending here.
+        """
+        if db is not None and db.in_transaction():
+            await db.commit()
+
+    @traced("agent_config")
+    async def _load_agent_config(self, db: Optional[AsyncSession] = None) -> Optional[AgentSnapshot]:
+        """Get the cached agent config snapshot, or None without a db / on error."""
+        if not db:
+            return None
+        try:
+            return await agent_cache.get(db)
+        except Exception as e:
+            print(f"Error retrieving agent config: {e}")
+            return None
+
+    async def _answer_cache_key(
+        self,
+        request: AIRequest,
+        chat_history: Optional[List[dict]],
+        db: Optional[AsyncSession],
+        agent_config: Optional[AgentSnapshot]
+    ) -> Optional[str]:
+        """
+        Cache key for standalone questions, None when the turn is not cacheable.
+        A turn is standalone when no one has replied in the chat yet, so the
+        answer cannot depend on earlier conversation.
+        """
+        if not settings.ANSWER_CACHE_ENABLED or not agent_config:
+            return None
+        if chat_history and any(m.get("role") != "user" for m in chat_history):
+            return None
+        return answer_cache.make_key(
+            request.text,
+            agent_config.config_version,
+            agent_config.knowledge_version,
+            request.context
+        )
+
+    async def _prepare_context(
+        self,
+        request: AIRequest,
+        db: Optional[AsyncSession] = None,
+        agent_config: Optional[AgentSnapshot] = None
+    ) -> Tuple[str, List[ScoredChunk], List[PriceMatch]]:
+        """
+        Load the knowledge chunks and price list rows relevant to the message.
+        Returns (business_context, chunks, prices); matched prices lead the
+        chunks, so the prompt builder packs them first.
+        """
+        # Retrieve knowledge if db provided
+        chunks = []
+        prices = []
+
+        if db:
             # Get knowledge
             try:
-                result = await db.execute(select(KnowledgeFile))
-                files = result.scalars().all()
-                knowledge_texts = [f"--- {f.filename} ---\n{f.content}" for f in files if f.content]
-                if knowledge_texts:
-                    knowledge_context = "\n\nБАЗА ЗНАНИЙ:\n" + "\n".join(knowledge_texts)
+                chunks = await self._retrieve_knowledge(db, request.text, agent_config)
             except Exception as e:
                 print(f"Error retrieving knowledge: {e}")
+            try:
+                prices = await self._lookup_prices(db, request.text, agent_config)
+            except Exception as e:
+                print(f"Error looking up prices: {e}")
+            if prices:
+                chunks = [price_chunk(prices)] + chunks
+
+        business_context = request.context.get("business_info", "") if request.context else ""
+        return business_context, chunks, prices
 
-        # Format chat history for context
-        history_str = ""
-        if chat_history:
-            for msg in chat_history[-10:]:  # Last 10 messages for context
-                role = "Клиент" if msg.get("role") == "user" else "AI"
-                history_str += f"{role}: {msg.get('content', '')}\n"
-
-        # Classify intent
-        intent = await self._classify_intent(request.text)
-
-        # Generate response
-        response_text = await self._generate_response(
-            user_message=request.text,
-            chat_history=history_str,
-            business_context=(request.context.get("business_info", "") if request.context else "") + "\n" + knowledge_context,
-            agent_config=agent_config
+    @traced("prices")
+    async def _lookup_prices(
+        self,
+        db: AsyncSession,
+        text: str,
+        agent_config: Optional[AgentSnapshot] = None
+    ) -> List[PriceMatch]:
+        """
+        Price list rows matching the message: by name for a price question
+        (price words or a confident local pricing_query prediction),
+        otherwise only by an article the message contains.
+        """
+        if not settings.PRICE_LOOKUP_ENABLED or (agent_config and not agent_config.price_count):
+            return []
+        prediction = self._predict_intent(text)
+        by_name = asks_price(text) or (
+            prediction is not None
+            and prediction.intent == "pricing_query"
+            and prediction.confidence >= settings.INTENT_CLASSIFIER_THRESHOLD
         )
+        if not by_name and not query_articles(text):
+            current_span().set(skipped=True)
+            return []
+        matches = await PriceIndex(db).lookup(text, by_name=by_name)
+        current_span().set(by_name=by_name, matches=len(matches), best=matches[0].score if matches else None)
+        return matches
 
+    def _price_response(self, request: AIRequest, prices: List[PriceMatch]) -> Optional[AIResponse]:
+        """
+        Template reply for a confident price question with a strong match
+        (PRICE_REPLY_MODE=template); None sends the turn to the LLM.
+        """
+        if settings.PRICE_REPLY_MODE != "template" or not prices:
+            return None
+        if prices[0].score < settings.PRICE_DIRECT_MIN_SCORE:
+            return None
+        prediction = self._predict_intent(request.text)
+        if not prediction or prediction.intent != "pricing_query":
+            return None
+        if prediction.confidence < settings.INTENT_CLASSIFIER_THRESHOLD:
+            return None
         return AIResponse(
-            text=response_text,
-            intent=intent,
-            confidence=0.95,
-            suggested_actions=self._get_suggested_actions(intent)
+            text=price_reply(prices),
+            intent="pricing_query",
+            confidence=round(prediction.confidence, 4),
+            intent_source="classifier",
+            suggested_actions=self._get_suggested_actions("pricing_query"),
+            generation_path="price_lookup"
         )
 
-    async def _classify_intent(self, text: str) -> str:
+    @traced("retrieval")
+    async def _retrieve_knowledge(
+        self,
+        db: AsyncSession,
+        text: str,
+        agent_config: Optional[AgentSnapshot] = None
+    ) -> List[ScoredChunk]:
+        """
+        Pick the knowledge chunks for the prompt according to settings.RETRIEVAL_MODE:
+        bm25 (keyword), dense (embeddings) or hybrid (both, rank-fused).
+        """
+        # Corpus statistics come from the cached snapshot instead of a query per turn
+        stats = (agent_config.chunk_count, agent_config.avg_chunk_length) if agent_config else None
+        if stats and not stats[0]:
+            return []
+        mode = settings.RETRIEVAL_MODE
+        current_span().set(mode=mode)
+        if mode == "dense":
+            return await DenseIndex(db).search(text)
+        if mode == "hybrid":
+            top_k = settings.KNOWLEDGE_TOP_K
+            lexical = await KnowledgeIndex(db).search(text, top_k=top_k * 2, stats=stats)
+            dense = await DenseIndex(db).search(text, top_k=top_k * 2)
+            return fuse_rankings([lexical, dense], top_k=top_k)
+        return await KnowledgeIndex(db).search(text, stats=stats)
+
+    def _predict_intent(self, text: str) -> Optional[IntentPrediction]:
+        """
+        Score the message with the in-process classifier.
+        """
+        if not settings.INTENT_CLASSIFIER_ENABLED:
+            return None
+        with span("intent.local") as stage:
+            prediction = intent_classifier.predict(text)
+            if prediction:
+                stage.set(intent=prediction.intent, confidence=round(prediction.confidence, 4))
+            return prediction
+
+    @traced("intent.llm")
+    async def _classify_intent(self, text: str) -> Optional[str]:
         """
-        Classify user intent using LLM.
+        Classify user intent using LLM. None if the call fails or the label is unknown.
         """
         try:
             response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "user", "content": INTENT_CLASSIFICATION_PROMPT.format(message=text)}
+                    {"role": "system", "content": INTENT_CLASSIFICATION_PROMPT},
+                    {"role": "user", "content": text}
                 ],
                 max_tokens=20,
-                temperature=0.1
+                temperature=0.1,
+                deadline=settings.LLM_CLASSIFY_DEADLINE
             )
+            prompt_usage_tracker.observe(response.usage)
             intent = response.choices[0].message.content.strip().lower()
-            valid_intents = ["booking_request", "pricing_query", "general_inquiry", "complaint", "handoff_request"]
-            return intent if intent in valid_intents else "general_inquiry"
+            return intent if intent in VALID_INTENTS else None
         except Exception as e:
             print(f"Intent classification error: {e}")
-            return "general_inquiry"
+            return None
 
     async def _generate_response(
         self,
         user_message: str,
-        chat_history: str = "",
+        chat_history: Optional[List[dict]] = None,
         business_context: str = "",
-        agent_config = None
+        agent_config = None,
+        knowledge: Optional[List[ScoredChunk]] = None,
+        tier: Optional[TierDecision] = None
     ) -> str:
         """
-        Generate AI response using OpenAI.
-        """
-        # Default values if config is missing
-        name = "Profit Flow AI"
-        role = "умный бизнес-ассистент"
-        tone = "дружелюбным и профессиональным"
-        system_instructions = ""
-
-        if agent_config:
-            name = agent_config.name or name
-            role = agent_config.role or role
-            tone = agent_config.tone or tone
-            system_instructions = agent_config.system_prompt or ""
-
-        system_message = SYSTEM_PROMPT.format(
-            name=name,
-            role=role,
-            tone=tone,
-            system_instructions=system_instructions,
-            business_context=business_context or "Информация о бизнесе не указана.",
-            chat_history=chat_history or "Это начало диалога."
-        )
+        Generate AI response using OpenAI, with the model tier chosen for the turn.
+        """
+        tier = tier or model_router.choose(None, user_message)
+        with span("prompt.build"):
+            messages = prompt_builder.build(
+                user_message, chat_history, business_context, agent_config,
+                knowledge=knowledge, model=tier.model
+            )
 
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
-                max_tokens=800,
-                temperature=0.7
-            )
+            with span("llm.generate", tier=tier.tier, model=tier.model) as stage:
+                started = time.perf_counter()
+                response = await self.client.chat.completions.create(
+                    model=tier.model,
+                    messages=messages,
+                    max_tokens=tier.max_tokens,
+                    temperature=tier.temperature
+                )
+                usage = prompt_usage_tracker.observe(response.usage)
+                stage.set(**(usage or {}))
+            model_router.record(tier, (time.perf_counter() - started) * 1000, usage)
             return response.choices[0].message.content.strip()
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"Response generation error: {e}")
             return "Извините, произошла ошибка. Попробуйте позже или свяжитесь с оператором."
 
+    async def _stream_response(
+        self,
+        user_message: str,
+        chat_history: Optional[List[dict]] = None,
+        business_context: str = "",
+        agent_config = None,
+        knowledge: Optional[List[ScoredChunk]] = None,
+        tier: Optional[TierDecision] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate AI response using OpenAI with stream=True, yielding text deltas.
+        """
+        tier = tier or model_router.choose(None, user_message)
+        with span("prompt.build"):
+            messages = prompt_builder.build(
+                user_message, chat_history, business_context, agent_config,
+                knowledge=knowledge, model=tier.model
+            )
+
+        emitted = False
+        usage = None
+        try:
+            with span("llm.stream", tier=tier.tier, model=tier.model) as stage:
+                started = time.perf_counter()
+                stream = await self.client.chat.completions.create(
+                    model=tier.model,
+                    messages=messages,
+                    max_tokens=tier.max_tokens,
+                    temperature=tier.temperature,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                stage.set(opened_ms=round((time.perf_counter() - started) * 1000, 1))
+                try:
+                    async for chunk in stream:
+                        # The usage block arrives in a final chunk without choices
+                        if getattr(chunk, "usage", None):
+                            usage = prompt_usage_tracker.observe(chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            if not emitted:
+                                stage.set(first_token_ms=round((time.perf_counter() - started) * 1000, 1))
+                            emitted = True
+                            yield chunk.choices[0].delta.content
+                finally:
+                    # A cancelled or abandoned turn closes the HTTP response instead of reading it to the end
+                    close = getattr(stream, "close", None)
+                    if close:
+                        await close()
+                stage.set(**(usage or {}))
+            model_router.record(tier, (time.perf_counter() - started) * 1000, usage)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"Response streaming error: {e}")
+            if not emitted:
+                yield "Извините, произошла ошибка. Попробуйте позже или свяжитесь с оператором."
+
+    async def _generate_structured(
+        self,
+        user_message: str,
+        chat_history: Optional[List[dict]] = None,
+        business_context: str = "",
+        agent_config = None,
+        knowledge: Optional[List[ScoredChunk]] = None,
+        tier: Optional[TierDecision] = None
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Classify intent and generate the reply in one JSON-mode call.
+        Returns (intent, text), or None if the call fails or the payload is
+        malformed, so the caller can fall back to the two-call path.
+        """
+        # The intent is part of the answer, so the tier depends on the message alone
+        tier = tier or model_router.choose(None, user_message)
+        with span("prompt.build"):
+            messages = prompt_builder.build(
+                user_message, chat_history, business_context, agent_config,
+                structured=True, knowledge=knowledge, model=tier.model
+            )
+
+        try:
+            with span("llm.structured", tier=tier.tier, model=tier.model) as stage:
+                started = time.perf_counter()
+                response = await self.client.chat.completions.create(
+                    model=tier.model,
+                    messages=messages,
+                    max_tokens=tier.max_tokens,
+                    temperature=tier.temperature,
+                    response_format={"type": "json_object"}
+                )
+                usage = prompt_usage_tracker.observe(response.usage)
+                stage.set(**(usage or {}))
+            model_router.record(tier, (time.perf_counter() - started) * 1000, usage)
+            return self._parse_structured(response.choices[0].message.content)
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            print(f"Structured generation error: {e}")
+            return None
+
+    @staticmethod
+    def _parse_structured(raw: Optional[str]) -> Optional[Tuple[str, str]]:
+        """Validate a {"intent", "text"} payload; None if it is unusable."""
+        if not raw:
+            return None
+        raw = raw.strip()
+        # Some providers wrap JSON in a markdown code fence despite JSON mode
+        if raw.startswith("```"):
+            raw = raw.strip("`")
+            if raw.lower().startswith("json"):
+                raw = raw[4:]
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            print(f"Structured generation returned invalid JSON: {raw[:200]}")
+            return None
+        if not isinstance(payload, dict):
+            return None
+        intent = str(payload.get("intent", "")).strip().lower()
+        text = payload.get("text")
+        if intent not in VALID_INTENTS or not isinstance(text, str) or not text.strip():
+            print(f"Structured generation payload rejected: {raw[:200]}")
+            return None
+        return intent, text.strip()
+
     def _get_suggested_actions(self, intent: str) -> List[str]:
         """
         Return suggested actions based on intent.
@@ -0,0 +1,145 @@
+"""
+Rolling conversation summaries.
+
+After each AI turn a background task checks the chat. Once more than
+SUMMARY_KEEP_RECENT + SUMMARY_TRIGGER messages sit after the summary
+watermark, everything but the newest SUMMARY_KEEP_RECENT is folded into
+Chat.summary with one LLM call that only sees the previous summary and the
+new messages. The watermark (Chat.summary_until_message_id) then moves
+forward. ChatService.get_chat_history returns the summary plus the messages
+after the watermark, so the prompt carries a compact summary instead of the
+old turns. Chat.summary_source_tokens keeps what those turns would have cost,
+which is how the savings per turn are measured.
+"""
+import asyncio
+from collections import Counter
+from typing import List, Optional, Set
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.tracing import span, trace
+from src.models.chat import Chat, Message, MessageRole
+from .admission import AdmissionRejected
+from .context_packer import get_token_counter
+from .prompts import SUMMARIZE_CONVERSATION_PROMPT
+
+ROLE_LABELS = {
+    MessageRole.USER: "Клиент",
+    MessageRole.ASSISTANT: "AI",
+    MessageRole.MANAGER: "Менеджер",
+    MessageRole.SYSTEM: "Система",
+}
+MAX_BATCHES_PER_RUN = 5  # A long backlog is caught up over several turns
+TENANT = "background:summaries"  # One fair-queue tenant for all summaries
+
+
+class ConversationSummarizer:
+    def __init__(self):
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = Counter()
+
+    def schedule(self, chat_id: int):
+        """Fold older messages of the chat in the background, if it is due."""
+        if not settings.SUMMARY_ENABLED or chat_id in self._running:
+            return
+        self._running.add(chat_id)
+        task = asyncio.create_task(self._run(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, chat_id: int):
+        try:
+            async with AsyncSessionLocal() as db:
+                for _ in range(MAX_BATCHES_PER_RUN):
+                    if not await self.summarize(db, chat_id):
+                        break
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Chat summary error for chat {chat_id}: {e}")
+        finally:
+            self._running.discard(chat_id)
+
+    async def summarize(self, db: AsyncSession, chat_id: int) -> bool:
+        """Fold one batch of older messages into the summary. False if nothing was due."""
+        result = await db.execute(
+            select(Chat.summary, Chat.summary_until_message_id, Chat.summary_source_tokens)
+            .where(Chat.id == chat_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return False
+        summary, until_id, source_tokens = row
+
+        keep = settings.SUMMARY_KEEP_RECENT
+        result = await db.execute(
+            select(Message)
+            .where(Message.chat_id == chat_id, Message.id > (until_id or 0))
+            .order_by(Message.id)
+            .limit(settings.SUMMARY_BATCH_MAX + keep)
+        )
+        pending = result.scalars().all()
+        if len(pending) <= keep + settings.SUMMARY_TRIGGER:
+            return False
+        fold = pending[:-keep]
+
+        # Scheduled by a turn but not part of it: traced on its own
+        with trace("chat.summarize", detached=True, chat_id=chat_id, messages=len(fold)):
+            new_summary = await self._fold(summary, fold)
+            if not new_summary:
+                return False
+
+            counter = get_token_counter()
+            folded_tokens = sum(counter.count(m.content or "") for m in fold)
+            await db.execute(
+                update(Chat)
+                .where(Chat.id == chat_id, Chat.summary_until_message_id.is_not_distinct_from(until_id))
+                .values(
+                    summary=new_summary,
+                    summary_until_message_id=fold[-1].id,
+                    summary_source_tokens=(source_tokens or 0) + folded_tokens,
+                    updated_at=Chat.updated_at  # Not a chat activity; keep the inbox order
+                )
+            )
+            await db.commit()
+        self.stats["summaries"] += 1
+        self.stats["messages_folded"] += len(fold)
+        return True
+
+    async def _fold(self, summary: Optional[str], messages: List[Message]) -> Optional[str]:
+        from .service import ai_service
+
+        lines = "\n".join(
+            f"{ROLE_LABELS.get(m.role, 'Клиент')}: {m.content}" for m in messages if m.content
+        )
+        prompt = SUMMARIZE_CONVERSATION_PROMPT.format(
+            max_words=settings.SUMMARY_MAX_WORDS,
+            summary=summary or "(пока пусто)",
+            messages=lines
+        )
+        try:
+            await ai_service.admission.acquire(TENANT)
+        except AdmissionRejected:
+            self.stats["skipped_busy"] += 1
+            return None
+        try:
+            with span("llm.summarize"):
+                response = await ai_service.client.chat.completions.create(
+                    model=settings.SUMMARY_MODEL or settings.OPENAI_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=settings.SUMMARY_MAX_WORDS * 3,
+                    temperature=0.2
+                )
+        finally:
+            ai_service.admission.release()
+        text = (response.choices[0].message.content or "").strip()
+        return text or None
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "running": len(self._running)}
+
+
+summarizer = ConversationSummarizer()
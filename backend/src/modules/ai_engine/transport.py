@@ -0,0 +1,236 @@
+"""
+Resilient transport for chat completion calls.
+
+ResilientClient wraps an AsyncOpenAI-compatible client and keeps its
+`chat.completions.create(...)` surface, adding:
+- a deadline per call (LLM_DEADLINE, or `deadline=` per call) covering all
+  attempts, so a slow provider cannot hold a handler for the SDK's 10 minutes
+- retries with full-jitter exponential backoff on retryable errors
+  (timeouts, connection errors, 408/409/429/5xx)
+- optional hedging (LLM_HEDGE_ENABLED): when a non-streaming call is still
+  running after the observed p95 latency, a second identical request is sent
+  and the first successful answer wins
+- a circuit breaker: after LLM_BREAKER_FAILURES failed calls in a row every
+  call fails fast with CircuitOpenError for LLM_BREAKER_COOLDOWN seconds,
+  then a single probe decides whether to close it again
+
+The engine turns CircuitOpenError into a handoff to a human operator.
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Optional
+
+import openai
+
+from src.config import settings
+from src.tracing import current_span
+from .metrics import LatencyTracker
+from .models import AIResponse
+
+
+UNAVAILABLE_REPLY = "Извините, сейчас я не могу ответить. Я передал ваш вопрос менеджеру, он скоро свяжется с вами."
+
+RETRYABLE_STATUS = {408, 409, 429}
+HEDGE_MIN_SAMPLES = 20  # Latency samples needed before p95 is trusted
+
+
+class CircuitOpenError(Exception):
+    """The provider is considered unhealthy; the call was not attempted."""
+
+
+def unavailable_response() -> AIResponse:
+    """Reply while the provider circuit is open: hand the chat to a human."""
+    return AIResponse(
+        text=UNAVAILABLE_REPLY,
+        intent="handoff_request",
+        intent_source="default",
+        suggested_actions=["connect_operator"],
+        generation_path="circuit_open",
+        handoff=True
+    )
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def is_client_error(error: BaseException) -> bool:
+    """The provider answered and rejected the request itself (bad request, auth...)."""
+    return isinstance(error, openai.APIStatusError) and not is_retryable(error)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: Optional[int] = None, cooldown: Optional[float] = None):
+        self.failure_threshold = failure_threshold or settings.LLM_BREAKER_FAILURES
+        self.cooldown = cooldown if cooldown is not None else settings.LLM_BREAKER_COOLDOWN
+        self.state = "closed"  # closed | open | half_open
+        self.failures = 0
+        self.trips = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        # Half-open: one probe call at a time
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+                print(f"LLM circuit breaker opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def record_abandoned(self):
+        """The call was cancelled by its caller; it says nothing about the provider."""
+        self._probing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "cooldown": self.cooldown,
+        }
+
+
+class ResilientClient:
+    def __init__(
+        self,
+        client,
+        breaker: Optional[CircuitBreaker] = None,
+        max_retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        hedge: Optional[bool] = None
+    ):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries if max_retries is not None else settings.LLM_MAX_RETRIES
+        self.backoff = backoff if backoff is not None else settings.LLM_RETRY_BACKOFF
+        self.hedge = hedge if hedge is not None else settings.LLM_HEDGE_ENABLED
+        self.latency = LatencyTracker()
+        self.stats = Counter()
+        # Same call shape as AsyncOpenAI: client.chat.completions.create(...)
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, deadline: Optional[float] = None, **kwargs):
+        if not self.breaker.allow():
+            self.stats["short_circuited"] += 1
+            raise CircuitOpenError("LLM provider circuit is open")
+        self.stats["calls"] += 1
+        expires = time.monotonic() + (deadline or settings.LLM_DEADLINE)
+        attempt = 0
+        while True:
+            remaining = expires - time.monotonic()
+            try:
+                if kwargs.get("stream"):
+                    # Streams are not hedged; the deadline covers opening the stream
+                    result = await asyncio.wait_for(self.client.chat.completions.create(**kwargs), remaining)
+                else:
+                    result = await self._hedged(kwargs, remaining)
+                self.breaker.record_success()
+                if attempt:
+                    current_span().set(retries=attempt)
+                return result
+            except asyncio.CancelledError:
+                self.breaker.record_abandoned()
+                raise
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats["timeouts"] += 1
+                if is_client_error(e):
+                    self.breaker.record_success()  # The provider is up, the request is wrong
+                    raise
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                attempt += 1
+                if not is_retryable(e) or attempt > self.max_retries or time.monotonic() + delay >= expires:
+                    self.stats["failures"] += 1
+                    self.breaker.record_failure()
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def _hedged(self, kwargs: dict, remaining: float):
+        started = time.perf_counter()
+        hedge_after = self._hedge_delay()
+        if hedge_after is None or hedge_after >= remaining:
+            result = await asyncio.wait_for(self.client.chat.completions.create(**kwargs), remaining)
+            self.latency.observe((time.perf_counter() - started) * 1000)
+            return result
+
+        primary = asyncio.create_task(self.client.chat.completions.create(**kwargs))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done:
+                self.stats["hedges"] += 1
+                current_span().set(hedged=True)
+                tasks.add(asyncio.create_task(self.client.chat.completions.create(**kwargs)))
+            winner = await self._first_success(tasks, expires=time.monotonic() + remaining - hedge_after)
+            if winner is not primary:
+                self.stats["hedge_wins"] += 1
+            self.latency.observe((time.perf_counter() - started) * 1000)
+            return winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    @staticmethod
+    async def _first_success(tasks: set, expires: float) -> asyncio.Task:
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0.0, expires - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in done:
+                if task.exception() is None:
+                    return task
+                error = task.exception()
+        raise error
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(self.latency.percentile(0.95) / 1000, settings.LLM_HEDGE_MIN_DELAY)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.stats["calls"],
+            "failures": self.stats["failures"],
+            "retries": self.stats["retries"],
+            "timeouts": self.stats["timeouts"],
+            "hedges": self.stats["hedges"],
+            "hedge_wins": self.stats["hedge_wins"],
+            "short_circuited": self.stats["short_circuited"],
+            "hedge_after_ms": round(self._hedge_delay() * 1000, 1) if self._hedge_delay() else None,
+            "latency_ms": self.latency.snapshot(),
+            "breaker": self.breaker.snapshot(),
+        }
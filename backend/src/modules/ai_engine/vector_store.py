@@ -0,0 +1,289 @@
+"""
+Dense vector index over knowledge chunks.
+
+Vectors live in a flat float32 file (row-major, one row per chunk) next to an
+int64 file with the chunk id of every row. Both are memory-mapped, so workers
+share the OS page cache instead of each holding a copy. Adding chunks appends
+rows; deleting marks the row id as -1 and the files are compacted once enough
+rows are dead. The number of live rows is kept in meta.json, so the size of
+the store is known without scanning the ids.
+"""
+import asyncio
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.models.agent import KnowledgeChunk
+from .embeddings import Embedder, get_embedder
+from .retrieval import KnowledgeIndex, ScoredChunk
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+
+DELETED = -1
+COMPACT_RATIO = 0.3  # Rewrite the files when this share of rows is deleted
+SEARCH_BLOCK_ROWS = 65536  # Rows scored per matmul, bounds temporary memory
+
+
+class VectorStore:
+    """Append-only memory-mapped matrix of unit vectors keyed by chunk id."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.ids_path = os.path.join(path, "ids.i64")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.lock_path = os.path.join(path, "write.lock")
+        self._lock = threading.Lock()
+        self._signature = None
+        self._meta_mtime = None
+        self._vectors: Optional[np.ndarray] = None
+        self._ids: Optional[np.ndarray] = None
+        self.meta = {"dim": 0, "embedder": None, "count": 0}
+        os.makedirs(path, exist_ok=True)
+        self._load_meta()
+
+    @property
+    def dim(self) -> int:
+        return self.meta["dim"]
+
+    @property
+    def embedder_name(self) -> Optional[str]:
+        return self.meta["embedder"]
+
+    def _load_meta(self):
+        if os.path.exists(self.meta_path):
+            self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+
+    def _save_meta(self):
+        # Replaced atomically: readers reload it without taking the write lock
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialise writers within the process and across uvicorn workers."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """(Re)open the memory maps and meta if another writer changed the files."""
+        if not os.path.exists(self.ids_path):
+            self._vectors, self._ids, self._signature = None, None, None
+            return
+        stat = os.stat(self.ids_path)
+        signature = (stat.st_ino, stat.st_size)
+        if signature == self._signature:
+            # Removals rewrite ids in place and only change the count in meta
+            if os.path.exists(self.meta_path) and os.stat(self.meta_path).st_mtime_ns != self._meta_mtime:
+                self._load_meta()
+            return
+        self._load_meta()
+        rows = stat.st_size // 8
+        if rows == 0 or not self.dim:
+            self._vectors, self._ids = None, None
+        else:
+            self._ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(rows,))
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        self._signature = signature
+
+    def __len__(self) -> int:
+        self._refresh()
+        return 0 if self._ids is None else self._live_count()
+
+    def _live_count(self) -> int:
+        if "count" not in self.meta:  # Stores written before the count was kept
+            self.meta["count"] = 0 if self._ids is None else int((np.asarray(self._ids) != DELETED).sum())
+        return self.meta["count"]
+
+    def chunk_ids(self) -> set:
+        self._refresh()
+        if self._ids is None:
+            return set()
+        return set(int(i) for i in self._ids if i != DELETED)
+
+    def reset(self, embedder_name: Optional[str] = None):
+        """Drop every vector, e.g. when the embedder changes."""
+        with self._write_lock():
+            for p in (self.vectors_path, self.ids_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            self.meta = {"dim": 0, "embedder": embedder_name, "count": 0}
+            self._save_meta()
+            self._refresh()
+
+    def add(self, chunk_ids: List[int], vectors: np.ndarray, embedder_name: str):
+        if not chunk_ids:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._write_lock():
+            self._refresh()
+            self._load_meta()
+            if not self.dim:
+                self.meta = {"dim": int(vectors.shape[1]), "embedder": embedder_name, "count": 0}
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dim {vectors.shape[1]} does not match index dim {self.dim}")
+            # Vectors, then the count, then ids: readers size the matrix and reload meta from the ids file
+            with open(self.vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            self.meta["count"] = self._live_count() + len(chunk_ids)
+            self._save_meta()
+            with open(self.ids_path, "ab") as f:
+                f.write(np.asarray(chunk_ids, dtype=np.int64).tobytes())
+            self._refresh()
+
+    def remove(self, chunk_ids: Iterable[int]):
+        chunk_ids = np.asarray(list(chunk_ids), dtype=np.int64)
+        if chunk_ids.size == 0 or not os.path.exists(self.ids_path):
+            return
+        with self._write_lock():
+            self._refresh()
+            if self._ids is None:
+                return
+            live = self._live_count()
+            ids = np.memmap(self.ids_path, dtype=np.int64, mode="r+", shape=self._ids.shape)
+            hit = np.isin(ids, chunk_ids[chunk_ids != DELETED])
+            ids[hit] = DELETED
+            ids.flush()
+            del ids
+            self.meta["count"] = live - int(hit.sum())
+            self._save_meta()
+            if len(self._ids) - self.meta["count"] > len(self._ids) * COMPACT_RATIO:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the files without deleted rows. Caller holds the write lock."""
+        live = np.asarray(self._ids) != DELETED
+        vectors = np.ascontiguousarray(self._vectors[live])
+        ids = np.asarray(self._ids[live])
+        tmp_vectors, tmp_ids = self.vectors_path + ".tmp", self.ids_path + ".tmp"
+        vectors.tofile(tmp_vectors)
+        ids.tofile(tmp_ids)
+        self._vectors, self._ids = None, None
+        os.replace(tmp_vectors, self.vectors_path)
+        self.meta["count"] = len(ids)
+        self._save_meta()
+        os.replace(tmp_ids, self.ids_path)
+        self._refresh()
+
+    def search(self, queries: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+        """
+        Batched cosine top-k. queries is a (q, dim) matrix of unit vectors;
+        returns, per query, up to top_k (chunk_id, score) pairs best first.
+        """
+        self._refresh()
+        if self._ids is None or queries.size == 0:
+            return [[] for _ in range(len(queries))]
+        vectors, ids = self._vectors, self._ids
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        n_queries = queries.shape[0]
+        best_scores = np.full((n_queries, top_k), -np.inf, dtype=np.float32)
+        best_rows = np.full((n_queries, top_k), -1, dtype=np.int64)
+
+        for start in range(0, len(ids), SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, len(ids))
+            scores = queries @ vectors[start:end].T
+            scores[:, np.asarray(ids[start:end]) == DELETED] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_rows = np.concatenate([best_rows, rows], axis=1)
+            k = min(top_k, merged_scores.shape[1])
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_rows = np.take_along_axis(merged_rows, top, axis=1)
+
+        results = []
+        for q in range(n_queries):
+            order = np.argsort(-best_scores[q])
+            results.append([
+                (int(ids[best_rows[q, i]]), float(best_scores[q, i]))
+                for i in order if best_rows[q, i] >= 0 and np.isfinite(best_scores[q, i])
+            ])
+        return results
+
+
+_store: Optional[VectorStore] = None
+
+
+def get_vector_store() -> VectorStore:
+    global _store
+    if _store is None:
+        _store = VectorStore(settings.KNOWLEDGE_INDEX_DIR)
+    return _store
+
+
+class DenseIndex:
+    """Keeps the vector store in step with knowledge_chunks and searches it."""
+
+    def __init__(self, db: AsyncSession, store: Optional[VectorStore] = None, embedder: Optional[Embedder] = None):
+        self.db = db
+        self.store = store if store is not None else get_vector_store()
+        self.embedder = embedder if embedder is not None else get_embedder()
+
+    async def index_chunks(self, chunks: List[KnowledgeChunk]):
+        if not chunks:
+            return
+        if self.store.embedder_name not in (None, self.embedder.name):
+            # Embedder changed: old vectors are in a different space
+            await asyncio.to_thread(self.store.reset, self.embedder.name)
+        vectors = await self.embedder.embed([c.content for c in chunks])
+        await asyncio.to_thread(self.store.add, [c.id for c in chunks], vectors, self.embedder.name)
+
+    async def remove_file(self, file_id: int):
+        result = await self.db.execute(
+            select(KnowledgeChunk.id).where(KnowledgeChunk.file_id == file_id)
+        )
+        await asyncio.to_thread(self.store.remove, result.scalars().all())
+
+    async def sync(self) -> Tuple[int, int]:
+        """
+        Incrementally reconcile the store with the database: embed chunks that
+        have no vector yet and drop vectors of deleted chunks.
+        """
+        if self.store.embedder_name not in (None, self.embedder.name):
+            await asyncio.to_thread(self.store.reset, self.embedder.name)
+        result = await self.db.execute(select(KnowledgeChunk.id))
+        db_ids = set(result.scalars().all())
+        stored = self.store.chunk_ids()
+
+        stale = stored - db_ids
+        await asyncio.to_thread(self.store.remove, stale)
+
+        missing = sorted(db_ids - stored)
+        for start in range(0, len(missing), 256):
+            batch = missing[start:start + 256]
+            result = await self.db.execute(
+                select(KnowledgeChunk).where(KnowledgeChunk.id.in_(batch))
+            )
+            await self.index_chunks(result.scalars().all())
+        return len(missing), len(stale)
+
+    async def search(self, query: str, top_k: Optional[int] = None) -> List[ScoredChunk]:
+        top_k = top_k or settings.KNOWLEDGE_TOP_K
+        if len(self.store) == 0:
+            return []
+        queries = await self.embedder.embed([query])
+        ranked = (await asyncio.to_thread(self.store.search, queries, top_k))[0]
+        return await KnowledgeIndex(self.db).load_chunks(ranked)
@@ -0,0 +1,166 @@
+"""
+Burst coalescing of incoming customer messages.
+
+Widget users often send a thought as several short messages within a couple
+of seconds. Each message is persisted and shown right away, but the AI turn
+waits until the chat has been quiet for CHAT_DEBOUNCE_WINDOW seconds and then
+answers all pending messages at once. CHAT_DEBOUNCE_MAX_WAIT caps the wait
+for someone who keeps typing.
+
+The turn itself is a job on the background queue (kind AI_TURN_JOB, key
+chat:<id>), so turns of one chat never overlap and the socket handler only
+persists and returns. A turn that has not produced its reply yet is cancelled
+when a newer message makes it stale (its messages are answered by the next
+turn instead) and when a manager takes the chat over or closes it (cancel()).
+The job's task is cancelled with the reason as the message, so the handler
+can tell the widget why; cancellation reaches the provider call and closes
+its HTTP stream.
+
+Turns answered inside an HTTP request (/chats/send) do not go through the
+queue; they run under tracked(), so cancel() stops them as well and the
+request gets TurnCancelled.
+"""
+import asyncio
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.config import settings
+from src.task_queue import JobQueue
+
+
+AI_TURN_JOB = "ai_turn"
+
+
+@dataclass
+class PendingMessage:
+    id: int
+    text: str
+    received_at: float  # Unix time
+
+
+class TurnCancelled(Exception):
+    """A tracked AI turn was cancelled by cancel(); args[0] is the reason."""
+
+
+def chat_key(chat_id: int) -> str:
+    return f"chat:{chat_id}"
+
+
+class MessageCoalescer:
+    def __init__(self, queue: JobQueue, window: Optional[float] = None, max_wait: Optional[float] = None):
+        self.queue = queue
+        self.window = window if window is not None else settings.CHAT_DEBOUNCE_WINDOW
+        self.max_wait = max_wait if max_wait is not None else settings.CHAT_DEBOUNCE_MAX_WAIT
+        self._pending: Dict[int, List[PendingMessage]] = {}
+        self._burst_started: Dict[int, float] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        # Turns enqueued and not settled yet: chat id -> (job id, messages)
+        self._dispatched: Dict[int, Tuple[int, List[PendingMessage]]] = {}
+        # Turns running in request handlers: chat id -> tasks, and why a stopped one was cancelled
+        self._direct: Dict[int, Set[asyncio.Task]] = {}
+        self._stopped: Dict[asyncio.Task, str] = {}
+        self.stats = Counter()
+
+    async def submit(self, chat_id: int, message_id: int, text: str):
+        """Queue a persisted message for the chat's next AI turn."""
+        self._pending.setdefault(chat_id, []).append(PendingMessage(message_id, text, time.time()))
+        self.stats["messages"] += 1
+        self._schedule(chat_id)
+
+        # A reply still being generated does not answer this message: its messages join the next turn
+        dispatched = self._dispatched.pop(chat_id, None)
+        if dispatched and await self.queue.cancel(dispatched[0], reason="superseded"):
+            self.stats["superseded_turns"] += 1
+            self._pending.setdefault(chat_id, [])[:0] = dispatched[1]
+            self._schedule(chat_id)
+
+    async def cancel(self, chat_id: int, reason: str) -> bool:
+        """Drop the chat's pending burst and cancel its AI turns. True if anything was stopped."""
+        timer = self._timers.pop(chat_id, None)
+        if timer:
+            timer.cancel()
+        self._burst_started.pop(chat_id, None)
+        self._dispatched.pop(chat_id, None)
+        stopped = bool(self._pending.pop(chat_id, None))
+        for task in self._direct.pop(chat_id, set()):
+            self._stopped[task] = reason
+            task.cancel(msg=reason)
+            stopped = True
+        stopped = await self.queue.cancel_key(chat_key(chat_id), reason=reason) > 0 or stopped
+        if stopped:
+            self.stats["cancelled_turns"] += 1
+            print(f"AI turn for chat {chat_id} cancelled: {reason}")
+        return stopped
+
+    @contextmanager
+    def tracked(self, chat_id: int):
+        """Run an AI turn of the chat in the current task so that cancel() stops it with TurnCancelled."""
+        task = asyncio.current_task()
+        self._direct.setdefault(chat_id, set()).add(task)
+        try:
+            yield
+        except asyncio.CancelledError:
+            reason = self._stopped.pop(task, None)
+            if reason is None:
+                raise
+            task.uncancel()
+            raise TurnCancelled(reason)
+        finally:
+            self._stopped.pop(task, None)
+            tasks = self._direct.get(chat_id)
+            if tasks is not None:
+                tasks.discard(task)
+                if not tasks:
+                    del self._direct[chat_id]
+
+    def settle(self, chat_id: int, job_id: int):
+        """Called by the running turn once its reply is complete: newer messages no longer supersede it."""
+        if self._dispatched.get(chat_id, (None,))[0] == job_id:
+            del self._dispatched[chat_id]
+
+    def _schedule(self, chat_id: int):
+        # Every message restarts the quiet period, up to max_wait after the burst started
+        now = time.monotonic()
+        started = self._burst_started.setdefault(chat_id, now)
+        delay = min(self.window, max(0.0, started + self.max_wait - now))
+        timer = self._timers.pop(chat_id, None)
+        if timer:
+            timer.cancel()
+        self._timers[chat_id] = asyncio.get_running_loop().call_later(delay, self._flush, chat_id)
+
+    def _flush(self, chat_id: int):
+        self._timers.pop(chat_id, None)
+        self._burst_started.pop(chat_id, None)
+        batch = self._pending.pop(chat_id, [])
+        if not batch:
+            return
+        self.stats["turns"] += 1
+        if len(batch) > 1:
+            self.stats["merged_messages"] += len(batch)
+        asyncio.create_task(self._dispatch(chat_id, batch))
+
+    async def _dispatch(self, chat_id: int, batch: List[PendingMessage]):
+        try:
+            job_id = await self.queue.enqueue(
+                AI_TURN_JOB,
+                {"chat_id": chat_id, "messages": [asdict(m) for m in batch]},
+                key=chat_key(chat_id)
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Failed to enqueue AI turn for chat {chat_id}: {e}")
+            return
+        self._dispatched[chat_id] = (job_id, batch)
+
+    def snapshot(self) -> dict:
+        messages, turns = self.stats["messages"], self.stats["turns"]
+        return {
+            **self.stats,
+            "window_s": self.window,
+            "max_wait_s": self.max_wait,
+            "pending_chats": len(self._pending),
+            "messages_per_turn": round(messages / turns, 2) if turns else None,
+        }
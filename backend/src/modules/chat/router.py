@@ -1,22 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
+import json
 
-from src.database import get_db
+from src.config import settings
+from src.database import get_db, AsyncSessionLocal
 from src.modules.ai_engine.service import ai_service
 from src.modules.ai_engine.models import AIRequest
+from src.modules.ai_engine.summarizer import summarizer
+from src.models.chat import ChatStatus
+from src.tracing import current_span, trace, traced
 from .schemas import (
     ChatCreate,
     ChatResponse,
     ChatStatusUpdate,
     ClientResponse,
     ClientUpdate,
+    InboxPage,
     MessageCreate,
+    MessagePage,
     MessageResponse,
     NotesUpdate,
     SendMessageRequest,
     SendMessageResponse
 )
+from .coalescer import TurnCancelled
 from .service import ChatService
 
 
@@ -25,12 +34,29 @@ router = APIRouter(prefix="/chats", tags=["Chats"])
 
 @router.get("/", response_model=List[ChatResponse])
 async def get_all_chats(db: AsyncSession = Depends(get_db)):
-    """Get all chats with messages and client info."""
+    """Get all chats with messages and client info. The inbox should use /chats/inbox."""
     service = ChatService(db)
     chats = await service.get_all_chats()
     return chats
 
 
+@router.get("/inbox", response_model=InboxPage)
+async def get_inbox(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.INBOX_PAGE_SIZE, ge=1, le=settings.INBOX_MAX_PAGE_SIZE),
+    status: Optional[str] = None,
+    platform: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Chat headers with the last message preview, newest activity first, one page per call."""
+    service = ChatService(db)
+    try:
+        chats, next_cursor = await service.get_inbox(limit, cursor, status, platform)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return InboxPage(chats=chats, next_cursor=next_cursor)
+
+
 @router.post("/", response_model=ChatResponse)
 async def create_chat(
     chat_data: ChatCreate,
@@ -49,7 +75,7 @@ async def create_chat(
 
 @router.get("/{chat_id}", response_model=ChatResponse)
 async def get_chat(chat_id: int, db: AsyncSession = Depends(get_db)):
-    """Get a specific chat with messages and client."""
+    """Get a specific chat with its newest messages and client."""
     service = ChatService(db)
     chat = await service.get_chat_by_id(chat_id)
     if not chat:
@@ -57,6 +83,28 @@ async def get_chat(chat_id: int, db: AsyncSession = Depends(get_db)):
     return chat
 
 
+@router.get("/{chat_id}/messages", response_model=MessagePage)
+async def get_messages(
+    chat_id: int,
+    before: Optional[int] = None,
+    limit: int = Query(settings.CHAT_MESSAGES_PAGE_SIZE, ge=1, le=settings.CHAT_MESSAGES_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """Page of a chat's history: the newest `limit` messages older than `before`, oldest first."""
+    service = ChatService(db)
+    if await service.get_chat_status(chat_id) is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    messages, has_more = await service.get_messages(chat_id, before, limit)
+    return MessagePage(
+        messages=[
+            MessageResponse(id=m.id, role=m.role.value, content=m.content, created_at=m.created_at)
+            for m in messages
+        ],
+        has_more=has_more,
+        next_before=messages[0].id if has_more else None
+    )
+
+
 @router.put("/{chat_id}/status", response_model=ChatResponse)
 async def update_chat_status(
     chat_id: int,
@@ -70,8 +118,12 @@ async def update_chat_status(
         raise HTTPException(status_code=404, detail="Chat not found")
         
     # Notify via Socket.IO
-    from src.socket_manager import sio
+    from src.socket_manager import coalescer, sio
     from src.models.chat import ChatStatus, MessageRole
+
+    # The AI must not answer over a manager or in a closed chat
+    if status_update.status in (ChatStatus.HUMAN, ChatStatus.DONE):
+        await coalescer.cancel(chat_id, reason=f"status:{status_update.status}")
     
     system_msg = ""
     if status_update.status == ChatStatus.HUMAN:
@@ -135,6 +187,7 @@ async def update_notes(
 
 
 @router.post("/send", response_model=SendMessageResponse)
+@traced("chat.send", root=True)
 async def send_message(
     request: SendMessageRequest,
     db: AsyncSession = Depends(get_db)
@@ -143,11 +196,12 @@ async def send_message(
     Send a message to a chat and get AI response.
     This is the main endpoint for the unified inbox.
     """
+    current_span().set(chat_id=request.chat_id)
     service = ChatService(db)
     
     # Validate chat exists
-    chat = await service.get_chat_by_id(request.chat_id)
-    if not chat:
+    status = await service.get_chat_status(request.chat_id)
+    if status is None:
         raise HTTPException(status_code=404, detail="Chat not found")
 
     # Save user message
@@ -157,6 +211,10 @@ async def send_message(
         content=request.content
     )
 
+    # A manager has the chat, or it is closed: the message is kept, the AI stays quiet
+    if status in (ChatStatus.HUMAN, ChatStatus.DONE):
+        return SendMessageResponse(user_message=_message_response(user_message), ai_skipped="paused")
+
     # Get chat history for context
     chat_history = await service.get_chat_history(request.chat_id)
 
@@ -166,7 +224,18 @@ async def send_message(
         text=request.content,
         context=request.context
     )
-    ai_response = await ai_service.process_message(ai_request, chat_history, db=db)
+    # A manager takeover cancels the turn, like a queued one
+    from src.socket_manager import coalescer
+    try:
+        with coalescer.tracked(request.chat_id):
+            ai_response = await ai_service.process_message(ai_request, chat_history, db=db)
+            await _ensure_ai_handled(service, request.chat_id)
+    except TurnCancelled as e:
+        return SendMessageResponse(user_message=_message_response(user_message), ai_skipped=e.args[0])
+    if ai_response.intent_source == "llm":
+        await service.set_message_intent(user_message.id, ai_response.intent)
+    if ai_response.handoff:
+        await service.update_chat_status(request.chat_id, ChatStatus.HUMAN)
 
     # Save AI response
     ai_message = await service.add_message(
@@ -174,25 +243,124 @@ async def send_message(
         role="assistant",
         content=ai_response.text
     )
+    summarizer.schedule(request.chat_id)
 
     return SendMessageResponse(
-        user_message=MessageResponse(
-            id=user_message.id,
-            role=user_message.role.value,
-            content=user_message.content,
-            created_at=user_message.created_at
-        ),
-        ai_response=MessageResponse(
-            id=ai_message.id,
-            role=ai_message.role.value,
-            content=ai_message.content,
-            created_at=ai_message.created_at
-        ),
+        user_message=_message_response(user_message),
+        ai_response=_message_response(ai_message),
         intent=ai_response.intent,
         suggested_actions=ai_response.suggested_actions
     )
 
 
+@router.post("/send/stream")
+@traced("chat.send_stream", root=True)
+async def send_message_stream(
+    request: SendMessageRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Streaming variant of /chats/send (Server-Sent Events).
+    Emits `delta` events with text as it is generated, then one `done`
+    event with the same payload as /chats/send, or a `cancelled` event
+    when a manager takes the chat over or closes it meanwhile. In a
+    HUMAN/DONE chat the message is saved and the only event is `done`
+    without an AI reply.
+    Generation is traced separately (chat.send_stream.reply): it runs after
+    the handler has returned.
+    """
+    current_span().set(chat_id=request.chat_id)
+    service = ChatService(db)
+
+    status = await service.get_chat_status(request.chat_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    user_message = await service.add_message(
+        chat_id=request.chat_id,
+        role="user",
+        content=request.content
+    )
+    if status in (ChatStatus.HUMAN, ChatStatus.DONE):
+        paused = SendMessageResponse(user_message=_message_response(user_message), ai_skipped="paused")
+        return StreamingResponse(
+            iter([f"event: done\ndata: {paused.model_dump_json()}\n\n"]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    chat_history = await service.get_chat_history(request.chat_id)
+
+    ai_request = AIRequest(
+        conversation_id=str(request.chat_id),
+        text=request.content,
+        context=request.context
+    )
+
+    from src.socket_manager import coalescer
+
+    async def events():
+        # The stream outlives the request handler, so it uses its own session
+        with trace("chat.send_stream.reply", chat_id=request.chat_id):
+            async with AsyncSessionLocal() as stream_db:
+                stream_service = ChatService(stream_db)
+                ai_response = None
+                try:
+                    with coalescer.tracked(request.chat_id):
+                        async for chunk in ai_service.stream_message(ai_request, chat_history, db=stream_db):
+                            if chunk.response:
+                                ai_response = chunk.response
+                            else:
+                                yield f"event: delta\ndata: {json.dumps({'delta': chunk.delta}, ensure_ascii=False)}\n\n"
+                        await _ensure_ai_handled(stream_service, request.chat_id)
+                except TurnCancelled as e:
+                    # Nothing is saved; the client drops the partial reply
+                    yield f"event: cancelled\ndata: {json.dumps({'reason': e.args[0]})}\n\n"
+                    return
+
+                if ai_response.intent_source == "llm":
+                    await stream_service.set_message_intent(user_message.id, ai_response.intent)
+                if ai_response.handoff:
+                    await stream_service.update_chat_status(request.chat_id, ChatStatus.HUMAN)
+
+                ai_message = await stream_service.add_message(
+                    chat_id=request.chat_id,
+                    role="assistant",
+                    content=ai_response.text
+                )
+                summarizer.schedule(request.chat_id)
+
+                done = SendMessageResponse(
+                    user_message=_message_response(user_message),
+                    ai_response=_message_response(ai_message),
+                    intent=ai_response.intent,
+                    suggested_actions=ai_response.suggested_actions,
+                    ttft_ms=ai_response.ttft_ms
+                )
+                yield f"event: done\ndata: {done.model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _message_response(message) -> MessageResponse:
+    return MessageResponse(
+        id=message.id,
+        role=message.role.value,
+        content=message.content,
+        created_at=message.created_at
+    )
+
+
+async def _ensure_ai_handled(service: ChatService, chat_id: int):
+    """A takeover in another process only shows in the chat status: check it before saving a reply."""
+    status = await service.get_chat_status(chat_id)
+    if status in (ChatStatus.HUMAN, ChatStatus.DONE):
+        raise TurnCancelled(f"status:{status}")
+
+
 @router.post("/{chat_id}/messages", response_model=MessageResponse)
 async def add_message_to_chat(
     chat_id: int,
@@ -201,15 +369,15 @@ async def add_message_to_chat(
 ):
     """Add a message to a chat (Manager sending). Auto-switches to HUMAN mode."""
     service = ChatService(db)
-    chat = await service.get_chat_by_id(chat_id)
-    if not chat:
+    if await service.get_chat_status(chat_id) is None:
         raise HTTPException(status_code=404, detail="Chat not found")
     
     from src.models.chat import MessageRole, ChatStatus
-    from src.socket_manager import sio
+    from src.socket_manager import coalescer, sio
     
     # 1. Update status to HUMAN (Manager takeover)
     await service.update_chat_status(chat_id, ChatStatus.HUMAN)
+    await coalescer.cancel(chat_id, reason="manager_message")
 
     # 2. Add message with MANAGER role
     new_message = await service.add_message(
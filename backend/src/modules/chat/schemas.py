@@ -17,6 +17,12 @@ class MessageResponse(BaseModel):
         from_attributes = True
 
 
+class MessagePage(BaseModel):
+    messages: List[MessageResponse]  # Oldest first
+    has_more: bool = False
+    next_before: Optional[int] = None  # Pass as ?before= for older messages; None when there are none
+
+
 class ClientCreate(BaseModel):
     name: str
     phone: Optional[str] = None
@@ -60,13 +66,39 @@ class ChatResponse(BaseModel):
     unread_count: int = 0
     created_at: datetime
     updated_at: datetime
-    messages: List[MessageResponse] = []
+    messages: List[MessageResponse] = []  # Newest page, oldest first
+    has_more_messages: bool = False  # Older messages via GET /chats/{id}/messages?before=
     client: Optional[ClientResponse] = None
 
     class Config:
         from_attributes = True
 
 
+class LastMessagePreview(BaseModel):
+    role: str
+    preview: str  # First INBOX_PREVIEW_CHARS characters
+    created_at: datetime
+
+
+class InboxChatResponse(BaseModel):
+    """Chat header for the operator inbox, without messages."""
+    id: int
+    external_id: str
+    platform: str
+    status: str
+    item_name: Optional[str] = None
+    client_name: Optional[str] = None
+    unread_count: int = 0
+    created_at: datetime
+    updated_at: datetime
+    last_message: Optional[LastMessagePreview] = None
+
+
+class InboxPage(BaseModel):
+    chats: List[InboxChatResponse]
+    next_cursor: Optional[str] = None  # Pass as ?cursor= for the next page; None on the last page
+
+
 class ChatStatusUpdate(BaseModel):
     status: str  # AI, HUMAN, DONE
 
@@ -79,9 +111,11 @@ class SendMessageRequest(BaseModel):
 
 class SendMessageResponse(BaseModel):
     user_message: MessageResponse
-    ai_response: MessageResponse
-    intent: str
-    suggested_actions: List[str]
+    ai_response: Optional[MessageResponse] = None  # None when the AI did not answer, see ai_skipped
+    intent: Optional[str] = None
+    suggested_actions: List[str] = []
+    ttft_ms: Optional[float] = None  # Set by the streaming endpoint
+    ai_skipped: Optional[str] = None  # "paused" (HUMAN/DONE chat) or why the turn was cancelled
 
 
 class NotesUpdate(BaseModel):
@@ -1,11 +1,32 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import noload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime
+from typing import List, Optional, Tuple
+import base64
 
+from src.config import settings
+from src.tracing import traced
 from src.models.chat import Chat, Message, MessageRole, ChatPlatform, ChatStatus, ChatClient
 
 
+def encode_cursor(updated_at: datetime, chat_id: int) -> str:
+    """Opaque inbox cursor: the (updated_at, id) of the last chat on a page."""
+    raw = f"{updated_at.isoformat()}|{chat_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor. Raises ValueError for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, chat_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(updated_at), int(chat_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
 class ChatService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -17,15 +38,13 @@ class ChatService:
         client_name: str = "Unknown",
         item_name: Optional[str] = None
     ) -> Chat:
-        """Get existing chat or create a new one with client."""
+        """Get existing chat or create a new one with client, with the newest page of messages."""
         result = await self.db.execute(
-            select(Chat)
-            .options(selectinload(Chat.client), selectinload(Chat.messages))
-            .where(Chat.external_id == external_id)
+            select(Chat.id).where(Chat.external_id == external_id)
         )
-        chat = result.scalar_one_or_none()
+        chat_id = result.scalar_one_or_none()
 
-        if not chat:
+        if chat_id is None:
             chat = Chat(
                 external_id=external_id,
                 platform=ChatPlatform(platform),
@@ -43,29 +62,55 @@ class ChatService:
             )
             self.db.add(client)
             await self.db.commit()
-            
-            # Reload with all relationships
-            result = await self.db.execute(
-                select(Chat)
-                .options(selectinload(Chat.client), selectinload(Chat.messages))
-                .where(Chat.id == chat.id)
-            )
-            chat = result.scalar_one()
+            chat_id = chat.id
 
-        return chat
+        return await self.get_chat_by_id(chat_id)
 
-    async def get_chat_by_id(self, chat_id: int) -> Optional[Chat]:
-        """Get chat by ID with messages and client."""
+    @traced("db.get_chat")
+    async def get_chat_by_id(self, chat_id: int, with_messages: bool = True) -> Optional[Chat]:
+        """
+        Get chat by ID with its client. chat.messages holds only the newest
+        page (older ones via get_messages), or nothing without with_messages.
+        """
         result = await self.db.execute(
             select(Chat)
-            .options(
-                selectinload(Chat.messages),
-                selectinload(Chat.client)
-            )
+            .options(noload(Chat.messages), selectinload(Chat.client))
             .where(Chat.id == chat_id)
         )
+        chat = result.scalar_one_or_none()
+        if chat and with_messages:
+            messages, has_more = await self.get_messages(chat_id)
+            set_committed_value(chat, "messages", messages)
+            chat.has_more_messages = has_more
+        return chat
+
+    @traced("db.chat_status")
+    async def get_chat_status(self, chat_id: int) -> Optional[ChatStatus]:
+        """Status of the chat, None if it does not exist. Loads nothing else."""
+        result = await self.db.execute(select(Chat.status).where(Chat.id == chat_id))
         return result.scalar_one_or_none()
 
+    @traced("db.get_messages")
+    async def get_messages(
+        self,
+        chat_id: int,
+        before: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[List[Message], bool]:
+        """
+        One page of the chat's messages, oldest first: the newest `limit`
+        messages with id < before (the newest overall without before). Keyset
+        paging on the (chat_id, id) index. Returns (messages, older ones exist).
+        """
+        limit = min(limit or settings.CHAT_MESSAGES_PAGE_SIZE, settings.CHAT_MESSAGES_MAX_PAGE_SIZE)
+        query = select(Message).where(Message.chat_id == chat_id)
+        if before is not None:
+            query = query.where(Message.id < before)
+        result = await self.db.execute(query.order_by(Message.id.desc()).limit(limit + 1))
+        messages = result.scalars().all()
+        return list(reversed(messages[:limit])), len(messages) > limit
+
+    @traced("db.get_all_chats")
     async def get_all_chats(self) -> List[Chat]:
         """Get all chats with messages and client."""
         result = await self.db.execute(
@@ -78,48 +123,144 @@ class ChatService:
         )
         return result.scalars().all()
 
+    @traced("db.inbox")
+    async def get_inbox(
+        self,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        platform: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of chat headers, most recent activity first, without loading
+        messages: the last one comes from Chat.last_message_id, cut to a preview.
+        Keyset pagination on (updated_at, id): the cursor is the last chat of
+        the previous page. Returns (chats, next cursor or None on the last page).
+        Raises ValueError for an unknown status, platform or a bad cursor.
+        """
+        limit = min(limit or settings.INBOX_PAGE_SIZE, settings.INBOX_MAX_PAGE_SIZE)
+        preview = func.substr(Message.content, 1, settings.INBOX_PREVIEW_CHARS)
+        query = (
+            select(
+                Chat.id, Chat.external_id, Chat.platform, Chat.status, Chat.item_name,
+                Chat.unread_count, Chat.created_at, Chat.updated_at,
+                ChatClient.name, Message.role, preview, Message.created_at
+            )
+            .outerjoin(ChatClient, ChatClient.chat_id == Chat.id)
+            .outerjoin(Message, Message.id == Chat.last_message_id)
+            .order_by(Chat.updated_at.desc(), Chat.id.desc())
+            .limit(limit + 1)
+        )
+        if status:
+            query = query.where(Chat.status == ChatStatus(status))
+        if platform:
+            query = query.where(Chat.platform == ChatPlatform(platform))
+        if cursor:
+            updated_at, chat_id = decode_cursor(cursor)
+            query = query.where(or_(
+                Chat.updated_at < updated_at,
+                and_(Chat.updated_at == updated_at, Chat.id < chat_id)
+            ))
+
+        rows = (await self.db.execute(query)).all()
+        chats = [
+            {
+                "id": chat_id,
+                "external_id": external_id,
+                "platform": chat_platform.value,
+                "status": chat_status.value,
+                "item_name": item_name,
+                "client_name": client_name,
+                "unread_count": unread_count or 0,
+                "created_at": created_at,
+                "updated_at": updated_at,
+                "last_message": {
+                    "role": role.value,
+                    "preview": text,
+                    "created_at": sent_at
+                } if role else None
+            }
+            for (chat_id, external_id, chat_platform, chat_status, item_name, unread_count,
+                 created_at, updated_at, client_name, role, text, sent_at) in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = chats[-1]
+            next_cursor = encode_cursor(last["updated_at"], last["id"])
+        return chats, next_cursor
+
+    @traced("db.add_message")
     async def add_message(
         self,
         chat_id: int,
         role: str,
         content: str
     ) -> Message:
-        """Add a message to a chat."""
+        """Add a message to a chat and move the chat to the top of the inbox."""
         message = Message(
             chat_id=chat_id,
             role=MessageRole(role),
             content=content
         )
         self.db.add(message)
+        await self.db.flush()
+        await self.db.execute(
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(last_message_id=message.id, updated_at=message.created_at)
+        )
         await self.db.commit()
         await self.db.refresh(message)
         return message
 
+    @traced("db.set_message_intent")
+    async def set_message_intent(self, message_id: int, intent: str):
+        """Label a user message with its intent (training data for the local classifier)."""
+        await self.db.execute(
+            update(Message).where(Message.id == message_id).values(intent=intent)
+        )
+        await self.db.commit()
+
+    @traced("db.chat_history")
     async def get_chat_history(
         self,
         chat_id: int,
         limit: int = 20
     ) -> List[dict]:
-        """Get chat history as list of dicts for AI context."""
+        """
+        Get chat history as list of dicts for AI context.
+        Messages already folded into the chat summary are replaced by one
+        leading {"role": "summary"} entry.
+        """
+        result = await self.db.execute(
+            select(Chat.summary, Chat.summary_until_message_id, Chat.summary_source_tokens)
+            .where(Chat.id == chat_id)
+        )
+        summary, until_id, source_tokens = result.one_or_none() or (None, None, 0)
+
+        query = select(Message).where(Message.chat_id == chat_id)
+        if summary and until_id:
+            query = query.where(Message.id > until_id)
         result = await self.db.execute(
-            select(Message)
-            .where(Message.chat_id == chat_id)
-            .order_by(Message.created_at.desc())
-            .limit(limit)
+            query.order_by(Message.id.desc()).limit(limit)
         )
         messages = result.scalars().all()
-        return [
+        history = [
             {"role": msg.role.value, "content": msg.content}
             for msg in reversed(messages)
         ]
+        if summary and until_id:
+            history.insert(0, {"role": "summary", "content": summary, "source_tokens": source_tokens or 0})
+        return history
 
+    @traced("db.update_chat_status")
     async def update_chat_status(
         self,
         chat_id: int,
         status: str
     ) -> Optional[Chat]:
-        """Update chat AI/HUMAN/DONE status."""
-        chat = await self.get_chat_by_id(chat_id)
+        """Update chat AI/HUMAN/DONE status. The returned chat has no messages loaded."""
+        chat = await self.get_chat_by_id(chat_id, with_messages=False)
         if chat:
             chat.status = ChatStatus(status)
             await self.db.commit()
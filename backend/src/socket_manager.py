@@ -1,8 +1,15 @@
+import asyncio
+import time
+
 import socketio
 from src.database import AsyncSessionLocal
 from src.modules.chat.service import ChatService
 from src.modules.ai_engine.service import ai_service
 from src.modules.ai_engine.models import AIRequest
+from src.modules.ai_engine.summarizer import summarizer
+from src.modules.chat.coalescer import AI_TURN_JOB, MessageCoalescer, PendingMessage
+from src.task_queue import JobRecord, job_queue
+from src.tracing import current_span, trace, traced
 
 # Initialize Socket.IO server
 sio = socketio.AsyncServer(
@@ -27,6 +34,7 @@ async def join_chat(sid, chat_id):
     await sio.emit('status', {'msg': f'Joined chat {chat_id}'}, to=sid)
 
 @sio.event
+@traced("socket.send_message", root=True)
 async def send_message(sid, data):
     """
     Handle incoming message from widget.
@@ -37,6 +45,7 @@ async def send_message(sid, data):
     
     if not chat_id or not content:
         return
+    current_span().set(chat_id=chat_id)
 
     from src.models.chat import ChatStatus
 
@@ -44,8 +53,8 @@ async def send_message(sid, data):
         service = ChatService(db)
         
         # Check chat status first
-        chat = await service.get_chat_by_id(chat_id)
-        if not chat:
+        status = await service.get_chat_status(chat_id)
+        if status is None:
             return
 
         # 1. Save User Message
@@ -63,34 +72,105 @@ async def send_message(sid, data):
             'created_at': user_message.created_at.isoformat()
         }, room=str(chat_id))
 
-        # If HUMAN mode, agent is paused
-        if chat.status == ChatStatus.HUMAN:
+        # A manager has the chat, or it is closed: the agent stays quiet
+        if status in (ChatStatus.HUMAN, ChatStatus.DONE):
             return
 
-        # Emit typing indicator
-        await sio.emit('typing_start', {}, room=str(chat_id))
+    # Messages typed in quick succession are answered together, by a queue worker
+    await coalescer.submit(chat_id, user_message.id, content)
 
-        # 2. Get AI Response
-        chat_history = await service.get_chat_history(chat_id)
-        
-        ai_request = AIRequest(
-            conversation_id=str(chat_id),
-            text=content
-        )
-        
-        ai_response = await ai_service.process_message(ai_request, chat_history, db=db)
-        
-        # 3. Save AI Message
-        ai_message = await service.add_message(
-            chat_id=chat_id,
-            role="assistant",
-            content=ai_response.text
-        )
-        
-        # 4. Emit AI Response
-        await sio.emit('new_message', {
-            'id': ai_message.id,
-            'role': 'assistant',
-            'content': ai_message.content,
-            'created_at': ai_message.created_at.isoformat()
-        }, room=str(chat_id))
+
+async def answer_messages(job: JobRecord) -> dict:
+    """
+    One AI turn for a burst of customer messages: an AI_TURN_JOB enqueued by
+    the coalescer once the chat has been quiet for the debounce window.
+    The reply is streamed and emitted to the chat room. If the turn is
+    cancelled (newer message, manager takeover) or fails, nothing is saved
+    and the widget is told to drop the partial reply.
+    """
+    from src.models.chat import ChatStatus
+
+    chat_id = job.payload["chat_id"]
+    batch = [PendingMessage(**m) for m in job.payload["messages"]]
+    waited_ms = (time.time() - batch[0].received_at) * 1000
+    with trace(
+        "socket.ai_turn", detached=True, chat_id=chat_id, job_id=job.id, attempt=job.attempts,
+        messages=len(batch), queued_ms=round(waited_ms, 1)
+    ):
+        async with AsyncSessionLocal() as db:
+            service = ChatService(db)
+
+            # A manager may have taken over while the burst was open
+            status = await service.get_chat_status(chat_id)
+            if status in (None, ChatStatus.HUMAN, ChatStatus.DONE):
+                return {"skipped": "chat is not handled by AI"}
+
+            # Emit typing indicator
+            await sio.emit('typing_start', {}, room=str(chat_id))
+
+            # 2. Stream AI Response
+            chat_history = await service.get_chat_history(chat_id)
+            # The burst is the current message, so it is not repeated as history
+            texts = [m.text for m in batch]
+            if [h["content"] for h in chat_history[-len(texts):]] == texts:
+                chat_history = chat_history[:-len(texts)]
+
+            ai_request = AIRequest(
+                conversation_id=str(chat_id),
+                text="\n".join(texts)
+            )
+
+            ai_response = None
+            try:
+                async for chunk in ai_service.stream_message(ai_request, chat_history, db=db):
+                    if chunk.response:
+                        ai_response = chunk.response
+                    else:
+                        await sio.emit('message_delta', {
+                            'chat_id': chat_id,
+                            'delta': chunk.delta
+                        }, room=str(chat_id))
+            except (asyncio.CancelledError, Exception) as e:
+                cancelled = isinstance(e, asyncio.CancelledError)
+                await sio.emit('generation_cancelled', {
+                    'chat_id': chat_id,
+                    'reason': (e.args[0] if e.args else 'cancelled') if cancelled else 'error'
+                }, room=str(chat_id))
+                raise
+            coalescer.settle(chat_id, job.id)
+
+            # A takeover handled by another process cancels the job only in the store
+            status = await service.get_chat_status(chat_id)
+            if status in (None, ChatStatus.HUMAN, ChatStatus.DONE) or not await job_queue.is_running(job.id):
+                await sio.emit('generation_cancelled', {
+                    'chat_id': chat_id,
+                    'reason': 'cancelled'
+                }, room=str(chat_id))
+                return {"skipped": "cancelled before the reply was saved"}
+
+            # The label describes the whole burst; it is kept on its last message
+            if ai_response.intent_source == "llm":
+                await service.set_message_intent(batch[-1].id, ai_response.intent)
+            if ai_response.handoff:
+                await service.update_chat_status(chat_id, ChatStatus.HUMAN)
+
+            # 3. Save AI Message
+            ai_message = await service.add_message(
+                chat_id=chat_id,
+                role="assistant",
+                content=ai_response.text
+            )
+            summarizer.schedule(chat_id)
+
+            # 4. Emit final AI message with its persisted id
+            await sio.emit('new_message', {
+                'id': ai_message.id,
+                'role': 'assistant',
+                'content': ai_message.content,
+                'created_at': ai_message.created_at.isoformat()
+            }, room=str(chat_id))
+            return {"ai_message_id": ai_message.id, "intent": ai_response.intent}
+
+
+job_queue.register(AI_TURN_JOB, answer_messages)
+coalescer = MessageCoalescer(job_queue)
@@ -0,0 +1,505 @@
+"""
+Background job queue.
+
+Work that should not run inside a request or socket handler, such as an AI
+turn with its LLM round trip, is enqueued as a job and executed by a pool of
+JOB_WORKERS workers in every app process. Handlers are registered per job
+kind and receive a JobRecord; what they return is stored as the job result.
+
+Stores (JOB_QUEUE_BACKEND):
+- database: jobs live in the `jobs` table and survive a restart. A running
+  job holds a lease that its worker keeps extending; a job whose lease
+  expired (its process died) is queued again.
+- memory: the same semantics in a dict, for tests and scripts.
+
+One poller per process claims jobs while a worker slot is free and polls
+every JOB_POLL_INTERVAL seconds when there is nothing to claim; jobs enqueued
+by this process and finished jobs wake it at once.
+
+Jobs with the same key (e.g. "chat:12") run one at a time, in order. A failing job is
+retried after JOB_RETRY_BACKOFF * 2^(attempt - 1) seconds until it has used
+max_attempts. cancel() stops a queued job, and a running one right away when
+it runs in this process. A job cancelled by another process stops within
+JOB_POLL_INTERVAL: every process checks the status of the jobs it runs, and
+handlers can call is_running() before a side effect that must not happen
+after a cancel.
+"""
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, exists, func, or_, select, update
+from sqlalchemy.orm import aliased
+
+from src.config import settings
+from src.database import AsyncSessionLocal
+from src.models.job import Job, JobStatus
+
+
+@dataclass
+class JobRecord:
+    id: int
+    kind: str
+    key: Optional[str]
+    payload: dict
+    attempts: int  # Including the current one
+    max_attempts: int
+
+
+JobHandler = Callable[[JobRecord], Awaitable[Optional[dict]]]
+
+ACTIVE = (JobStatus.QUEUED, JobStatus.RUNNING)
+FINISHED = (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED)
+PRUNE_EVERY = 3600  # Seconds between deletions of old finished jobs
+
+
+class MemoryJobStore:
+    """In-process job store with the semantics of DatabaseJobStore."""
+
+    def __init__(self):
+        self._jobs: Dict[int, dict] = {}
+        self._next_id = 1
+
+    async def add(self, kind: str, key: Optional[str], payload: dict, max_attempts: int) -> int:
+        job_id = self._next_id
+        self._next_id += 1
+        now = datetime.utcnow()
+        self._jobs[job_id] = {
+            "id": job_id, "kind": kind, "key": key, "payload": payload, "status": JobStatus.QUEUED,
+            "attempts": 0, "max_attempts": max_attempts, "run_after": now, "locked_until": None,
+            "error": None, "result": None, "updated_at": now,
+        }
+        return job_id
+
+    async def claim(self, busy_keys: Set[str], lease: float) -> Optional[JobRecord]:
+        now = datetime.utcnow()
+        blocked = busy_keys | {j["key"] for j in self._jobs.values() if j["status"] == JobStatus.RUNNING}
+        for job in self._jobs.values():
+            if job["status"] != JobStatus.QUEUED:
+                continue
+            if job["key"] is not None:
+                if job["key"] in blocked:
+                    continue
+                # Only the oldest queued job of a key may start, even while it waits for a retry
+                blocked.add(job["key"])
+            if job["run_after"] > now:
+                continue
+            job.update(
+                status=JobStatus.RUNNING, attempts=job["attempts"] + 1,
+                locked_until=now + timedelta(seconds=lease), updated_at=now
+            )
+            return JobRecord(job["id"], job["kind"], job["key"], job["payload"], job["attempts"], job["max_attempts"])
+        return None
+
+    async def extend(self, job_id: int, lease: float):
+        job = self._jobs.get(job_id)
+        if job and job["status"] == JobStatus.RUNNING:
+            job["locked_until"] = datetime.utcnow() + timedelta(seconds=lease)
+
+    async def statuses(self, job_ids: List[int]) -> Dict[int, JobStatus]:
+        return {i: self._jobs[i]["status"] for i in job_ids if i in self._jobs}
+
+    async def complete(self, job_id: int, result: Optional[dict]) -> bool:
+        return self._finish(job_id, JobStatus.DONE, result=result)
+
+    async def retry(self, job_id: int, error: str, delay: float):
+        job = self._jobs.get(job_id)
+        if job and job["status"] == JobStatus.RUNNING:
+            job.update(
+                status=JobStatus.QUEUED, error=error, locked_until=None,
+                run_after=datetime.utcnow() + timedelta(seconds=delay), updated_at=datetime.utcnow()
+            )
+
+    async def fail(self, job_id: int, error: str):
+        self._finish(job_id, JobStatus.FAILED, error=error)
+
+    async def cancel(self, job_id: int) -> Optional[JobStatus]:
+        """Cancel an active job; returns the status it had, None if it was already finished."""
+        job = self._jobs.get(job_id)
+        if not job or job["status"] not in ACTIVE:
+            return None
+        previous = job["status"]
+        job.update(status=JobStatus.CANCELLED, updated_at=datetime.utcnow())
+        return previous
+
+    async def cancel_key(self, key: str) -> List[int]:
+        ids = [j["id"] for j in self._jobs.values() if j["key"] == key and j["status"] in ACTIVE]
+        for job_id in ids:
+            await self.cancel(job_id)
+        return ids
+
+    async def recover(self) -> int:
+        now = datetime.utcnow()
+        expired = [
+            j for j in self._jobs.values()
+            if j["status"] == JobStatus.RUNNING and j["locked_until"] and j["locked_until"] < now
+        ]
+        for job in expired:
+            status = JobStatus.FAILED if job["attempts"] >= job["max_attempts"] else JobStatus.QUEUED
+            job.update(status=status, error="lease expired", locked_until=None, updated_at=now)
+        return len(expired)
+
+    async def prune(self, before: datetime) -> int:
+        old = [j["id"] for j in self._jobs.values() if j["status"] in FINISHED and j["updated_at"] < before]
+        for job_id in old:
+            del self._jobs[job_id]
+        return len(old)
+
+    async def get(self, job_id: int) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def counts(self) -> Dict[str, int]:
+        return dict(Counter(j["status"].value for j in self._jobs.values()))
+
+    def _finish(self, job_id: int, status: JobStatus, result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+        job = self._jobs.get(job_id)
+        if not job or job["status"] != JobStatus.RUNNING:
+            return False
+        job.update(status=status, result=result, locked_until=None, updated_at=datetime.utcnow())
+        if error:
+            job["error"] = error
+        return True
+
+
+class DatabaseJobStore:
+    """Jobs in the `jobs` table; every operation is one short session."""
+
+    CLAIM_CANDIDATES = 10
+
+    async def add(self, kind: str, key: Optional[str], payload: dict, max_attempts: int) -> int:
+        async with AsyncSessionLocal() as db:
+            job = Job(kind=kind, key=key, payload=payload, max_attempts=max_attempts)
+            db.add(job)
+            await db.commit()
+            return job.id
+
+    async def claim(self, busy_keys: Set[str], lease: float) -> Optional[JobRecord]:
+        now = datetime.utcnow()
+        running_keys = select(Job.key).where(Job.status == JobStatus.RUNNING, Job.key.is_not(None))
+        older = aliased(Job)
+        # Only the oldest queued job of a key may start, even while it waits for a retry
+        older_queued = exists().where(older.key == Job.key, older.status == JobStatus.QUEUED, older.id < Job.id)
+        query = (
+            select(Job.id, Job.key)
+            .where(
+                Job.status == JobStatus.QUEUED,
+                Job.run_after <= now,
+                or_(Job.key.is_(None), Job.key.not_in(running_keys)),
+                ~older_queued
+            )
+            .order_by(Job.id)
+            .limit(self.CLAIM_CANDIDATES)
+        )
+        if busy_keys:
+            query = query.where(or_(Job.key.is_(None), Job.key.not_in(list(busy_keys))))
+        async with AsyncSessionLocal() as db:
+            candidates = (await db.execute(query)).all()
+            for job_id, key in candidates:
+                result = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JobStatus.QUEUED)
+                    .values(
+                        status=JobStatus.RUNNING,
+                        attempts=Job.attempts + 1,
+                        locked_until=now + timedelta(seconds=lease),
+                        updated_at=now
+                    )
+                )
+                await db.commit()
+                if result.rowcount == 1:
+                    job = await db.get(Job, job_id)
+                    return JobRecord(job.id, job.kind, job.key, job.payload or {}, job.attempts, job.max_attempts)
+        return None
+
+    async def extend(self, job_id: int, lease: float):
+        await self._update(job_id, (JobStatus.RUNNING,), locked_until=datetime.utcnow() + timedelta(seconds=lease))
+
+    async def statuses(self, job_ids: List[int]) -> Dict[int, JobStatus]:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(Job.id, Job.status).where(Job.id.in_(job_ids)))).all()
+            return dict(rows)
+
+    async def complete(self, job_id: int, result: Optional[dict]) -> bool:
+        return await self._update(job_id, (JobStatus.RUNNING,), status=JobStatus.DONE, result=result, locked_until=None)
+
+    async def retry(self, job_id: int, error: str, delay: float):
+        await self._update(
+            job_id, (JobStatus.RUNNING,),
+            status=JobStatus.QUEUED, error=error, locked_until=None,
+            run_after=datetime.utcnow() + timedelta(seconds=delay)
+        )
+
+    async def fail(self, job_id: int, error: str):
+        await self._update(job_id, (JobStatus.RUNNING,), status=JobStatus.FAILED, error=error, locked_until=None)
+
+    async def cancel(self, job_id: int) -> Optional[JobStatus]:
+        """Cancel an active job; returns the status it had, None if it was already finished."""
+        async with AsyncSessionLocal() as db:
+            previous = (await db.execute(select(Job.status).where(Job.id == job_id))).scalar_one_or_none()
+            if previous not in ACTIVE:
+                return None
+            result = await db.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == previous)
+                .values(status=JobStatus.CANCELLED, locked_until=None)
+            )
+            await db.commit()
+            return previous if result.rowcount == 1 else None
+
+    async def cancel_key(self, key: str) -> List[int]:
+        async with AsyncSessionLocal() as db:
+            ids = (await db.execute(
+                select(Job.id).where(Job.key == key, Job.status.in_(ACTIVE))
+            )).scalars().all()
+            if ids:
+                await db.execute(
+                    update(Job)
+                    .where(Job.id.in_(ids), Job.status.in_(ACTIVE))
+                    .values(status=JobStatus.CANCELLED, locked_until=None)
+                )
+                await db.commit()
+            return list(ids)
+
+    async def recover(self) -> int:
+        """Queue again (or fail, when out of attempts) running jobs whose lease expired."""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(Job)
+                .where(Job.status == JobStatus.RUNNING, Job.locked_until < datetime.utcnow())
+                .values(
+                    status=case((Job.attempts >= Job.max_attempts, JobStatus.FAILED), else_=JobStatus.QUEUED),
+                    error="lease expired",
+                    locked_until=None
+                )
+            )
+            await db.commit()
+            return result.rowcount
+
+    async def prune(self, before: datetime) -> int:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(Job).where(Job.status.in_(FINISHED), Job.updated_at < before))
+            await db.commit()
+            return result.rowcount
+
+    async def get(self, job_id: int) -> Optional[dict]:
+        async with AsyncSessionLocal() as db:
+            job = await db.get(Job, job_id)
+            if not job:
+                return None
+            return {
+                "id": job.id, "kind": job.kind, "key": job.key, "payload": job.payload,
+                "status": job.status, "attempts": job.attempts, "max_attempts": job.max_attempts,
+                "run_after": job.run_after, "error": job.error, "result": job.result,
+                "updated_at": job.updated_at,
+            }
+
+    async def counts(self) -> Dict[str, int]:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(Job.status, func.count()).group_by(Job.status))).all()
+            return {status.value: count for status, count in rows}
+
+    async def _update(self, job_id: int, statuses: Tuple[JobStatus, ...], **values) -> bool:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(Job).where(Job.id == job_id, Job.status.in_(statuses)).values(**values)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+
+class JobQueue:
+    def __init__(
+        self,
+        store=None,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        backoff: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+        lease: Optional[float] = None
+    ):
+        if store is None:
+            store = MemoryJobStore() if settings.JOB_QUEUE_BACKEND == "memory" else DatabaseJobStore()
+        self.store = store
+        self.workers = workers or settings.JOB_WORKERS
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        self.backoff = backoff if backoff is not None else settings.JOB_RETRY_BACKOFF
+        self.poll_interval = poll_interval or settings.JOB_POLL_INTERVAL
+        self.lease = lease or settings.JOB_LEASE
+        self.handlers: Dict[str, JobHandler] = {}
+        self.stats = Counter()
+        self._running: Dict[int, Tuple[asyncio.Task, Optional[str]]] = {}
+        self._executing: Set[asyncio.Task] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    async def enqueue(self, kind: str, payload: dict, key: Optional[str] = None, max_attempts: Optional[int] = None) -> int:
+        job_id = await self.store.add(kind, key, payload, max_attempts or self.max_attempts)
+        self.stats["enqueued"] += 1
+        self._wake.set()
+        return job_id
+
+    async def cancel(self, job_id: int, reason: str = "cancelled") -> bool:
+        """Cancel a job that has not finished yet. False if it already had."""
+        if await self.store.cancel(job_id) is None:
+            return False
+        self._cancel_local(job_id, reason)
+        return True
+
+    async def is_running(self, job_id: int) -> bool:
+        """Whether the job is still RUNNING in the store, i.e. nobody cancelled it."""
+        return (await self.store.statuses([job_id])).get(job_id) == JobStatus.RUNNING
+
+    async def cancel_key(self, key: str, reason: str = "cancelled") -> int:
+        """Cancel every unfinished job with the key; returns how many there were."""
+        ids = await self.store.cancel_key(key)
+        for job_id in ids:
+            self._cancel_local(job_id, reason)
+        return len(ids)
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._poll()),
+            asyncio.create_task(self._watch()),
+            asyncio.create_task(self._maintain()),
+        ]
+        print(f"Job queue started: {self.workers} workers, {type(self.store).__name__}")
+
+    async def stop(self):
+        tasks = self._tasks + list(self._executing)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _cancel_local(self, job_id: int, reason: str):
+        running = self._running.get(job_id)
+        if running:
+            running[0].cancel(msg=reason)
+        self.stats["cancelled"] += 1
+
+    async def _poll(self):
+        """Claim jobs while a worker slot is free; one store query per poll, however many slots."""
+        slots = asyncio.Semaphore(self.workers)
+        while True:
+            await slots.acquire()
+            self._wake.clear()
+            busy = {key for _, key in self._running.values() if key is not None}
+            try:
+                job = await self.store.claim(busy, self.lease)
+            except Exception as e:
+                print(f"Job queue claim error: {e}")
+                job = None
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._execute(job))
+            self._executing.add(task)
+            task.add_done_callback(self._executing.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _watch(self):
+        """Stop local tasks of jobs that were cancelled (or requeued) by another process."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._running:
+                continue
+            try:
+                statuses = await self.store.statuses(list(self._running))
+            except Exception as e:
+                print(f"Job queue watch error: {e}")
+                continue
+            for job_id, status in statuses.items():
+                if status != JobStatus.RUNNING and job_id in self._running:
+                    self._running[job_id][0].cancel(msg="cancelled")
+                    self.stats["cancelled_remote"] += 1
+
+    async def _execute(self, job: JobRecord):
+        handler = self.handlers.get(job.kind)
+        if handler is None:
+            await self.store.fail(job.id, f"No handler for job kind {job.kind}")
+            return
+        started = time.perf_counter()
+        task = asyncio.create_task(handler(job))
+        self._running[job.id] = (task, job.key)
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                # The queue is stopping: the job runs again after a restart
+                await self.store.retry(job.id, "worker stopped", 0)
+                raise
+            return  # Cancelled through cancel(); the store already has the status
+        except Exception as e:
+            await self._failed(job, e)
+            return
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job.id, None)
+            # A queued job with this key may be waiting for it
+            self._wake.set()
+        if await self.store.complete(job.id, result if isinstance(result, dict) else None):
+            self.stats["done"] += 1
+            self.stats["run_ms_total"] += int((time.perf_counter() - started) * 1000)
+
+    async def _failed(self, job: JobRecord, error: Exception):
+        message = f"{type(error).__name__}: {error}"[:500]
+        if job.attempts < job.max_attempts:
+            delay = self.backoff * 2 ** (job.attempts - 1)
+            self.stats["retries"] += 1
+            print(f"Job {job.id} ({job.kind}) failed, retry {job.attempts}/{job.max_attempts - 1} in {delay:.1f}s: {message}")
+            await self.store.retry(job.id, message, delay)
+        else:
+            self.stats["failed"] += 1
+            print(f"Job {job.id} ({job.kind}) failed after {job.attempts} attempts: {message}")
+            await self.store.fail(job.id, message)
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await self.store.extend(job_id, self.lease)
+            except Exception as e:
+                print(f"Job {job_id} lease renewal error: {e}")
+
+    async def _maintain(self):
+        last_prune = 0.0
+        while True:
+            try:
+                recovered = await self.store.recover()
+                if recovered:
+                    print(f"Job queue: {recovered} jobs with expired leases queued again")
+                    self._wake.set()
+                if time.monotonic() - last_prune > PRUNE_EVERY:
+                    last_prune = time.monotonic()
+                    await self.store.prune(datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS))
+            except Exception as e:
+                print(f"Job queue maintenance error: {e}")
+            await asyncio.sleep(self.lease / 2)
+
+    async def snapshot(self) -> dict:
+        done = self.stats["done"]
+        return {
+            "backend": type(self.store).__name__,
+            "workers": self.workers,
+            "running": len(self._running),
+            "jobs": await self.store.counts(),
+            **{k: v for k, v in self.stats.items() if k != "run_ms_total"},
+            "mean_run_ms": round(self.stats["run_ms_total"] / done, 1) if done else None,
+        }
+
+
+job_queue = JobQueue()
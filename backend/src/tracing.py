@@ -0,0 +1,265 @@
+"""
+Per-turn latency tracing.
+
+A trace covers one chat turn (an HTTP handler, a socket event or a direct AI
+call) and holds one span per stage: DB queries, the answer cache, retrieval,
+the admission wait, intent classification and generation. The current trace
+lives in a context variable, so code deep in the engine only opens
+`span("stage")` and nothing is passed around; without an active trace a span
+is a no-op. Tasks started during a turn inherit its trace.
+
+Finished traces go to an in-memory ring buffer (TRACE_BUFFER_SIZE), which
+/debug/traces reads (admins only). When TRACE_OTLP_ENDPOINT is set and the
+OpenTelemetry SDK is installed, they are also exported as OpenTelemetry spans
+over OTLP/HTTP.
+"""
+import functools
+import time
+import uuid
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from src.config import settings
+
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("name", "parent", "attributes", "start", "end", "error")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end - self.start) * 1000 if self.end is not None else None
+
+
+class _NullSpan:
+    """Stands in for a span when no trace is active."""
+
+    def set(self, **attributes):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    def __init__(self, name: str, attributes: dict):
+        self.id = uuid.uuid4().hex
+        self.started_at = time.time()
+        # Span times are perf_counter readings; this maps them to wall-clock time
+        self.wall_offset = self.started_at - time.perf_counter()
+        self.root = Span(name, None, attributes)
+        self.spans: List[Span] = [self.root]
+        self.finished = False
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms or 0.0
+
+    def stages(self) -> Dict[str, float]:
+        """Total time per stage name, root excluded."""
+        totals: Dict[str, float] = {}
+        for span in self.spans[1:]:
+            if span.end is not None:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration_ms
+        return {name: round(ms, 1) for name, ms in totals.items()}
+
+    def to_dict(self) -> dict:
+        depth = {}
+        spans = []
+        for span in self.spans:
+            depth[id(span)] = depth.get(id(span.parent), -1) + 1
+            spans.append({
+                "name": span.name,
+                "depth": depth[id(span)],
+                "start_ms": round((span.start - self.root.start) * 1000, 1),
+                "duration_ms": round(span.duration_ms, 1) if span.end is not None else None,
+                "error": span.error,
+                "attributes": span.attributes,
+            })
+        return {
+            "trace_id": self.id,
+            "name": self.root.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1),
+            "error": self.root.error,
+            "attributes": self.root.attributes,
+            "stages": self.stages(),
+            "spans": spans,
+        }
+
+
+class _Scope:
+    def __init__(self, name: str, attributes: dict, root: bool, detached: bool = False):
+        self.name = name
+        self.attributes = attributes
+        self.root = root
+        self.detached = detached
+        self.span: Optional[Span] = None
+        self.trace: Optional[Trace] = None
+        self._span_token = None
+        self._trace_token = None
+
+    def __enter__(self):
+        trace = None if self.detached else _current_trace.get()
+        if trace is None or trace.finished:
+            if not self.root or not settings.TRACE_ENABLED:
+                return NULL_SPAN
+            trace = Trace(self.name, self.attributes)
+            self.trace = trace
+            self._trace_token = _current_trace.set(trace)
+            self.span = trace.root
+        else:
+            self.span = Span(self.name, _current_span.get(), self.attributes)
+            trace.spans.append(self.span)
+        self._span_token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return False
+        self.span.end = time.perf_counter()
+        if exc_type is not None:
+            self.span.error = {"CancelledError": "cancelled", "GeneratorExit": "closed"}.get(
+                exc_type.__name__, f"{exc_type.__name__}: {exc}"[:200]
+            )
+        _restore(_current_span, self._span_token, self.span.parent)
+        if self.trace is not None:
+            _restore(_current_trace, self._trace_token, None)
+            tracer.finish(self.trace)
+        return False
+
+
+def _restore(var: ContextVar, token, previous):
+    # A span held open across the yields of an async generator may close in another context
+    try:
+        var.reset(token)
+    except ValueError:
+        var.set(previous)
+
+
+def trace(name: str, detached: bool = False, **attributes) -> _Scope:
+    """
+    Start a trace, or a span when the caller is already traced.
+    detached=True always starts a new trace (background work started by a turn).
+    """
+    return _Scope(name, attributes, root=True, detached=detached)
+
+
+def span(name: str, **attributes) -> _Scope:
+    """A stage of the current trace; a no-op outside of one."""
+    return _Scope(name, attributes, root=False)
+
+
+def traced(name: str, root: bool = False):
+    """Decorator: run an async function inside span(name), or trace(name) with root=True."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with _Scope(name, {}, root=root):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current_span():
+    """The innermost open span, for adding attributes (NULL_SPAN outside a trace)."""
+    span = _current_span.get()
+    return span if span is not None and _current_trace.get() is not None else NULL_SPAN
+
+
+class OpenTelemetryExporter:
+    """Replays finished traces as OpenTelemetry spans with their recorded timestamps."""
+
+    def __init__(self, endpoint: str, service_name: str):
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.trace import Status, StatusCode
+
+        provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+        self.provider = provider
+        self.tracer = provider.get_tracer("src.tracing")
+        self._set_in_context = otel_trace.set_span_in_context
+        self._error_status = lambda message: Status(StatusCode.ERROR, message)
+
+    def export(self, finished: Trace):
+        exported = {}
+        for span in finished.spans:
+            if span.end is None:
+                continue
+            parent = exported.get(id(span.parent))
+            otel_span = self.tracer.start_span(
+                span.name,
+                context=self._set_in_context(parent) if parent is not None else None,
+                start_time=int((finished.wall_offset + span.start) * 1e9),
+                attributes={
+                    key: value for key, value in span.attributes.items()
+                    if isinstance(value, (str, bool, int, float))
+                }
+            )
+            if span.error:
+                otel_span.set_status(self._error_status(span.error))
+            otel_span.end(end_time=int((finished.wall_offset + span.end) * 1e9))
+            exported[id(span)] = otel_span
+
+    def shutdown(self):
+        self.provider.shutdown()
+
+
+class Tracer:
+    def __init__(self, size: Optional[int] = None):
+        self.traces = deque(maxlen=size or settings.TRACE_BUFFER_SIZE)
+        self.exporter = None
+        if settings.TRACE_OTLP_ENDPOINT:
+            try:
+                self.exporter = OpenTelemetryExporter(settings.TRACE_OTLP_ENDPOINT, settings.TRACE_SERVICE_NAME)
+            except ImportError:
+                print("OpenTelemetry SDK is not installed; OTLP trace export disabled")
+
+    def finish(self, finished: Trace):
+        finished.finished = True
+        self.traces.append(finished)
+        if self.exporter:
+            try:
+                self.exporter.export(finished)
+            except Exception as e:
+                print(f"Trace export error: {e}")
+
+    def slowest(self, limit: int = 20, name: Optional[str] = None) -> List[Trace]:
+        candidates = [t for t in self.traces if name is None or t.root.name == name]
+        return sorted(candidates, key=lambda t: t.duration_ms, reverse=True)[:limit]
+
+    def stage_summary(self, name: Optional[str] = None) -> Dict[str, dict]:
+        """p50/p95 per stage over the buffered traces."""
+        samples: Dict[str, List[float]] = {}
+        for finished in self.traces:
+            if name is None or finished.root.name == name:
+                for stage, ms in finished.stages().items():
+                    samples.setdefault(stage, []).append(ms)
+        summary = {}
+        for stage, values in samples.items():
+            values.sort()
+            pick = lambda q: values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+            summary[stage] = {"count": len(values), "p50": pick(0.5), "p95": pick(0.95), "max": values[-1]}
+        return dict(sorted(summary.items(), key=lambda item: item[1]["p95"], reverse=True))
+
+
+tracer = Tracer()
@@ -491,6 +491,14 @@
         }
       }
 
+      // A streamed reply is already on screen: finalize it instead of duplicating
+      const streamingEl = document.getElementById('pf-streaming-message');
+      if (type === 'bot' && streamingEl) {
+        streamingEl.textContent = data.content;
+        streamingEl.removeAttribute('id');
+        return;
+      }
+
       // Add message to UI
       addMessage(data.content, type);
 
@@ -500,6 +508,18 @@
       }
     });
 
+    socket.on('message_delta', (data) => {
+      // data: {chat_id, delta} - incremental AI reply text
+      hideTyping();
+      let streamingEl = document.getElementById('pf-streaming-message');
+      if (!streamingEl) {
+        streamingEl = addMessage('', 'bot');
+        streamingEl.id = 'pf-streaming-message';
+      }
+      streamingEl.textContent += data.delta;
+      scrollToBottom();
+    });
+
     socket.on('typing_start', () => {
       showTyping();
     });
@@ -562,6 +582,7 @@
     messageEl.textContent = text;
     messagesContainer.appendChild(messageEl);
     scrollToBottom();
+    return messageEl;
   }
 
   function scrollToBottom() {
@@ -0,0 +1,26 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database import Base
+from src.models import agent, billing, chat, company, job, user  # noqa: F401  (register the tables)
+
+
+@pytest.fixture
+def database(tmp_path):
+    """
+    Session factory over a fresh SQLite file with all tables, opened inside
+    the test's own event loop: `async with database() as Session: ...`
+    """
+    @asynccontextmanager
+    async def open_database():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        finally:
+            await engine.dispose()
+
+    return open_database
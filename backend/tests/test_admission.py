@@ -0,0 +1,43 @@
+import asyncio
+
+from src.modules.ai_engine.admission import AdmissionController
+
+
+def test_finish_tags_are_pruned_once_tenants_drain():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=1000, max_wait=5, weights={})
+
+        async def turn(tenant):
+            await controller.acquire(tenant)
+            await asyncio.sleep(0)
+            controller.release()
+
+        await asyncio.gather(*(turn(f"chat:{i}") for i in range(200)))
+        assert controller._queued == 0
+        assert controller._last_finish == {}
+        assert controller.stats["admitted"] == 200
+
+    asyncio.run(run())
+
+
+def test_backlogged_tenant_still_queues_behind_others():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=100, max_wait=5, weights={})
+        order = []
+        await controller.acquire("chat:busy")  # Holds the only slot
+
+        async def turn(tenant):
+            await controller.acquire(tenant)
+            order.append(tenant)
+            controller.release()
+
+        tasks = [asyncio.create_task(turn("chat:busy")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(turn("chat:other")))
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.gather(*tasks)
+        assert order.index("chat:other") <= 1
+        assert controller._last_finish == {}
+
+    asyncio.run(run())
@@ -0,0 +1,146 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.modules.ai_engine import answer_cache as answer_cache_module
+from src.modules.ai_engine import service as service_module
+from src.modules.ai_engine.answer_cache import AnswerCache
+from src.modules.ai_engine.models import AIRequest, AIResponse
+from src.modules.ai_engine.service import AIEngineService
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+def reply(text: str) -> AIResponse:
+    return AIResponse(text=text, intent="pricing_query")
+
+
+def test_key_ignores_case_punctuation_and_follows_versions():
+    key = AnswerCache.make_key("Сколько стоит доставка?", "c1", "k1")
+    assert AnswerCache.make_key("сколько  стоит доставка", "c1", "k1") == key
+    assert AnswerCache.make_key("Сколько стоит доставка?", "c2", "k1") != key
+    assert AnswerCache.make_key("Сколько стоит доставка?", "c1", "k2") != key
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache_module, "time", clock)
+    cache = AnswerCache(max_size=10, ttl=60, sqlite_path="")
+
+    async def run():
+        await cache.set("q", reply("800 руб"))
+        clock.now += 59
+        fresh = await cache.get("q")
+        clock.now += 2
+        return fresh, await cache.get("q")
+
+    fresh, expired = asyncio.run(run())
+    assert fresh.text == "800 руб"
+    assert expired is None
+    assert cache.snapshot()["size"] == 0
+    assert cache.stats["hits_memory"] == 1 and cache.stats["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_size=2, ttl=60, sqlite_path="")
+
+    async def run():
+        await cache.set("a", reply("a"))
+        await cache.set("b", reply("b"))
+        await cache.get("a")  # "b" is now the least recently used
+        await cache.set("c", reply("c"))
+        return [await cache.get(key) for key in ("a", "b", "c")]
+
+    a, b, c = asyncio.run(run())
+    assert (a.text, b, c.text) == ("a", None, "c")
+    assert cache.stats["evictions"] == 1
+
+
+def test_falls_back_to_sqlite_tier(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache_module, "time", clock)
+    path = str(tmp_path / "answers.db")
+    writer = AnswerCache(max_size=10, ttl=60, sqlite_path=path)
+    reader = AnswerCache(max_size=10, ttl=60, sqlite_path=path)  # Another worker
+
+    async def run():
+        await writer.set("q", reply("800 руб"), generation_ms=1500)
+        from_disk = await reader.get("q")
+        from_memory = await reader.get("q")
+        await writer.invalidate()
+        cleared = await AnswerCache(max_size=10, ttl=60, sqlite_path=path).get("q")
+        await writer.set("old", reply("old"))
+        clock.now += 61
+        expired = await AnswerCache(max_size=10, ttl=60, sqlite_path=path).get("old")
+        return from_disk, from_memory, cleared, expired
+
+    from_disk, from_memory, cleared, expired = asyncio.run(run())
+    assert from_disk.text == from_memory.text == "800 руб"
+    assert reader.stats["hits_disk"] == 1 and reader.stats["hits_memory"] == 1
+    assert reader.stats["saved_ms"] == 3000
+    assert cleared is None
+    assert expired is None
+
+
+def make_service(monkeypatch, cache: AnswerCache):
+    """AIEngineService with a loaded agent config and a stub LLM turn."""
+    monkeypatch.setattr(service_module, "answer_cache", cache)
+    monkeypatch.setattr(service_module.settings, "ANSWER_CACHE_ENABLED", True)
+    service = AIEngineService(client=SimpleNamespace())
+    snapshot = SimpleNamespace(config_version="c1", knowledge_version="k1")
+    generated = []
+
+    async def load_agent_config(db):
+        return snapshot
+
+    async def prepare_context(request, db, agent_config):
+        return "", [], []
+
+    async def generate_turn(request, chat_history, business_context, knowledge, agent_config):
+        generated.append(request.text)
+        return AIResponse(text=f"fresh {len(generated)}", intent="pricing_query")
+
+    monkeypatch.setattr(service, "_load_agent_config", load_agent_config)
+    monkeypatch.setattr(service, "_prepare_context", prepare_context)
+    monkeypatch.setattr(service, "_generate_turn", generate_turn)
+    return service, generated
+
+
+def test_standalone_question_is_answered_from_cache(monkeypatch):
+    service, generated = make_service(monkeypatch, AnswerCache(max_size=10, ttl=60, sqlite_path=""))
+    request = AIRequest(conversation_id="1", text="Сколько стоит доставка?")
+
+    async def run():
+        first = await service.process_message(request, chat_history=[])
+        second = await service.process_message(request, chat_history=[{"role": "user", "content": "Здравствуйте"}])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first.text == second.text == "fresh 1"
+    assert second.generation_path == "cache"
+    assert generated == ["Сколько стоит доставка?"]
+
+
+def test_question_in_a_replied_chat_is_never_served_or_stored(monkeypatch):
+    cache = AnswerCache(max_size=10, ttl=60, sqlite_path="")
+    service, generated = make_service(monkeypatch, cache)
+    request = AIRequest(conversation_id="1", text="Сколько стоит доставка?")
+    history = [
+        {"role": "user", "content": "Мне нужен бампер на гранту"},
+        {"role": "assistant", "content": "Передний или задний?"},
+    ]
+
+    async def run():
+        await cache.set(AnswerCache.make_key(request.text, "c1", "k1"), reply("cached"))
+        return await service.process_message(request, chat_history=history)
+
+    response = asyncio.run(run())
+    assert response.text == "fresh 1"
+    assert generated == ["Сколько стоит доставка?"]
+    assert cache.stats["stores"] == 1  # Only the entry the test put there
+    assert cache.stats["hits_memory"] == cache.stats["misses"] == 0
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from src.modules.chat.coalescer import MessageCoalescer, TurnCancelled
+from src.task_queue import JobQueue, MemoryJobStore
+
+
+def make_coalescer() -> MessageCoalescer:
+    return MessageCoalescer(JobQueue(store=MemoryJobStore()), window=0.01, max_wait=0.1)
+
+
+def test_cancel_stops_tracked_turn():
+    async def run():
+        coalescer = make_coalescer()
+        started = asyncio.Event()
+
+        async def turn():
+            with coalescer.tracked(7):
+                started.set()
+                await asyncio.sleep(3600)
+
+        task = asyncio.create_task(turn())
+        await started.wait()
+        assert await coalescer.cancel(7, reason="manager_message")
+        with pytest.raises(TurnCancelled, match="manager_message"):
+            await task
+        assert not coalescer._direct
+
+    asyncio.run(run())
+
+
+def test_cancel_leaves_other_chats_and_outside_cancellation_alone():
+    async def run():
+        coalescer = make_coalescer()
+        started = asyncio.Event()
+
+        async def turn():
+            with coalescer.tracked(8):
+                started.set()
+                await asyncio.sleep(3600)
+
+        task = asyncio.create_task(turn())
+        await started.wait()
+        assert not await coalescer.cancel(9, reason="status:DONE")
+        assert not task.done()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert not coalescer._direct
+
+    asyncio.run(run())
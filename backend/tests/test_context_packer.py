@@ -0,0 +1,21 @@
+from src.modules.ai_engine import context_packer
+from src.modules.ai_engine.context_packer import TokenCounter
+
+
+class OfflineTiktoken:
+    """tiktoken without network access: no model is known and no encoding can be downloaded."""
+
+    @staticmethod
+    def encoding_for_model(model):
+        raise KeyError(model)
+
+    @staticmethod
+    def get_encoding(name):
+        raise ConnectionError(f"cannot download {name}")
+
+
+def test_falls_back_to_approximation_when_encoding_is_unavailable(monkeypatch):
+    monkeypatch.setattr(context_packer, "tiktoken", OfflineTiktoken)
+    counter = TokenCounter("custom-model")
+    assert counter.name == "approx"
+    assert counter.count("Сколько стоит бампер?") > 0
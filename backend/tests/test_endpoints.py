@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.modules.ai_engine.endpoints import Endpoint, EndpointRouter
+
+
+class FakeCompletions:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(model=kwargs["model"])
+
+
+def fake_endpoint(name: str, delay: float) -> Endpoint:
+    completions = FakeCompletions(delay)
+    return Endpoint(name=name, client=SimpleNamespace(chat=SimpleNamespace(completions=completions)), model=name)
+
+
+def make_router(*endpoints: Endpoint, timeout: float = 0.05) -> EndpointRouter:
+    return EndpointRouter(list(endpoints), alpha=0.5, max_error_rate=0.5, cooldown=60, explore=0.0, timeout=timeout)
+
+
+def test_hung_endpoint_fails_over_and_is_ejected():
+    hung = fake_endpoint("hung", delay=3600)
+    fast = fake_endpoint("fast", delay=0)
+    hung.ewma_latency_ms = 1.0  # Looks like the best endpoint until it hangs
+    fast.ewma_latency_ms = 50.0
+    router = make_router(hung, fast)
+
+    result = asyncio.run(router.create(messages=[]))
+
+    assert result.model == "fast"
+    assert hung.failures == 1
+    assert "TimeoutError" in hung.last_error
+    assert not hung.healthy
+    assert router.ranked()[0] is fast
+
+
+def test_caller_deadline_on_hung_endpoint_is_recorded():
+    hung = fake_endpoint("hung", delay=3600)
+    router = make_router(hung, timeout=0.05)
+
+    async def call():
+        # The only endpoint gets no router timeout; the caller's deadline cancels it
+        await asyncio.wait_for(router.create(messages=[]), 0.1)
+
+    try:
+        asyncio.run(call())
+    except asyncio.TimeoutError:
+        pass
+    else:
+        raise AssertionError("the caller's deadline should have fired")
+
+    assert hung.failures == 1
+    assert not hung.healthy
+
+
+def test_short_cancellation_raises_latency_without_failure():
+    slow = fake_endpoint("slow", delay=3600)
+    slow.ewma_latency_ms = 1.0
+    router = make_router(slow, timeout=10)
+
+    async def call():
+        await asyncio.wait_for(router.create(messages=[]), 0.05)
+
+    try:
+        asyncio.run(call())
+    except asyncio.TimeoutError:
+        pass
+
+    assert slow.failures == 0
+    assert slow.healthy
+    assert slow.ewma_latency_ms > 1.0
@@ -0,0 +1,46 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models.chat import Chat, ChatPlatform, ChatStatus
+from src.modules.chat.service import ChatService
+
+
+def test_inbox_pages_through_chats_with_equal_updated_at(database):
+    base = datetime(2026, 10, 18, 12, 0, 0)
+    # Chats 2-6 share one timestamp, so only the id orders them
+    times = [base - timedelta(minutes=1)] + [base] * 5 + [base + timedelta(minutes=1), base - timedelta(minutes=2)]
+
+    async def run():
+        async with database() as Session:
+            async with Session() as db:
+                for i, updated_at in enumerate(times, start=1):
+                    db.add(Chat(
+                        id=i, external_id=f"chat-{i}", platform=ChatPlatform.WEB,
+                        status=ChatStatus.AI, created_at=base, updated_at=updated_at
+                    ))
+                await db.commit()
+
+                service = ChatService(db)
+                pages, cursor = [], None
+                while True:
+                    chats, cursor = await service.get_inbox(limit=2, cursor=cursor)
+                    pages.append([chat["id"] for chat in chats])
+                    if cursor is None:
+                        return pages
+
+    pages = asyncio.run(run())
+    assert pages == [[7, 6], [5, 4], [3, 2], [1, 8]]
+    seen = [chat_id for page in pages for chat_id in page]
+    assert len(seen) == len(set(seen)) == len(times)
+
+
+def test_inbox_rejects_a_malformed_cursor(database):
+    async def run():
+        async with database() as Session:
+            async with Session() as db:
+                await ChatService(db).get_inbox(limit=2, cursor="not-a-cursor")
+
+    with pytest.raises(ValueError):
+        asyncio.run(run())
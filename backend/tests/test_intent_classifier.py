@@ -0,0 +1,39 @@
+import json
+import os
+
+from src.config import settings
+from src.modules.ai_engine.intent_classifier import SEED_EXAMPLES, IntentClassifier
+from src.modules.ai_engine.retrieval import tokenize
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "fixtures", "intents.jsonl")
+
+
+def load_fixtures():
+    with open(FIXTURES, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_fixtures_are_held_out():
+    seeds = {tuple(tokenize(text)) for text, _ in SEED_EXAMPLES}
+    assert [item["text"] for item in load_fixtures() if tuple(tokenize(item["text"])) in seeds] == []
+
+
+def test_unfamiliar_messages_fall_below_threshold():
+    classifier = IntentClassifier().fit(SEED_EXAMPLES)
+    assert classifier.temperature > 1
+    for text in ("можно оплатить картой?", "машина не заводится"):
+        assert classifier.predict(text).confidence < settings.INTENT_CLASSIFIER_THRESHOLD
+    prediction = classifier.predict("позовите менеджера срочно")
+    assert prediction.intent == "handoff_request"
+    assert prediction.confidence >= settings.INTENT_CLASSIFIER_THRESHOLD
+
+
+def test_threshold_keeps_held_out_precision():
+    classifier = IntentClassifier().fit(SEED_EXAMPLES)
+    covered = []
+    for item in load_fixtures():
+        prediction = classifier.predict(item["text"])
+        if prediction and prediction.confidence >= settings.INTENT_CLASSIFIER_THRESHOLD:
+            covered.append(prediction.intent == item["intent"])
+    assert covered
+    assert sum(covered) / len(covered) >= 0.95
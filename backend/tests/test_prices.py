@@ -0,0 +1,87 @@
+import asyncio
+from decimal import Decimal
+
+from src.models.agent import KnowledgeFile
+from src.modules.ai_engine.prices import PriceIndex, parse_price_rows
+
+CELL_TABLE = """LADA GRANTA
+Наименование
+Артикул
+Цена
+Тормозные колодки передние (комплект)
+2190-3501080
+1 850
+Фара левая
+2190-3711011
+5 400"""
+
+
+def test_parses_cell_table_under_its_section():
+    rows = parse_price_rows(CELL_TABLE)
+    assert [(r.name, r.article, r.price, r.section) for r in rows] == [
+        ("Тормозные колодки передние (комплект)", "2190-3501080", Decimal("1850"), "LADA GRANTA"),
+        ("Фара левая", "2190-3711011", Decimal("5400"), "LADA GRANTA"),
+    ]
+
+
+def test_parses_one_line_rows():
+    rows = parse_price_rows("Стрижка мужская — 800 руб\nМаникюр: 1 200,50 ₽\nработаем с 9 до 21")
+    assert [(r.name, r.price, r.section) for r in rows] == [
+        ("Стрижка мужская", Decimal("800"), None),
+        ("Маникюр", Decimal("1200.50"), None),
+    ]
+
+
+def test_one_line_row_after_cell_table_leaves_the_section():
+    rows = parse_price_rows(CELL_TABLE + "\nСтрижка мужская — 800 руб")
+    assert rows[-1].name == "Стрижка мужская"
+    assert rows[-1].section is None
+    assert rows[0].section == "LADA GRANTA"
+
+
+def test_blank_line_ends_a_one_line_list_section():
+    rows = parse_price_rows("СТРИЖКИ\n\nСтрижка мужская — 800 руб\nСтрижка детская — 500 руб\n\nМаникюр — 1000 руб")
+    assert [(r.name, r.section) for r in rows] == [
+        ("Стрижка мужская", "СТРИЖКИ"),
+        ("Стрижка детская", "СТРИЖКИ"),
+        ("Маникюр", None),
+    ]
+
+
+def test_lookup_by_article_and_by_name(database):
+    async def run():
+        async with database() as Session:
+            async with Session() as db:
+                file = KnowledgeFile(filename="prices.pdf")
+                db.add(file)
+                await db.flush()
+                count = await PriceIndex(db).index_file(file, CELL_TABLE + "\nСтрижка мужская — 800 руб")
+                await db.commit()
+                assert count == 3 and file.price_count == 3
+
+                index = PriceIndex(db)
+                by_article = await index.lookup("есть 2190-3711011?", by_name=False)
+                by_name = await index.lookup("сколько стоят колодки передние на гранту")
+                unrelated = await index.lookup("сколько стоит доставка", by_name=True)
+                return by_article, by_name, unrelated
+
+    by_article, by_name, unrelated = asyncio.run(run())
+    assert [(m.name, m.score) for m in by_article] == [("Фара левая", 1.0)]
+    assert by_name[0].name == "Тормозные колодки передние (комплект)"
+    assert by_name[0].section == "LADA GRANTA"
+    assert unrelated == []
+
+
+def test_remove_file_drops_its_rows(database):
+    async def run():
+        async with database() as Session:
+            async with Session() as db:
+                file = KnowledgeFile(filename="prices.pdf")
+                db.add(file)
+                await db.flush()
+                await PriceIndex(db).index_file(file, CELL_TABLE)
+                await PriceIndex(db).remove_file(file.id)
+                await db.commit()
+                return await PriceIndex(db).lookup("2190-3711011 фара левая")
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,78 @@
+import asyncio
+
+from src.models.job import JobStatus
+from src.task_queue import JobQueue, MemoryJobStore
+
+
+def make_queue(**kwargs) -> JobQueue:
+    return JobQueue(store=MemoryJobStore(), max_attempts=1, poll_interval=0.05, lease=60, **kwargs)
+
+
+def test_job_cancelled_by_another_process_stops():
+    async def run():
+        queue = make_queue(workers=2)
+        stopped = asyncio.Event()
+
+        async def hang(job):
+            try:
+                await asyncio.sleep(3600)
+            finally:
+                stopped.set()
+
+        queue.register("hang", hang)
+        await queue.start()
+        job_id = await queue.enqueue("hang", {})
+        while not await queue.is_running(job_id):
+            await asyncio.sleep(0.01)
+        # Another process only changes the status in the shared store
+        await queue.store.cancel(job_id)
+        await asyncio.wait_for(stopped.wait(), 1)
+        assert not await queue.is_running(job_id)
+        assert (await queue.store.get(job_id))["status"] == JobStatus.CANCELLED
+        assert queue.stats["cancelled_remote"] == 1
+        await queue.stop()
+
+    asyncio.run(run())
+
+
+def test_single_poller_fills_every_worker_slot():
+    async def run():
+        queue = make_queue(workers=3)
+        claims = 0
+        claim = queue.store.claim
+
+        async def counted_claim(*args):
+            nonlocal claims
+            claims += 1
+            return await claim(*args)
+
+        queue.store.claim = counted_claim
+        active = peak = 0
+        release = asyncio.Event()
+
+        async def work(job):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await release.wait()
+            active -= 1
+            return {"ok": True}
+
+        queue.register("work", work)
+        await queue.start()
+        ids = [await queue.enqueue("work", {}) for _ in range(5)]
+        await asyncio.sleep(0.2)
+        assert peak == 3
+        # Every slot is busy: the poller waits for one instead of polling
+        idle_claims = claims
+        await asyncio.sleep(0.2)
+        assert claims == idle_claims
+        release.set()
+        for _ in range(100):
+            if queue.stats["done"] == 5:
+                break
+            await asyncio.sleep(0.01)
+        assert [(await queue.store.get(i))["status"] for i in ids] == [JobStatus.DONE] * 5
+        await queue.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.modules.ai_engine import transport
+from src.modules.ai_engine.transport import CircuitBreaker, CircuitOpenError, ResilientClient
+
+
+class FakeCompletions:
+    """Completions whose calls follow a script of (delay, error or None)."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def create(self, **kwargs):
+        delay, error = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        call = self.calls
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if error:
+            raise error
+        return SimpleNamespace(call=call)
+
+
+def make_client(completions: FakeCompletions, **kwargs) -> ResilientClient:
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return ResilientClient(client, max_retries=0, backoff=0, **kwargs)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    completions = FakeCompletions((0, asyncio.TimeoutError()))
+    client = make_client(completions, breaker=CircuitBreaker(failure_threshold=2, cooldown=0.05), hedge=False)
+
+    async def call():
+        return await client.create(deadline=1, messages=[])
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await call()
+        assert client.breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            await call()
+        assert completions.calls == 2  # Failed fast without calling the provider
+
+        await asyncio.sleep(0.06)
+        # A failed probe opens the circuit again at once
+        with pytest.raises(asyncio.TimeoutError):
+            await call()
+        assert client.breaker.state == "open" and client.breaker.trips == 2
+
+        await asyncio.sleep(0.06)
+        completions.script = [(0.02, None)]
+        probe = asyncio.create_task(call())
+        await asyncio.sleep(0)
+        assert client.breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            await call()  # Only one probe at a time
+        await probe
+
+    asyncio.run(run())
+    assert client.breaker.state == "closed"
+    assert client.breaker.failures == 0
+    assert client.stats["short_circuited"] == 2
+    assert client.breaker.allow()
+
+
+def test_cancelled_probe_does_not_block_the_next_one():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.record_abandoned()
+    assert breaker.allow()
+
+
+def test_hedged_request_cancels_the_slower_call(monkeypatch):
+    monkeypatch.setattr(transport.settings, "LLM_HEDGE_MIN_DELAY", 0.01)
+    completions = FakeCompletions((3600, None), (0, None))
+    client = make_client(completions, hedge=True)
+    for _ in range(transport.HEDGE_MIN_SAMPLES):
+        client.latency.observe(10.0)
+
+    async def run():
+        result = await client.create(deadline=5, messages=[])
+        await asyncio.sleep(0)  # Let the cancellation reach the primary call
+        return result
+
+    result = asyncio.run(run())
+    assert result.call == 2
+    assert completions.calls == 2
+    assert completions.cancelled == 1
+    assert client.stats["hedges"] == client.stats["hedge_wins"] == 1
+
+
+def test_no_hedge_before_enough_latency_samples():
+    completions = FakeCompletions((0.02, None))
+    client = make_client(completions, hedge=True)
+
+    result = asyncio.run(client.create(deadline=5, messages=[]))
+
+    assert result.call == 1
+    assert client.stats["hedges"] == 0
+    assert len(client.latency.samples) == 1
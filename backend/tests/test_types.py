@@ -0,0 +1,31 @@
+import asyncio
+import zlib
+
+from sqlalchemy import select, text
+
+from src.models.agent import KnowledgeFile
+
+
+def test_compressed_text_reads_legacy_and_compressed_rows(database):
+    long_text = "Тормозные колодки передние — 1 850 руб.\n" * 200
+
+    async def run():
+        async with database() as Session:
+            async with Session() as db:
+                # A row written while the column was still TEXT
+                await db.execute(text(
+                    "INSERT INTO knowledge_files (id, filename, content) VALUES (1, 'old.txt', 'Стрижка — 800 руб')"
+                ))
+                db.add(KnowledgeFile(id=2, filename="new.txt", content=long_text))
+                db.add(KnowledgeFile(id=3, filename="empty.txt", content=None))
+                await db.commit()
+
+            async with Session() as db:
+                stored = dict((await db.execute(text("SELECT id, content FROM knowledge_files"))).all())
+                result = await db.execute(select(KnowledgeFile.id, KnowledgeFile.content).order_by(KnowledgeFile.id))
+                return stored, result.all()
+
+    stored, rows = asyncio.run(run())
+    assert rows == [(1, "Стрижка — 800 руб"), (2, long_text), (3, None)]
+    assert isinstance(stored[2], bytes) and len(stored[2]) < len(long_text.encode("utf-8")) / 10
+    assert zlib.decompress(stored[2]).decode("utf-8") == long_text
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import numpy as np
+
+from src.modules.ai_engine.embeddings import HashingEmbedder
+from src.modules.ai_engine.vector_store import VectorStore
+
+
+def unit_rows(*rows):
+    matrix = np.asarray(rows, dtype=np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def test_add_search_and_count(tmp_path):
+    store = VectorStore(str(tmp_path))
+    assert len(store) == 0
+    assert store.search(unit_rows([1, 0, 0]), top_k=2) == [[]]
+
+    store.add([10, 11, 12], unit_rows([1, 0, 0], [0, 1, 0], [1, 1, 0]), "test")
+
+    assert len(store) == 3
+    assert store.chunk_ids() == {10, 11, 12}
+    results = store.search(unit_rows([1, 0, 0], [0, 1, 0]), top_k=2)
+    assert [chunk_id for chunk_id, _ in results[0]] == [10, 12]
+    assert [chunk_id for chunk_id, _ in results[1]] == [11, 12]
+    assert results[0][0][1] == np.float32(1.0)
+
+
+def test_remove_hides_rows_and_updates_count(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.add(list(range(1, 11)), unit_rows(*[[1, i, 0] for i in range(10)]), "test")
+
+    store.remove([1, 999])
+
+    assert len(store) == 9
+    assert 1 not in store.chunk_ids()
+    assert all(chunk_id != 1 for chunk_id, _ in store.search(unit_rows([1, 0, 0]), top_k=10)[0])
+    assert json.loads((tmp_path / "meta.json").read_text())["count"] == 9
+
+
+def test_compaction_drops_dead_rows(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.add(list(range(1, 11)), unit_rows(*[[1, i, 0] for i in range(10)]), "test")
+
+    store.remove([1, 2, 3, 4])  # Over COMPACT_RATIO of the rows
+
+    assert (tmp_path / "ids.i64").stat().st_size == 6 * 8
+    assert len(store) == 6
+    assert store.chunk_ids() == {5, 6, 7, 8, 9, 10}
+    assert store.search(unit_rows([1, 9, 0]), top_k=1)[0][0][0] == 10
+
+
+def test_other_instances_see_writes(tmp_path):
+    writer, reader = VectorStore(str(tmp_path)), VectorStore(str(tmp_path))
+    writer.add([1, 2], unit_rows([1, 0], [0, 1]), "test")
+    assert len(reader) == 2
+
+    writer.remove([2])  # In place: the ids file keeps its size
+    assert len(reader) == 1
+    assert reader.chunk_ids() == {1}
+
+
+def test_counts_legacy_store_without_count(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.add([1, 2, 3], unit_rows([1, 0], [0, 1], [1, 1]), "test")
+    store.remove([3])
+    meta = json.loads((tmp_path / "meta.json").read_text())
+    del meta["count"]
+    (tmp_path / "meta.json").write_text(json.dumps(meta))
+
+    store = VectorStore(str(tmp_path))
+    assert len(store) == 2
+    store.add([4], unit_rows([1, 0]), "test")
+    assert len(store) == 3
+
+
+def test_reset_drops_everything(tmp_path):
+    store = VectorStore(str(tmp_path))
+    store.add([1], unit_rows([1, 0]), "old")
+    store.reset("new")
+    assert len(store) == 0
+    assert store.embedder_name == "new"
+
+
+def test_hashing_embedder_is_normalised_and_deterministic():
+    embedder = HashingEmbedder(dim=256)
+    texts = ["Тормозные колодки передние", "", "колодки передние"]
+
+    first = asyncio.run(embedder.embed(texts))
+    second = asyncio.run(HashingEmbedder(dim=256).embed(texts))
+
+    assert first.shape == (3, 256) and first.dtype == np.float32
+    assert np.array_equal(first, second)
+    assert np.allclose(np.linalg.norm(first[[0, 2]], axis=1), 1.0)
+    assert not first[1].any()  # Empty text: zero vector, not NaN
+    assert embedder.name == "hashing-256"
+
+
+def test_hashing_embedder_brings_inflected_forms_together():
+    embedder = HashingEmbedder(dim=512)
+    query, inflected, unrelated = asyncio.run(embedder.embed(["колодки", "колодок", "доставка"]))
+    assert query @ inflected > query @ unrelated
+
+
+def test_hashing_embedder_batches_large_inputs_off_the_loop():
+    embedder = HashingEmbedder(dim=64)
+    texts = [f"деталь {i}" for i in range(40)]
+    batched = asyncio.run(embedder.embed(texts))
+    single = asyncio.run(embedder.embed(texts[:1]))
+    assert batched.shape == (40, 64)
+    assert np.allclose(batched[0], single[0])
@@ -14,7 +14,7 @@ import {
   Zap,
   Loader2
 } from 'lucide-react';
-import { useChats, useChat, useAddMessage, useUpdateChatStatus, useUpdateNotes } from '@/shared/api/hooks';
+import { useChats, useChat, useMessageHistory, useAddMessage, useUpdateChatStatus, useUpdateNotes } from '@/shared/api/hooks';
 import type { Chat } from '@/shared/api/client';
 
 type ChannelType = 'telegram' | 'avito' | 'web' | 'whatsapp' | 'instagram' | 'vk';
@@ -28,6 +28,7 @@ export const InboxPage: React.FC = () => {
   // API hooks
   const { data: chats = [], isLoading: chatsLoading, error: chatsError } = useChats();
   const { data: selectedChat, isLoading: chatLoading } = useChat(selectedChatId);
+  const { messages, hasOlder, loadingOlder, loadOlder } = useMessageHistory(selectedChat);
   const addMessageMutation = useAddMessage();
   const updateStatusMutation = useUpdateChatStatus();
   const updateNotesMutation = useUpdateNotes();
@@ -59,6 +60,14 @@ export const InboxPage: React.FC = () => {
     }
   };
 
+  const handleLoadOlder = async () => {
+    try {
+      await loadOlder();
+    } catch (error) {
+      console.error('Failed to load older messages:', error);
+    }
+  };
+
   const toggleAIStatus = async () => {
     if (!selectedChat) return;
 
@@ -274,7 +283,20 @@ export const InboxPage: React.FC = () => {
                   <Loader2 className="w-6 h-6 animate-spin text-zinc-500" />
                 </div>
               ) : (
-                selectedChat.messages.map((msg) => (
+                <>
+                {hasOlder && (
+                  <div className="flex justify-center">
+                    <button
+                      onClick={handleLoadOlder}
+                      disabled={loadingOlder}
+                      className="flex items-center gap-2 text-xs text-zinc-500 hover:text-zinc-300 hover:bg-white/5 px-3 py-1.5 rounded-lg transition-colors disabled:opacity-50"
+                    >
+                      {loadingOlder && <Loader2 className="w-3 h-3 animate-spin" />}
+                      Загрузить более ранние сообщения
+                    </button>
+                  </div>
+                )}
+                {messages.map((msg) => (
                   <div
                     key={msg.id}
                     className={`flex w-full ${msg.role === 'user' ? 'justify-start' : 'justify-end'}`}
@@ -304,7 +326,8 @@ export const InboxPage: React.FC = () => {
                       </div>
                     </div>
                   </div>
-                ))
+                ))}
+                </>
               )}
             </div>
 
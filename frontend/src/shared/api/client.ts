@@ -25,10 +25,42 @@ export interface Chat {
     unread_count: number;
     created_at: string;
     updated_at: string;
-    messages: Message[];
+    messages: Message[];  // Newest page only
+    has_more_messages?: boolean;
     client?: Client;
 }
 
+export interface MessagePage {
+    messages: Message[];
+    has_more: boolean;
+    next_before?: number | null;
+}
+
+export interface InboxChat {
+    id: number;
+    external_id: string;
+    platform: Chat['platform'];
+    status: Chat['status'];
+    item_name?: string | null;
+    client_name?: string | null;
+    unread_count: number;
+    created_at: string;
+    updated_at: string;
+    last_message?: { role: string; preview: string; created_at: string } | null;
+}
+
+export interface InboxPage {
+    chats: InboxChat[];
+    next_cursor?: string | null;
+}
+
+export interface InboxQuery {
+    cursor?: string;
+    limit?: number;
+    status?: Chat['status'];
+    platform?: Chat['platform'];
+}
+
 export interface CreateChatRequest {
     external_id: string;
     platform: string;
@@ -44,9 +76,10 @@ export interface SendMessageRequest {
 
 export interface SendMessageResponse {
     user_message: Message;
-    ai_response: Message;
-    intent: string;
+    ai_response: Message | null; // null when the AI did not answer, see ai_skipped
+    intent: string | null;
     suggested_actions: string[];
+    ai_skipped?: string | null; // "paused" (HUMAN/DONE chat) or why the turn was cancelled
 }
 
 export interface ClientUpdate {
@@ -60,6 +93,13 @@ export interface KnowledgeFile {
     id: number;
     filename: string;
     file_size: number;
+    sha256?: string | null;
+    status: 'PROCESSING' | 'READY' | 'FAILED';
+    job_id?: number | null;
+    pages_total?: number | null;
+    pages_done?: number | null;
+    error?: string | null;
+    price_count?: number | null;
     created_at: string;
 }
 
@@ -170,6 +210,17 @@ export const api = {
         return response.json();
     },
 
+    // Inbox headers, one page per call (pass next_cursor for the next one)
+    async getInbox(query: InboxQuery = {}): Promise<InboxPage> {
+        const params = new URLSearchParams();
+        Object.entries(query).forEach(([key, value]) => {
+            if (value !== undefined) params.set(key, String(value));
+        });
+        const response = await fetch(`${API_BASE_URL}/chats/inbox?${params}`);
+        if (!response.ok) throw new Error('Failed to fetch inbox');
+        return response.json();
+    },
+
     // Get single chat with messages
     async getChat(chatId: number): Promise<Chat> {
         const response = await fetch(`${API_BASE_URL}/chats/${chatId}`);
@@ -177,6 +228,16 @@ export const api = {
         return response.json();
     },
 
+    // Older messages of a chat, one page per call (pass next_before for the next one)
+    async getMessages(chatId: number, before?: number, limit?: number): Promise<MessagePage> {
+        const params = new URLSearchParams();
+        if (before !== undefined) params.set('before', String(before));
+        if (limit !== undefined) params.set('limit', String(limit));
+        const response = await fetch(`${API_BASE_URL}/chats/${chatId}/messages?${params}`);
+        if (!response.ok) throw new Error('Failed to fetch messages');
+        return response.json();
+    },
+
     // Create a new chat
     async createChat(data: CreateChatRequest): Promise<Chat> {
         const response = await fetch(`${API_BASE_URL}/chats/`, {
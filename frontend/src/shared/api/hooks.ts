@@ -1,5 +1,6 @@
+import { useState, useEffect } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
-import { api, type SendMessageRequest, type SendMessageResponse, type CreateChatRequest, type ClientUpdate } from './client';
+import { api, type Chat, type Message, type SendMessageRequest, type SendMessageResponse, type CreateChatRequest, type ClientUpdate } from './client';
 
 // Query keys
 export const chatKeys = {
@@ -24,6 +25,40 @@ export function useChat(chatId: number | null) {
     });
 }
 
+// Full message list of a chat: the newest page from useChat plus older pages loaded on demand
+export function useMessageHistory(chat: Chat | undefined) {
+    const [older, setOlder] = useState<Message[]>([]);
+    const [hasMoreOlder, setHasMoreOlder] = useState<boolean | null>(null);
+    const [loadingOlder, setLoadingOlder] = useState(false);
+    const chatId = chat?.id;
+
+    useEffect(() => {
+        setOlder([]);
+        setHasMoreOlder(null);
+    }, [chatId]);
+
+    // Merge by id: a refetched newest page may overlap the older pages
+    const byId = new Map<number, Message>();
+    for (const msg of [...older, ...(chat?.messages ?? [])]) byId.set(msg.id, msg);
+    const messages = [...byId.values()].sort((a, b) => a.id - b.id);
+
+    const hasOlder = hasMoreOlder ?? !!chat?.has_more_messages;
+
+    const loadOlder = async () => {
+        if (!chat || !hasOlder || loadingOlder || messages.length === 0) return;
+        setLoadingOlder(true);
+        try {
+            const page = await api.getMessages(chat.id, messages[0].id);
+            setOlder(prev => [...page.messages, ...prev]);
+            setHasMoreOlder(page.has_more);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
+    return { messages, hasOlder, loadingOlder, loadOlder };
+}
+
 // Send message mutation (with AI response)
 export function useSendMessage() {
     const queryClient = useQueryClient();